@@ -1,20 +1,254 @@
 from django.contrib import admin
 
+from . import duplicates
 from .models import (
-    City, FlightRoute, FlightSchedule, Flight,
-    Passenger, Booking, ItineraryItem,
-    AdditionalItem, BookingItem, CrewMember, CrewAssignment
+    AdditionalItem,
+    ArchivedBooking,
+    ArchivedFlight,
+    Booking,
+    BookingItem,
+    ChangeEvent,
+    City,
+    CrewAssignment,
+    CrewMember,
+    DataVersion,
+    DuplicateCandidate,
+    FareRule,
+    FeedConsumer,
+    Flight,
+    FlightRoute,
+    FlightSchedule,
+    IdempotencyKey,
+    ItineraryItem,
+    Job,
+    Passenger,
 )
+from .writequeue import write_queue
 
-# Register your models here.
-admin.site.register(City)
-admin.site.register(FlightRoute)
-admin.site.register(FlightSchedule)
-admin.site.register(Flight)
-admin.site.register(Passenger)
-admin.site.register(Booking)
-admin.site.register(ItineraryItem)
-admin.site.register(AdditionalItem)
-admin.site.register(BookingItem)
-admin.site.register(CrewMember)
-admin.site.register(CrewAssignment)
\ No newline at end of file
+
+class AirlineAdmin(admin.ModelAdmin):
+    # Counting every row of a large table on each changelist is the slowest
+    # query on the page; the filtered count is still shown.
+    show_full_result_count = False
+    list_per_page = 50
+    # Newest first, on the primary key index; also keeps autocomplete
+    # pagination stable.
+    ordering = ["-pk"]
+
+
+# Every model's __str__ that touches a relation has the relation listed in
+# list_select_related (or the inline's queryset), so changelist pages run a
+# fixed number of queries whatever the table size. Foreign keys use
+# autocomplete or raw-id widgets instead of rendering whole tables. The
+# autocomplete view labels its results from the target admin's
+# get_queryset, so admins that are autocomplete targets join there instead
+# (the changelist ignores list_select_related once get_queryset has joined
+# anything).
+
+
+@admin.register(City)
+class CityAdmin(AirlineAdmin):
+    list_display = ["city_id", "city_name"]
+    search_fields = ["city_name"]
+    ordering = ["city_name"]
+
+
+@admin.register(FlightSchedule)
+class FlightScheduleAdmin(AirlineAdmin):
+    list_display = ["schedule_id", "date"]
+    search_fields = ["=date"]
+    date_hierarchy = "date"
+    ordering = ["-date"]
+
+
+@admin.register(FlightRoute)
+class FlightRouteAdmin(AirlineAdmin):
+    list_display = ["route_id", "origin_city", "destination_city", "duration", "base_fare"]
+    search_fields = ["=route_id", "origin_city__city_name", "destination_city__city_name"]
+    autocomplete_fields = ["origin_city", "destination_city"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            "origin_city", "destination_city")
+
+
+class CrewAssignmentInline(admin.TabularInline):
+    model = CrewAssignment
+    extra = 0
+    raw_id_fields = ["crew"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("crew")
+
+
+@admin.register(Flight)
+class FlightAdmin(AirlineAdmin):
+    list_display = ["flight_no", "route", "schedule", "departure_time", "arrival_time"]
+    search_fields = ["=flight_no"]
+    autocomplete_fields = ["route", "schedule"]
+    date_hierarchy = "schedule__date"
+    inlines = [CrewAssignmentInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            "route__origin_city", "route__destination_city", "schedule")
+
+
+@admin.register(Passenger)
+class PassengerAdmin(AirlineAdmin):
+    list_display = ["passenger_id", "last_name", "first_name", "birthdate", "gender"]
+    list_filter = ["gender"]
+    search_fields = ["=passenger_id", "^last_name", "^first_name"]
+
+
+class ItineraryItemInline(admin.TabularInline):
+    model = ItineraryItem
+    extra = 0
+    autocomplete_fields = ["flight"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("flight__schedule")
+
+
+class BookingItemInline(admin.TabularInline):
+    model = BookingItem
+    extra = 0
+    autocomplete_fields = ["item"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("item")
+
+
+@admin.register(Booking)
+class BookingAdmin(AirlineAdmin):
+    list_display = ["booking_reference", "passenger", "date_booked", "total_cost", "version"]
+    search_fields = ["=booking_reference", "=booking_id", "=passenger__passenger_id"]
+    readonly_fields = ["booking_reference", "version", "idempotency_key"]
+    autocomplete_fields = ["passenger"]
+    date_hierarchy = "date_booked"
+    inlines = [ItineraryItemInline, BookingItemInline]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("passenger")
+
+
+@admin.register(ItineraryItem)
+class ItineraryItemAdmin(AirlineAdmin):
+    list_display = ["itinerary_item_id", "booking", "flight", "cost"]
+    list_select_related = ["booking__passenger", "flight__schedule"]
+    search_fields = ["=booking__booking_reference", "=flight__flight_no"]
+    autocomplete_fields = ["booking", "flight"]
+
+
+@admin.register(AdditionalItem)
+class AdditionalItemAdmin(AirlineAdmin):
+    list_display = ["item_id", "description", "cost_per_unit"]
+    search_fields = ["description"]
+
+
+@admin.register(BookingItem)
+class BookingItemAdmin(AirlineAdmin):
+    list_display = ["booking_item_id", "booking", "item", "quantity", "subtotal_cost"]
+    list_select_related = ["booking__passenger", "item"]
+    search_fields = ["=booking__booking_reference"]
+    autocomplete_fields = ["booking", "item"]
+
+
+@admin.register(CrewMember)
+class CrewMemberAdmin(AirlineAdmin):
+    list_display = ["crew_id", "last_name", "first_name", "role"]
+    list_filter = ["role"]
+    search_fields = ["=crew_id", "^last_name", "^first_name"]
+
+
+@admin.register(CrewAssignment)
+class CrewAssignmentAdmin(AirlineAdmin):
+    list_display = ["crew_assignment_id", "crew", "flight", "assignment_date"]
+    list_select_related = ["crew", "flight__schedule"]
+    search_fields = ["=flight__flight_no", "=crew__crew_id"]
+    autocomplete_fields = ["crew", "flight"]
+    date_hierarchy = "assignment_date"
+
+
+@admin.register(FareRule)
+class FareRuleAdmin(AirlineAdmin):
+    list_display = ["name", "route", "priority", "fare", "multiplier", "is_active"]
+    list_select_related = ["route__origin_city", "route__destination_city"]
+    list_filter = ["is_active"]
+    search_fields = ["name"]
+    autocomplete_fields = ["route"]
+    ordering = ["priority", "rule_id"]
+
+
+@admin.register(DataVersion)
+class DataVersionAdmin(AirlineAdmin):
+    list_display = ["family", "version"]
+    ordering = ["family"]
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(AirlineAdmin):
+    list_display = ["key", "created_at"]
+    search_fields = ["=key"]
+    date_hierarchy = "created_at"
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(AirlineAdmin):
+    list_display = ["booking_reference", "passenger_id", "date_booked", "total_cost", "archived_at"]
+    search_fields = ["=booking_reference", "=passenger_id"]
+    date_hierarchy = "date_booked"
+
+
+@admin.register(ArchivedFlight)
+class ArchivedFlightAdmin(AirlineAdmin):
+    list_display = ["flight_no", "date", "route_id", "departure_time", "arrival_time"]
+    search_fields = ["=flight_no"]
+    date_hierarchy = "date"
+
+
+@admin.register(Job)
+class JobAdmin(AirlineAdmin):
+    list_display = ["job_id", "task", "status", "priority", "attempts", "run_at", "finished_at"]
+    list_filter = ["status"]
+    search_fields = ["=job_id", "task"]
+    date_hierarchy = "created_at"
+    readonly_fields = ["locked_by", "locked_at", "last_error", "created_at", "finished_at"]
+
+
+@admin.register(ChangeEvent)
+class ChangeEventAdmin(AirlineAdmin):
+    list_display = ["event_id", "entity", "object_id", "action", "created_at"]
+    list_filter = ["entity", "action"]
+    search_fields = ["=event_id", "=object_id"]
+    date_hierarchy = "created_at"
+    readonly_fields = ["entity", "object_id", "action", "payload", "created_at"]
+
+
+@admin.register(FeedConsumer)
+class FeedConsumerAdmin(AirlineAdmin):
+    list_display = ["name", "acked_event_id", "updated_at"]
+    ordering = ["name"]
+
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(AirlineAdmin):
+    list_display = ["candidate_id", "passenger", "duplicate", "score", "dismissed", "found_at"]
+    list_select_related = ["passenger", "duplicate"]
+    list_filter = ["dismissed"]
+    search_fields = ["=passenger__passenger_id", "=duplicate__passenger_id", "^passenger__last_name"]
+    raw_id_fields = ["passenger", "duplicate"]
+    ordering = ["-score", "candidate_id"]
+    actions = ["merge", "dismiss"]
+
+    @admin.action(description="Merge selected pairs (keeps the older passenger)")
+    def merge(self, request, queryset):
+        pairs = queryset.filter(dismissed=False).values_list("passenger_id", "duplicate_id")
+        moved = 0
+        for group in duplicates.groups(pairs):
+            moved += write_queue.run(duplicates.merge, group[0], group[1:])
+        self.message_user(request, f"Merged the selected pairs; moved {moved} bookings.")
+
+    @admin.action(description="Dismiss selected pairs (not the same person)")
+    def dismiss(self, request, queryset):
+        queryset.update(dismissed=True)
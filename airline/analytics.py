@@ -0,0 +1,181 @@
+"""
+Route-network analytics.
+
+The route table is turned into a dense city-by-city matrix of
+``FlightRoute.duration`` and solved for all-pairs shortest durations with a
+vectorised Floyd-Warshall, keeping a next-hop matrix so fastest itineraries
+can be reconstructed. The result, along with its reachability summary and
+hub ranking, is cached per process until a write bumps the routes data
+version.
+"""
+
+import threading
+from functools import cached_property
+
+import numpy as np
+
+from . import versions
+from .models import City, FlightRoute
+
+NO_HOP = -1
+
+
+class RouteNetwork:
+    def __init__(self, city_ids, city_names, routes, data_versions=None):
+        """
+        ``city_ids`` and ``city_names`` are parallel sequences; ``routes`` is
+        an iterable of ``(origin_id, destination_id, duration)``.
+        """
+        self.data_versions = data_versions
+        self.city_ids = np.asarray(city_ids, dtype=np.int64)
+        self.city_names = list(city_names)
+        self.index = {int(city_id): i for i, city_id in enumerate(self.city_ids)}
+
+        n = len(self.city_ids)
+        # float32 holds whole minutes exactly and halves memory traffic.
+        durations = np.full((n, n), np.inf, dtype=np.float32)
+        np.fill_diagonal(durations, 0)
+        for origin, destination, duration in routes:
+            i, j = self.index.get(origin), self.index.get(destination)
+            if i is None or j is None or i == j:
+                continue
+            durations[i, j] = min(durations[i, j], duration)
+        self.direct = durations
+
+        self.route_count = int(np.isfinite(durations).sum() - n)
+        self.shortest, self.next_hop = self._solve(durations)
+
+    @staticmethod
+    def _solve(durations):
+        n = len(durations)
+        shortest = durations.copy()
+        next_hop = np.where(
+            np.isfinite(durations), np.arange(n)[None, :], NO_HOP
+        ).astype(np.int32)
+
+        # Updated in place: with ~1k cities each pass touches a million cells,
+        # so avoiding per-pass allocations is most of the cost.
+        via = np.empty_like(shortest)
+        better = np.empty(shortest.shape, dtype=bool)
+        for k in range(n):
+            np.add(shortest[:, k, None], shortest[None, k, :], out=via)
+            np.less(via, shortest, out=better)
+            np.copyto(shortest, via, where=better)
+            np.copyto(next_hop, next_hop[:, k, None], where=better)
+        return shortest, next_hop
+
+    @classmethod
+    def load(cls, data_versions=None):
+        cities = list(City.objects.order_by("city_id").values_list(
+            "city_id", "city_name"))
+        routes = FlightRoute.objects.values_list(
+            "origin_city_id", "destination_city_id", "duration")
+        return cls(
+            [city_id for city_id, _ in cities],
+            [name for _, name in cities],
+            routes,
+            data_versions,
+        )
+
+    def __len__(self):
+        return len(self.city_ids)
+
+    def fastest(self, origin_id, destination_id):
+        """
+        Return ``(total_minutes, [city_id, ...])`` for the fastest itinerary,
+        or ``None`` when the destination cannot be reached.
+        """
+        i, j = self.index.get(origin_id), self.index.get(destination_id)
+        if i is None or j is None or not np.isfinite(self.shortest[i, j]):
+            return None
+
+        path = [i]
+        while path[-1] != j:
+            path.append(int(self.next_hop[path[-1], j]))
+        return int(self.shortest[i, j]), [int(self.city_ids[p]) for p in path]
+
+    def reachability(self):
+        """Summarise which city pairs are connected at all."""
+        return self._reachability
+
+    @cached_property
+    def _reachability(self):
+        n = len(self)
+        reachable = np.isfinite(self.shortest)
+        np.fill_diagonal(reachable, False)
+        pairs = n * (n - 1)
+        unreachable = np.flatnonzero(~reachable.any(axis=0))
+        stranded = np.flatnonzero(~reachable.any(axis=1))
+        return {
+            "reachable_pairs": int(reachable.sum()),
+            "total_pairs": pairs,
+            "percent": reachable.sum() * 100 / pairs if pairs else 0,
+            # Cities no other city can fly to / that cannot fly anywhere.
+            "unreachable": [self.city_names[i] for i in unreachable],
+            "stranded": [self.city_names[i] for i in stranded],
+        }
+
+    def transit_counts(self):
+        """
+        Count, for every city, the fastest itineraries that connect through
+        it (a shortest-path betweenness measure), walking all pairs' paths
+        one hop at a time in lock-step.
+        """
+        n = len(self)
+        counts = np.zeros(n, dtype=np.int64)
+        origins, destinations = np.nonzero(
+            np.isfinite(self.shortest) & ~np.eye(n, dtype=bool))
+        hop = self.next_hop[origins, destinations]
+        while len(hop):
+            moving = hop != destinations
+            hop, destinations = hop[moving], destinations[moving]
+            counts += np.bincount(hop, minlength=n)
+            hop = self.next_hop[hop, destinations]
+        return counts
+
+    def hubs(self, limit=10):
+        """Rank cities by transit count, then by harmonic closeness."""
+        return self._hubs[:limit]
+
+    @cached_property
+    def _hubs(self):
+        n = len(self)
+        if not n:
+            return []
+        with np.errstate(divide="ignore"):
+            inverse = 1 / self.shortest
+        np.fill_diagonal(inverse, 0)
+        closeness = inverse.sum(axis=1) / max(n - 1, 1)
+        direct = np.isfinite(self.direct) & ~np.eye(n, dtype=bool)
+        degree = direct.sum(axis=0) + direct.sum(axis=1)
+        transit = self.transit_counts()
+
+        order = np.lexsort((-closeness, -transit))
+        return [
+            {
+                "city": self.city_names[i],
+                "transit": int(transit[i]),
+                "degree": int(degree[i]),
+                # Harmonic closeness in reachable cities per hour of flying.
+                "closeness": float(closeness[i] * 60),
+            }
+            for i in order
+        ]
+
+
+_network = None
+_lock = threading.Lock()
+
+
+def get_network():
+    """Return this process's route network, rebuilding it if routes changed."""
+    global _network
+    current = versions.current(versions.ROUTES)
+    network = _network
+    if network is not None and network.data_versions == current:
+        return network
+
+    with _lock:
+        if _network is None or _network.data_versions != current:
+            _network = RouteNetwork.load(current)
+        return _network
@@ -0,0 +1,509 @@
+"""
+JSON API, version 1, served under ``/api/v1/``.
+
+Each resource declares its fields together with the joins each one needs.
+A request's ``fields`` parameter (comma separated) picks the fields
+returned, and only those fields' ``select_related``/``prefetch_related``
+lookups are added, so a page costs the same few queries however long it
+is. Lists use keyset pagination on the primary key: ``after`` is the
+``next`` value of the previous page, which keeps every page a single index
+range scan however deep the client goes.
+
+POSTing one object, or ``{"data": [...]}`` with up to ``MAX_BULK_SIZE``,
+creates every entry in one transaction, or nothing if any entry is
+invalid; the response lists what was created (a booking entry is a party
+and creates one booking per passenger). Errors always look like
+``{"error": {"code": ..., "message": ..., "details": ...}}``.
+"""
+
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from django.core.exceptions import RequestDataTooBig
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from . import changes, versions
+from .bookings import FlightNotFound, SeatsUnavailable, create_group_booking
+from .fares import quote
+from .forms import FlightCreationForm, FlightRouteForm, PassengerForm
+from .models import (
+    Booking,
+    BookingItem,
+    ChangeEvent,
+    CrewAssignment,
+    Flight,
+    FlightRoute,
+    FlightSchedule,
+    ItineraryItem,
+    Passenger,
+)
+from .routers import read_from_replica
+from .writequeue import write_queue
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_BULK_SIZE = 1000
+
+# ``get`` reads the value off an instance; ``select`` and ``prefetch`` are
+# the lookups it needs loaded.
+Field = namedtuple("Field", "get select prefetch", defaults=((), ()))
+# ``validate`` turns one posted entry into something ``save`` accepts, or a
+# dict of errors; ``save`` creates a list of them and returns the objects.
+Creator = namedtuple("Creator", "validate save")
+
+
+class ApiError(Exception):
+    def __init__(self, status, code, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.details = details
+
+
+def error_response(error):
+    body = {"code": error.code, "message": error.message}
+    if error.details is not None:
+        body["details"] = error.details
+    return JsonResponse({"error": body}, status=error.status)
+
+
+def form_errors(form):
+    return {field: [str(message) for message in messages]
+            for field, messages in form.errors.items()}
+
+
+def _int(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, "invalid_parameter", f"{name} must be an integer.")
+
+
+def _date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ApiError(400, "invalid_parameter", "Dates look like 2025-01-31.")
+
+
+class Resource:
+    def __init__(self, name, model, fields, default, filters, create):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.default = default
+        # Query parameter -> (ORM lookup, parser).
+        self.filters = filters
+        self.create = create
+
+    def field_names(self, params):
+        requested = params.get("fields")
+        if not requested:
+            return self.default
+        names = list(dict.fromkeys(n.strip() for n in requested.split(",") if n.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ApiError(
+                400, "invalid_field", f"Unknown field(s) for {self.name}.",
+                {"unknown": unknown, "available": list(self.fields)})
+        return names
+
+    def queryset(self, names):
+        """The base queryset with exactly the joins ``names`` need."""
+        select = dict.fromkeys(s for name in names for s in self.fields[name].select)
+        prefetch = dict.fromkeys(p for name in names for p in self.fields[name].prefetch)
+        queryset = self.model.objects.all()
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+    def filter(self, queryset, params):
+        for param, (lookup, parse) in self.filters.items():
+            value = params.get(param)
+            if value in (None, ""):
+                continue
+            try:
+                value = parse(value)
+            except (TypeError, ValueError):
+                raise ApiError(
+                    400, "invalid_parameter", f"Invalid value for {param}.",
+                    {"parameter": param, "value": value})
+            queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+    def serialize(self, instance, names):
+        return {name: self.fields[name].get(instance) for name in names}
+
+    def page(self, params):
+        names = self.field_names(params)
+        after = _int(params, "after", 0)
+        limit = min(max(_int(params, "limit", PAGE_SIZE), 1), MAX_PAGE_SIZE)
+        pk = self.model._meta.pk.name
+        rows = list(
+            self.filter(self.queryset(names), params)
+            .filter(**{f"{pk}__gt": after})
+            .order_by(pk)[:limit + 1]
+        )
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "data": [self.serialize(row, names) for row in rows],
+            "next": rows[-1].pk if more else None,
+        }
+
+    def detail(self, params, pk):
+        names = self.field_names(params)
+        instance = self.queryset(names).filter(pk=pk).first()
+        if instance is None:
+            raise ApiError(404, "not_found", f"No {self.name} with id {pk}.")
+        return {"data": self.serialize(instance, names)}
+
+    def create_all(self, entries, names):
+        """
+        Validate and create every entry; must run inside a transaction.
+        Raises an ``ApiError`` listing each invalid entry by index.
+        """
+        errors = []
+        valid = []
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                errors.append({"index": index, "errors": {"__all__": ["Expected an object."]}})
+                continue
+            result = self.create.validate(entry)
+            if isinstance(result, dict):
+                errors.append({"index": index, "errors": result})
+            else:
+                valid.append(result)
+        if errors:
+            raise ApiError(400, "invalid", "Nothing was created.", errors)
+        created = self.create.save(valid)
+        # Re-read through the same joins a GET would use.
+        queryset = self.queryset(names).filter(pk__in=[obj.pk for obj in created])
+        return [self.serialize(obj, names) for obj in queryset.order_by("pk")]
+
+
+def _form_validator(form_class, translate=lambda entry: entry):
+    def validate(entry):
+        form = form_class(translate(entry))
+        return form if form.is_valid() else form_errors(form)
+    return validate
+
+
+def _save_passengers(forms):
+    passengers = Passenger.objects.bulk_create(form.instance for form in forms)
+    # bulk_create sends no post_save signals.
+    versions.bump(versions.PASSENGERS)
+    return passengers
+
+
+PASSENGERS = Resource(
+    name="passenger",
+    model=Passenger,
+    fields={
+        "id": Field(lambda p: p.passenger_id),
+        "first_name": Field(lambda p: p.first_name),
+        "last_name": Field(lambda p: p.last_name),
+        "birthdate": Field(lambda p: p.birthdate),
+        "gender": Field(lambda p: p.gender),
+        "bookings": Field(
+            lambda p: [b.booking_reference for b in p.booking_set.all()],
+            prefetch=("booking_set",)),
+    },
+    default=["id", "first_name", "last_name", "birthdate", "gender"],
+    filters={
+        # Exact matches use the (last_name, first_name, birthdate) index.
+        "last_name": ("last_name", str),
+        "birthdate": ("birthdate", _date),
+    },
+    create=Creator(_form_validator(PassengerForm), _save_passengers),
+)
+
+
+def _route_form_data(entry):
+    return {
+        "origin_city_name": entry.get("origin"),
+        "destination_city_name": entry.get("destination"),
+        "duration": entry.get("duration"),
+    }
+
+
+def _save_routes(forms):
+    # Few at a time; saved one by one so the usual signals fire.
+    return [form.save() for form in forms]
+
+
+ROUTES = Resource(
+    name="route",
+    model=FlightRoute,
+    fields={
+        "id": Field(lambda r: r.route_id),
+        "origin_id": Field(lambda r: r.origin_city_id),
+        "origin": Field(lambda r: r.origin_city.city_name, ("origin_city",)),
+        "destination_id": Field(lambda r: r.destination_city_id),
+        "destination": Field(lambda r: r.destination_city.city_name, ("destination_city",)),
+        "duration": Field(lambda r: r.duration),
+        "base_fare": Field(lambda r: r.base_fare),
+    },
+    default=["id", "origin_id", "origin", "destination_id", "destination", "duration"],
+    filters={
+        "origin": ("origin_city_id", int),
+        "destination": ("destination_city_id", int),
+    },
+    # FlightRouteForm resolves (and creates) cities while validating, which
+    # is why validation runs in the write transaction.
+    create=Creator(_form_validator(FlightRouteForm, _route_form_data), _save_routes),
+)
+
+
+def _flight_form_data(entry):
+    return {
+        "route": entry.get("route_id"),
+        "schedule_date": entry.get("date"),
+        "departure_time": entry.get("departure_time"),
+        "arrival_time": entry.get("arrival_time"),
+    }
+
+
+def _save_flights(forms):
+    dates = {form.cleaned_data["schedule_date"] for form in forms}
+    schedules = {s.date: s for s in FlightSchedule.objects.filter(date__in=dates)}
+    for day in dates - schedules.keys():
+        schedules[day] = FlightSchedule.objects.create(date=day)
+    flights = Flight.objects.bulk_create(
+        Flight(
+            route=form.cleaned_data["route"],
+            schedule=schedules[form.cleaned_data["schedule_date"]],
+            departure_time=form.cleaned_data["departure_time"],
+            arrival_time=form.cleaned_data["arrival_time"],
+        )
+        for form in forms
+    )
+    # bulk_create sends no post_save signals.
+    changes.record_many(Flight, flights, ChangeEvent.CREATE)
+    versions.bump(versions.FLIGHTS)
+    return flights
+
+
+def _crew(flight):
+    return [
+        {"crew_id": a.crew_id, "name": f"{a.crew.first_name} {a.crew.last_name}",
+         "role": a.crew.role}
+        for a in flight.crewassignment_set.all()
+    ]
+
+
+FLIGHTS = Resource(
+    name="flight",
+    model=Flight,
+    fields={
+        "flight_no": Field(lambda f: f.flight_no),
+        "date": Field(lambda f: f.schedule.date, ("schedule",)),
+        "departure_time": Field(lambda f: f.departure_time),
+        "arrival_time": Field(lambda f: f.arrival_time),
+        "route_id": Field(lambda f: f.route_id),
+        "origin": Field(lambda f: f.route.origin_city.city_name, ("route__origin_city",)),
+        "destination": Field(
+            lambda f: f.route.destination_city.city_name, ("route__destination_city",)),
+        "duration": Field(lambda f: f.route.duration, ("route",)),
+        "crew": Field(_crew, prefetch=(
+            Prefetch("crewassignment_set",
+                     CrewAssignment.objects.select_related("crew").order_by("pk")),
+        )),
+    },
+    default=["flight_no", "date", "departure_time", "arrival_time", "route_id",
+             "origin", "destination"],
+    filters={
+        "date": ("schedule__date", _date),
+        "route": ("route_id", int),
+        "origin": ("route__origin_city_id", int),
+        "destination": ("route__destination_city_id", int),
+    },
+    create=Creator(_form_validator(FlightCreationForm, _flight_form_data), _save_flights),
+)
+
+
+Party = namedtuple("Party", "passengers flights baggage_count has_insurance idempotency_key")
+
+
+def _validate_party(entry):
+    """A party booking: passenger ids and flight numbers, priced here."""
+    errors = {}
+    passenger_ids = entry.get("passengers")
+    flight_nos = entry.get("flights")
+    if not passenger_ids or not all(isinstance(pk, int) for pk in passenger_ids):
+        errors["passengers"] = ["A list of passenger ids is required."]
+    if not flight_nos or not all(isinstance(no, int) for no in flight_nos):
+        errors["flights"] = ["A list of flight numbers is required."]
+    baggage_count = entry.get("baggage_count", 0)
+    if not isinstance(baggage_count, int) or baggage_count < 0:
+        errors["baggage_count"] = ["Must be a whole number, 0 or more."]
+    key = entry.get("idempotency_key") or None
+    if key is not None and (not isinstance(key, str) or len(key) > 64):
+        errors["idempotency_key"] = ["At most 64 characters."]
+    if errors:
+        return errors
+
+    passengers = list(Passenger.objects.filter(passenger_id__in=passenger_ids))
+    missing = set(passenger_ids) - {p.passenger_id for p in passengers}
+    if missing:
+        errors["passengers"] = [f"Unknown passenger(s): {sorted(missing)}."]
+    known = set(Flight.objects.filter(flight_no__in=flight_nos).values_list("pk", flat=True))
+    if set(flight_nos) - known:
+        errors["flights"] = [f"Unknown flight(s): {sorted(set(flight_nos) - known)}."]
+    if errors:
+        return errors
+    return Party(
+        passengers,
+        [{"flight_id": no, "price": str(quote(no))} for no in flight_nos],
+        baggage_count,
+        bool(entry.get("has_insurance")),
+        key,
+    )
+
+
+def _save_bookings(parties):
+    bookings = []
+    for party in parties:
+        try:
+            bookings += create_group_booking(
+                party.passengers, party.flights, party.baggage_count,
+                party.has_insurance, party.idempotency_key)
+        except FlightNotFound as error:
+            # Deleted after the party was validated.
+            raise ApiError(404, "not_found", str(error))
+        except SeatsUnavailable as error:
+            raise ApiError(409, "seats_unavailable", str(error))
+    return bookings
+
+
+def _itinerary(booking):
+    return [
+        {
+            "flight_no": item.flight_id,
+            "date": item.flight.schedule.date,
+            "origin": item.flight.route.origin_city.city_name,
+            "destination": item.flight.route.destination_city.city_name,
+            "departure_time": item.flight.departure_time,
+            "cost": item.cost,
+        }
+        for item in booking.itineraryitem_set.all()
+    ]
+
+
+def _add_ons(booking):
+    return [
+        {"description": bi.item.description, "quantity": bi.quantity,
+         "subtotal": bi.subtotal_cost}
+        for bi in booking.bookingitem_set.all()
+    ]
+
+
+BOOKINGS = Resource(
+    name="booking",
+    model=Booking,
+    fields={
+        "id": Field(lambda b: b.booking_id),
+        "reference": Field(lambda b: b.booking_reference),
+        "date_booked": Field(lambda b: b.date_booked),
+        "total_cost": Field(lambda b: b.total_cost),
+        "version": Field(lambda b: b.version),
+        "passenger_id": Field(lambda b: b.passenger_id),
+        "passenger": Field(
+            lambda b: {"id": b.passenger_id, "first_name": b.passenger.first_name,
+                       "last_name": b.passenger.last_name},
+            ("passenger",)),
+        "itinerary": Field(_itinerary, prefetch=(
+            Prefetch("itineraryitem_set", ItineraryItem.objects.select_related(
+                "flight__schedule", "flight__route__origin_city",
+                "flight__route__destination_city").order_by("pk")),
+        )),
+        "add_ons": Field(_add_ons, prefetch=(
+            Prefetch("bookingitem_set",
+                     BookingItem.objects.select_related("item").order_by("pk")),
+        )),
+    },
+    default=["id", "reference", "date_booked", "total_cost", "passenger_id"],
+    filters={
+        "passenger": ("passenger_id", int),
+        "reference": ("booking_reference", str.upper),
+        "date_booked": ("date_booked", _date),
+    },
+    create=Creator(_validate_party, _save_bookings),
+)
+
+
+def _entries(request):
+    try:
+        body = json.loads(request.body or b"null")
+    except RequestDataTooBig:
+        raise ApiError(413, "too_large", "The request body is too large.")
+    except ValueError:
+        raise ApiError(400, "invalid_json", "The request body is not valid JSON.")
+    if isinstance(body, dict) and isinstance(body.get("data"), list):
+        entries = body["data"]
+    elif isinstance(body, dict):
+        entries = [body]
+    else:
+        raise ApiError(400, "invalid_json",
+                       'Send an object, or {"data": [...]} to create several.')
+    if not entries or len(entries) > MAX_BULK_SIZE:
+        raise ApiError(400, "invalid", f"Send 1 to {MAX_BULK_SIZE} entries.")
+    return entries
+
+
+def _api_view(handler):
+    def view(request, *args, **kwargs):
+        try:
+            return handler(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(error)
+    return csrf_exempt(view)
+
+
+def collection_view(resource):
+    @read_from_replica
+    def list_(request):
+        return JsonResponse(resource.page(request.GET))
+
+    def handler(request):
+        if request.method == "GET":
+            return list_(request)
+        if request.method == "POST":
+            entries = _entries(request)
+            names = resource.field_names(request.GET)
+            created = write_queue.run(resource.create_all, entries, names)
+            return JsonResponse({"data": created}, status=201)
+        raise ApiError(405, "method_not_allowed", "Use GET or POST.")
+    return _api_view(handler)
+
+
+def detail_view(resource):
+    @read_from_replica
+    def handler(request, pk):
+        if request.method != "GET":
+            raise ApiError(405, "method_not_allowed", "Use GET.")
+        return JsonResponse(resource.detail(request.GET, pk))
+    return _api_view(handler)
+
+
+def not_found(request, path=""):
+    return error_response(ApiError(404, "not_found", "No such endpoint."))
+
+
+flights = collection_view(FLIGHTS)
+flight = detail_view(FLIGHTS)
+routes = collection_view(ROUTES)
+route = detail_view(ROUTES)
+passengers = collection_view(PASSENGERS)
+passenger = detail_view(PASSENGERS)
+bookings = collection_view(BOOKINGS)
+booking = detail_view(BOOKINGS)
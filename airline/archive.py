@@ -0,0 +1,190 @@
+"""
+Move completed history out of the live tables.
+
+Bookings whose flights all departed before the retention cutoff are copied
+into ``ArchivedBooking`` and removed with the set-based delete used by the
+booking list. Past flights that no live booking still references follow,
+with their crew assignments, into ``ArchivedFlight``. Each batch runs in
+its own transaction, so the live views only ever scan current data.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .bookings import delete_bookings
+from .models import (
+    ArchivedBooking,
+    ArchivedFlight,
+    Booking,
+    CrewAssignment,
+    Flight,
+    ItineraryItem,
+)
+from .signals import delete_in_bulk
+from .writequeue import write_queue
+
+BATCH_SIZE = 1000
+
+
+def retention_cutoff(days=None):
+    if days is None:
+        days = settings.ARCHIVE_RETENTION_DAYS
+    return timezone.localdate() - timedelta(days=days)
+
+
+def closed_bookings(cutoff):
+    """Bookings with at least one flight, all departing before ``cutoff``."""
+    legs = ItineraryItem.objects.filter(booking=OuterRef("pk"))
+    return Booking.objects.filter(
+        Exists(legs),
+        ~Exists(legs.filter(flight__schedule__date__gte=cutoff)),
+    )
+
+
+def past_flights(cutoff):
+    """Flights before ``cutoff`` that no live booking still flies on."""
+    return Flight.objects.filter(schedule__date__lt=cutoff).exclude(
+        Exists(ItineraryItem.objects.filter(flight=OuterRef("pk"))))
+
+
+def _archive_booking(booking):
+    passenger = booking.passenger
+    return ArchivedBooking(
+        booking_id=booking.booking_id,
+        booking_reference=booking.booking_reference or booking.make_reference(),
+        passenger_id=passenger.passenger_id,
+        date_booked=booking.date_booked,
+        total_cost=booking.total_cost,
+        payload={
+            "passenger": {
+                "first_name": passenger.first_name,
+                "last_name": passenger.last_name,
+                "birthdate": passenger.birthdate.isoformat(),
+                "gender": passenger.gender,
+            },
+            "itinerary": [
+                {
+                    "flight_no": item.flight.flight_no,
+                    "origin": item.flight.route.origin_city.city_name,
+                    "destination": item.flight.route.destination_city.city_name,
+                    "date": item.flight.schedule.date.isoformat(),
+                    "departure": item.flight.departure_time.strftime("%H:%M"),
+                    "arrival": item.flight.arrival_time.strftime("%H:%M"),
+                    "cost": str(item.cost),
+                }
+                for item in booking.itineraryitem_set.all()
+            ],
+            "additional_items": [
+                {
+                    "description": item.item.description,
+                    "quantity": item.quantity,
+                    "subtotal": str(item.subtotal_cost),
+                }
+                for item in booking.bookingitem_set.all()
+            ],
+        },
+    )
+
+
+def _archive_flight(flight):
+    return ArchivedFlight(
+        flight_no=flight.flight_no,
+        date=flight.schedule.date,
+        route_id=flight.route_id,
+        departure_time=flight.departure_time,
+        arrival_time=flight.arrival_time,
+        payload={
+            "origin": flight.route.origin_city.city_name,
+            "destination": flight.route.destination_city.city_name,
+            "duration": flight.route.duration,
+            "crew": [
+                {
+                    "crew_id": assignment.crew_id,
+                    "name": f"{assignment.crew.first_name} {assignment.crew.last_name}",
+                    "role": assignment.crew.role,
+                    "assignment_date": assignment.assignment_date.isoformat(),
+                }
+                for assignment in flight.crewassignment_set.all()
+            ],
+        },
+    )
+
+
+def archive_booking_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive up to ``batch_size`` closed bookings; return how many."""
+    bookings = list(
+        closed_bookings(cutoff)
+        .select_related("passenger")
+        .prefetch_related(
+            "itineraryitem_set__flight__route__origin_city",
+            "itineraryitem_set__flight__route__destination_city",
+            "itineraryitem_set__flight__schedule",
+            "bookingitem_set__item",
+        )
+        .order_by("booking_id")[:batch_size]
+    )
+    if not bookings:
+        return 0
+    ArchivedBooking.objects.bulk_create(_archive_booking(b) for b in bookings)
+    return delete_bookings(
+        Booking.objects.filter(booking_id__in=[b.booking_id for b in bookings]))
+
+
+def archive_flight_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive up to ``batch_size`` unreferenced past flights; return how many."""
+    flights = list(
+        past_flights(cutoff)
+        .select_related(
+            "route__origin_city", "route__destination_city", "schedule")
+        .prefetch_related("crewassignment_set__crew")
+        .order_by("flight_no")[:batch_size]
+    )
+    if not flights:
+        return 0
+    ArchivedFlight.objects.bulk_create(_archive_flight(f) for f in flights)
+
+    flight_nos = [flight.flight_no for flight in flights]
+    # Change events and the flights version bump, as the signals would.
+    delete_in_bulk(CrewAssignment.objects.filter(flight_id__in=flight_nos))
+    delete_in_bulk(Flight.objects.filter(flight_no__in=flight_nos))
+    return len(flights)
+
+
+def archive(cutoff=None, batch_size=BATCH_SIZE):
+    """
+    Archive everything older than ``cutoff`` batch by batch, each batch in
+    its own write transaction. Returns ``(bookings, flights)`` archived.
+    """
+    cutoff = cutoff or retention_cutoff()
+    totals = []
+    for archive_batch in (archive_booking_batch, archive_flight_batch):
+        total = 0
+        while moved := write_queue.run(archive_batch, cutoff, batch_size):
+            total += moved
+        totals.append(total)
+    return tuple(totals)
+
+
+def archive_job(days=None, batch_size=BATCH_SIZE):
+    """Job: ``archive`` with the cutoff worked out when the job runs."""
+    return archive(retention_cutoff(days), batch_size)
+
+
+def find_booking(reference):
+    """
+    Look a booking up by reference in the live table, then in the archive.
+    Returns ``(booking, archived)`` with ``booking`` ``None`` when unknown.
+    """
+    reference = reference.strip().upper()
+    booking = (
+        Booking.objects.filter(booking_reference=reference)
+        .select_related("passenger")
+        .first()
+    )
+    if booking is not None:
+        return booking, False
+    archived = ArchivedBooking.objects.filter(booking_reference=reference).first()
+    return archived, archived is not None
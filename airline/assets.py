@@ -0,0 +1,290 @@
+"""
+Static asset bundling.
+
+Each entry of ``ASSET_BUNDLES`` concatenates and minifies a page's source
+files from ``static/`` into ``static/bundles/``; ``ASSET_IMAGES`` writes
+display-sized copies of raster images next to them. ``collectstatic`` then
+hashes and gzips the output like any other static file. Templates reference
+bundles by name and fall back to the individual sources when
+``ASSETS_BUNDLED`` is off.
+"""
+
+import gzip
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+BUILD_DIR = "bundles"
+
+# Characters and keywords after which a "/" starts a regular expression.
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^") | {""}
+_REGEX_KEYWORDS = ("return", "typeof", "case", "else", "in", "of", "void", "throw")
+# Characters whitespace can be removed next to.
+_PUNCTUATION = set("{}()[];,:=<>+-*/%&|!?~^.") | {""}
+# A newline after these never ends a statement.
+_CONTINUES = set("{;,([:=&|?*%<>!")
+_LITERAL = '"'
+
+
+def source_dir():
+    return Path(settings.STATICFILES_DIRS[0])
+
+
+def output_dir():
+    return source_dir() / BUILD_DIR
+
+
+def bundle_path(name):
+    return f"{BUILD_DIR}/{name}"
+
+
+def _string_end(source, i, quote):
+    while i < len(source):
+        if source[i] == "\\":
+            i += 2
+        elif source[i] == quote or source[i] == "\n":
+            return i + 1
+        else:
+            i += 1
+    return i
+
+
+def _template_end(source, i):
+    """Return (end, closed) for a template chunk starting at ``i``."""
+    while i < len(source):
+        if source[i] == "\\":
+            i += 2
+        elif source[i] == "`":
+            return i + 1, True
+        elif source.startswith("${", i):
+            return i + 2, False
+        else:
+            i += 1
+    return i, True
+
+
+def _regex_end(source, i):
+    in_class = False
+    while i < len(source):
+        c = source[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/" and not in_class:
+            i += 1
+            while i < len(source) and source[i].isalpha():
+                i += 1
+            return i
+        elif c == "\n":
+            return i
+        i += 1
+    return i
+
+
+def _split_js(source):
+    """Split JavaScript into ``(is_code, text)`` pieces, dropping comments."""
+    pieces = []
+    code = []
+    templates = []  # brace depth at which each open ${ ... } returns
+    depth = 0
+    i = 0
+
+    def flush():
+        if code:
+            pieces.append((True, "".join(code)))
+            code.clear()
+
+    def starts_regex():
+        text = "".join(code).rstrip()
+        if not text:
+            return not pieces
+        word = re.search(r"[\w$]*$", text).group()
+        return text[-1] in _REGEX_PRECEDERS or word in _REGEX_KEYWORDS
+
+    while i < len(source):
+        c = source[i]
+        if c == "`" or (c == "}" and templates and templates[-1] == depth):
+            if c == "}":
+                templates.pop()
+            end, closed = _template_end(source, i + 1)
+            if not closed:
+                templates.append(depth)
+        elif c in "'\"":
+            end = _string_end(source, i + 1, c)
+        elif source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end == -1 else end
+            continue
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = len(source) if end == -1 else end + 2
+            code.append(" ")
+            continue
+        elif c == "/" and starts_regex():
+            end = _regex_end(source, i + 1)
+        else:
+            if c == "{":
+                depth += 1
+            elif c == "}":
+                depth -= 1
+            code.append(c)
+            i += 1
+            continue
+
+        flush()
+        pieces.append((False, source[i:end]))
+        i = end
+    flush()
+    return pieces
+
+
+def _squeeze(text, before, after):
+    """
+    Collapse whitespace in a piece of code; ``before`` and ``after`` are the
+    characters bordering it (``_LITERAL`` for a literal, "" for none).
+    """
+    parts = re.split(r"(\s+)", text)
+    out = []
+    # re.split puts the whitespace runs at the odd positions.
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            out.append(part)
+            continue
+        prev = parts[index - 1][-1:] or before
+        nxt = parts[index + 1][:1] or after
+
+        if "\n" in part:
+            if prev in _CONTINUES or prev == "" or nxt in ")]}" or nxt == "":
+                continue
+            out.append("\n")
+        elif prev == nxt and prev in "+-/":
+            # a + +b, a - -b, a / /re/
+            out.append(" ")
+        elif not ({prev, nxt} & (_PUNCTUATION | {_LITERAL})):
+            out.append(" ")
+    return "".join(out)
+
+
+def minify_js(source):
+    """
+    Strip comments and redundant whitespace from JavaScript. Newlines that
+    may end a statement are kept, so automatic semicolon insertion still
+    applies; strings, template and regular-expression literals are copied
+    unchanged.
+    """
+    pieces = _split_js(source)
+    out = []
+    for index, (is_code, text) in enumerate(pieces):
+        if not is_code:
+            out.append(text)
+            continue
+        before = _LITERAL if index else ""
+        after = _LITERAL if index + 1 < len(pieces) else ""
+        out.append(_squeeze(text, before, after))
+    return "".join(out).strip() + "\n"
+
+
+_CSS_STRING = r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+_CSS_COMMENTS = re.compile(_CSS_STRING + r"|/\*.*?\*/", re.S)
+_CSS_STRINGS = re.compile(_CSS_STRING)
+
+
+def minify_css(source):
+    """
+    Strip comments and redundant whitespace from CSS. Spaces before ":"
+    (descendant pseudo-class selectors) and around "+"/"-" (``calc()``)
+    are kept.
+    """
+    source = _CSS_COMMENTS.sub(lambda match: match.group(1) or " ", source)
+    out = []
+    position = 0
+    for match in _CSS_STRINGS.finditer(source):
+        out.append(_squeeze_css(source[position:match.start()]))
+        out.append(match.group())
+        position = match.end()
+    out.append(_squeeze_css(source[position:]))
+    return "".join(out).strip() + "\n"
+
+
+def _squeeze_css(text):
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    return re.sub(r":\s+", ":", text).replace(";}", "}")
+
+
+def minify(name, source):
+    if name.endswith(".js"):
+        return minify_js(source)
+    if name.endswith(".css"):
+        return minify_css(source)
+    return source
+
+
+def build_bundle(name, sources):
+    """Concatenate and minify ``sources`` into the bundle ``name``."""
+    separator = ";\n" if name.endswith(".js") else "\n"
+    content = separator.join(
+        minify(name, (source_dir() / source).read_text(encoding="utf-8"))
+        for source in sources
+    )
+    path = output_dir() / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+def build_image(name, source, width):
+    """
+    Write ``source`` scaled down to at most ``width`` pixels wide. PNGs are
+    reduced to a 256-colour palette, which flat artwork like the logo
+    survives unchanged at a fraction of the size.
+    """
+    from PIL import Image
+
+    path = output_dir() / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with Image.open(source_dir() / source) as image:
+        if image.width > width:
+            image = image.resize(
+                (width, round(image.height * width / image.width)),
+                Image.LANCZOS,
+            )
+        if path.suffix == ".png":
+            image = image.quantize(256, method=Image.Quantize.FASTOCTREE)
+        image.save(path, optimize=True)
+    return path
+
+
+def build():
+    """Write every configured bundle and image; return their paths by name."""
+    built = {}
+    for name, sources in settings.ASSET_BUNDLES.items():
+        built[name] = build_bundle(name, sources)
+    for name, (source, width) in settings.ASSET_IMAGES.items():
+        built[name] = build_image(name, source, width)
+    return built
+
+
+def weigh(paths):
+    """Return ``(raw bytes, gzipped bytes)`` for the given files."""
+    raw = compressed = 0
+    for path in paths:
+        content = Path(path).read_bytes()
+        raw += len(content)
+        if path.suffix in (".js", ".css", ".svg"):
+            compressed += min(len(content), len(gzip.compress(content, 9, mtime=0)))
+        else:
+            compressed += len(content)
+    return raw, compressed
+
+
+def sources(name):
+    """Source files (relative to ``static/``) behind a bundle or image."""
+    if name in settings.ASSET_BUNDLES:
+        return list(settings.ASSET_BUNDLES[name])
+    return [settings.ASSET_IMAGES[name][0]]
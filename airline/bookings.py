@@ -0,0 +1,184 @@
+"""
+Booking write operations shared by the views and management commands.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from . import changes, versions
+from .fares import ADDON_DEFAULTS, BAGGAGE, INSURANCE
+from .models import (
+    AdditionalItem,
+    Booking,
+    BookingItem,
+    ChangeEvent,
+    Flight,
+    IdempotencyKey,
+    ItineraryItem,
+)
+from .signals import delete_in_bulk
+
+
+def _addon(description):
+    item, _ = AdditionalItem.objects.get_or_create(
+        description=description,
+        defaults={"cost_per_unit": ADDON_DEFAULTS[description]},
+    )
+    return item
+
+
+class SeatsUnavailable(Exception):
+    """Raised when a party does not fit on one of its flights."""
+
+    def __init__(self, flight_nos):
+        self.flight_nos = flight_nos
+        super().__init__(
+            "Not enough seats left on "
+            + ", ".join(f"MA{flight_no:03d}" for flight_no in flight_nos)
+        )
+
+
+class FlightNotFound(Exception):
+    """Raised when a selected flight no longer exists."""
+
+    def __init__(self, flight_nos):
+        self.flight_nos = flight_nos
+        super().__init__(
+            "No such flight: "
+            + ", ".join(f"MA{flight_no:03d}" for flight_no in flight_nos)
+        )
+
+
+def check_seats(flight_nos, party_size):
+    """
+    Raise ``SeatsUnavailable`` unless every flight has ``party_size`` seats
+    left, using one grouped count for all flights.
+    """
+    capacity = settings.FLIGHT_SEAT_CAPACITY
+    if not capacity:
+        return
+    booked = dict(
+        ItineraryItem.objects.filter(flight__in=flight_nos)
+        .values("flight")
+        .annotate(seats=Count("pk"))
+        .values_list("flight", "seats")
+    )
+    full = sorted(
+        flight_no for flight_no in set(flight_nos)
+        if booked.get(flight_no, 0) + party_size > capacity
+    )
+    if full:
+        raise SeatsUnavailable(full)
+
+
+def create_group_booking(passengers, flights, baggage_count=0,
+                         has_insurance=False, idempotency_key=None):
+    """
+    Create one booking per passenger for the session's selected flights
+    (dicts with ``flight_id`` and ``price``) plus any add-ons, which apply
+    to each passenger and are priced from the add-on catalogue.
+
+    Seats are checked once for the whole party and every row is inserted
+    with ``bulk_create``. When ``idempotency_key`` was already used, the
+    bookings created under it are returned and nothing is inserted. Must
+    run inside a transaction; views call it through the write queue.
+    """
+    key = None
+    if idempotency_key:
+        key, created = IdempotencyKey.objects.get_or_create(pk=idempotency_key)
+        if not created:
+            return list(key.bookings.order_by("booking_id"))
+
+    flight_nos = [int(f["flight_id"]) for f in flights]
+    flight_map = Flight.objects.in_bulk(flight_nos)
+    if len(flight_map) != len(set(flight_nos)):
+        raise FlightNotFound(sorted(set(flight_nos) - set(flight_map)))
+    check_seats(flight_nos, len(passengers))
+
+    flights_cost = sum(Decimal(str(f.get("price", 0))) for f in flights)
+
+    addons = []
+    if baggage_count > 0:
+        addons.append((_addon(BAGGAGE), baggage_count))
+    if has_insurance:
+        addons.append((_addon(INSURANCE), 1))
+    additional_cost = sum(
+        (item.cost_per_unit * quantity for item, quantity in addons),
+        Decimal("0.00"),
+    )
+
+    today = timezone.now().date()
+    bookings = Booking.objects.bulk_create(
+        Booking(
+            date_booked=today,
+            total_cost=flights_cost + additional_cost,
+            passenger=passenger,
+            idempotency_key=key,
+        )
+        for passenger in passengers
+    )
+    Booking.assign_references(
+        Booking.objects.filter(booking_id__in=[b.booking_id for b in bookings]))
+    for booking in bookings:
+        booking.booking_reference = booking.make_reference()
+    items = ItineraryItem.objects.bulk_create(
+        ItineraryItem(
+            booking=booking,
+            flight=flight_map[int(flight_data["flight_id"])],
+            cost=Decimal(str(flight_data["price"])),
+        )
+        for booking in bookings
+        for flight_data in flights
+    )
+    BookingItem.objects.bulk_create(
+        BookingItem(
+            booking=booking,
+            item=item,
+            quantity=quantity,
+            subtotal_cost=item.cost_per_unit * quantity,
+        )
+        for booking in bookings
+        for item, quantity in addons
+    )
+
+    # bulk_create sends no post_save signals.
+    changes.record_many(Booking, bookings, ChangeEvent.CREATE)
+    changes.record_many(ItineraryItem, items, ChangeEvent.CREATE)
+    versions.bump(versions.BOOKINGS)
+    return bookings
+
+
+def create_booking(passenger, flights, baggage_count=0, has_insurance=False,
+                   idempotency_key=None):
+    """Create a booking for a single passenger; see ``create_group_booking``."""
+    return create_group_booking(
+        [passenger], flights, baggage_count, has_insurance, idempotency_key)[0]
+
+
+DELETE_BATCH_SIZE = 5000
+
+
+def delete_bookings(bookings):
+    """
+    Delete the bookings matched by the ``bookings`` queryset together with
+    their itinerary and add-on rows, using one set-based DELETE per table
+    and batch instead of Django's per-object cascade collection. Returns
+    the number of bookings deleted.
+
+    Must run inside a transaction; views call it through the write queue.
+    """
+    # Resolve the ids first: the queryset may filter on the child rows
+    # that are deleted before the bookings themselves.
+    booking_ids = list(bookings.order_by().values_list("booking_id", flat=True))
+    for start in range(0, len(booking_ids), DELETE_BATCH_SIZE):
+        batch = booking_ids[start:start + DELETE_BATCH_SIZE]
+        # Change events, version bumps and pass files, as the signals would.
+        for model in (BookingItem, ItineraryItem, Booking):
+            delete_in_bulk(model.objects.filter(booking_id__in=batch))
+
+    if booking_ids:
+        versions.bump(versions.BOOKINGS)
+    return len(booking_ids)
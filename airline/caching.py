@@ -0,0 +1,131 @@
+"""
+Stampede-safe caching for hot computed values.
+
+``cached(name, key, compute, ...)`` keeps ``compute()``'s result in the
+default cache together with when it goes stale and the data versions it was
+computed from, so a write makes entries stale without deleting them:
+
+- A fresh entry is returned as is, except that close to its expiry each
+  request refreshes it early with a rising probability (XFetch), so a hot
+  key is normally recomputed by one request before it ever goes stale.
+- A stale entry (past its TTL, or computed from older data versions) is
+  still served, for up to ``stale_ttl`` more seconds, while exactly one
+  request recomputes it.
+- On a miss one request per key computes the value (single flight: an
+  atomic ``cache.add`` lock, shared by every process using the cache) and
+  concurrent requests wait briefly for its result instead of computing it
+  again.
+
+Hits, stale hits, misses, coalesced waits and refreshes are counted per
+name in this process; ``stats()`` returns them.
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+
+from django.core.cache import cache
+
+from . import versions
+
+# Longest a computation may hold a key's lock before another may take over.
+LOCK_TIMEOUT = 30
+# How long a miss waits for another request's computation, and how often it
+# looks.
+WAIT = 2.0
+POLL_INTERVAL = 0.02
+# Early-refresh aggressiveness; 1 is the XFetch default.
+BETA = 1.0
+
+Entry = namedtuple("Entry", "value stale_at delta data_versions")
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def _count(name, event):
+    with _stats_lock:
+        _stats[name][event] += 1
+
+
+def _time(name, seconds):
+    with _stats_lock:
+        _stats[name]["compute_ms"] += round(seconds * 1000)
+
+
+def stats():
+    """Per-name counters for this process."""
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in sorted(_stats.items())}
+
+
+def _cache_key(name, key):
+    key = f"{name}:{key}"
+    if len(key) > 200:
+        key = f"{name}:{hashlib.sha1(key.encode()).hexdigest()}"
+    return f"swr:{key}"
+
+
+def _compute(name, cache_key, compute, ttl, stale_ttl, data_versions):
+    started = time.perf_counter()
+    value = compute()
+    delta = time.perf_counter() - started
+    _time(name, delta)
+    cache.set(
+        cache_key,
+        Entry(value, time.time() + ttl, delta, data_versions),
+        ttl + stale_ttl,
+    )
+    return value
+
+
+def cached(name, key, compute, *, ttl, stale_ttl=None, families=()):
+    """
+    Return ``compute()``'s value for ``key`` under ``name``, recomputing it
+    at most once at a time. Entries go stale after ``ttl`` seconds or when
+    a data version in ``families`` moves on, and are served stale for up to
+    ``stale_ttl`` (default ``ttl``) seconds while being refreshed.
+    """
+    stale_ttl = ttl if stale_ttl is None else stale_ttl
+    cache_key = _cache_key(name, key)
+    lock_key = f"{cache_key}:lock"
+    data_versions = versions.current(*families) if families else None
+    refresh = (name, cache_key, compute, ttl, stale_ttl, data_versions)
+
+    entry = cache.get(cache_key)
+    if entry is not None:
+        now = time.time()
+        stale = now >= entry.stale_at or entry.data_versions != data_versions
+        # XFetch: refresh early with a probability that grows as expiry
+        # nears, scaled by how long the value took to compute.
+        early = not stale and (
+            now - entry.delta * BETA * math.log(1 - random.random()) >= entry.stale_at)
+        if (stale or early) and cache.add(lock_key, 1, LOCK_TIMEOUT):
+            _count(name, "stale_refreshes" if stale else "early_refreshes")
+            try:
+                return _compute(*refresh)
+            finally:
+                cache.delete(lock_key)
+        _count(name, "stale_hits" if stale else "hits")
+        return entry.value
+
+    _count(name, "misses")
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Someone is computing it already; wait for their result.
+        deadline = time.monotonic() + WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                _count(name, "coalesced")
+                return entry.value
+        # The other computation is slow or died; do it here after all.
+        _count(name, "wait_timeouts")
+        return _compute(*refresh)
+    try:
+        return _compute(*refresh)
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,199 @@
+"""
+Change feed for bookings, itineraries, flights and crew assignments.
+
+Every write to those tables appends a ``ChangeEvent`` in the same
+transaction: saves and deletes through signal handlers, and the bulk
+paths (``create_group_booking``, ``delete_bookings``, the archiver), which
+send no signals, through ``record_many``. Downstream readers page through
+the events by id with ``read``, acknowledge what they processed, and
+``compact`` drops events every registered consumer has acknowledged.
+
+Writes are serialised on SQLite, so events commit in id order and a
+cursor never skips one. Other databases hand ids out at insert but show
+rows at commit, so a slow transaction can commit an id below one a reader
+has already passed; there ``read`` holds events back until they are
+``settings.CHANGE_FEED_SETTLE`` seconds old, which must exceed the longest
+write transaction.
+
+The HTTP endpoints are wrapped in ``require_feed_access``: readers present
+``settings.CHANGE_FEED_TOKEN`` as a bearer token, or are signed-in staff.
+"""
+
+import hmac
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max, Min
+from django.db.models.functions import Greatest
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.utils import timezone
+
+from .models import (
+    Booking,
+    ChangeEvent,
+    CrewAssignment,
+    FeedConsumer,
+    Flight,
+    ItineraryItem,
+)
+
+ENTITIES = {
+    Booking: "booking",
+    ItineraryItem: "itinerary_item",
+    Flight: "flight",
+    CrewAssignment: "crew_assignment",
+}
+
+BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+
+
+def snapshot(instance):
+    if isinstance(instance, Booking) and hasattr(instance.version, "resolve_expression"):
+        # Booking.save() bumped the version with an UPDATE expression.
+        instance.refresh_from_db(fields=["version"])
+    payload = {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+    }
+    if isinstance(instance, Booking) and not instance.booking_reference:
+        # Booking.save() fills the reference in right after this event.
+        payload["booking_reference"] = instance.make_reference()
+    return payload
+
+
+def _event(instance, action):
+    return ChangeEvent(
+        entity=ENTITIES[type(instance)],
+        object_id=instance.pk,
+        action=action,
+        payload=None if action == ChangeEvent.DELETE else snapshot(instance),
+    )
+
+
+def record(instance, action):
+    _event(instance, action).save()
+
+
+def record_many(model, rows, action):
+    """
+    Append one event per row for a bulk write: model instances for creates
+    and updates, primary keys for deletes.
+    """
+    if action == ChangeEvent.DELETE:
+        events = (
+            ChangeEvent(entity=ENTITIES[model], object_id=pk, action=action)
+            for pk in rows
+        )
+    else:
+        events = (_event(instance, action) for instance in rows)
+    ChangeEvent.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+
+def _commits_in_id_order(using):
+    return connections[using].vendor == "sqlite"
+
+
+def read(after=0, limit=BATCH_SIZE, entities=None):
+    """Return up to ``limit`` events with ids above ``after``, oldest first."""
+    events = ChangeEvent.objects.filter(event_id__gt=after)
+    if not _commits_in_id_order(events.db):
+        settled = timezone.now() - timedelta(seconds=settings.CHANGE_FEED_SETTLE)
+        events = events.filter(created_at__lte=settled)
+    if entities:
+        events = events.filter(entity__in=entities)
+    return list(events.order_by("event_id")[:min(limit, MAX_BATCH_SIZE)])
+
+
+def as_dict(event):
+    return {
+        "id": event.event_id,
+        "entity": event.entity,
+        "object_id": event.object_id,
+        "action": event.action,
+        "payload": event.payload,
+        "created_at": event.created_at,
+    }
+
+
+def cursor(consumer):
+    """The last event ``consumer`` acknowledged (0 for a new consumer)."""
+    return (
+        FeedConsumer.objects.filter(name=consumer)
+        .values_list("acked_event_id", flat=True).first()
+        or 0
+    )
+
+
+def ack(consumer, event_id):
+    """
+    Move ``consumer``'s cursor forward to ``event_id``; never backwards, and
+    never past the newest event, so ``compact`` cannot drop events the
+    consumer has not read.
+    """
+    with transaction.atomic():
+        newest = ChangeEvent.objects.aggregate(newest=Max("event_id"))["newest"]
+        event_id = min(event_id, newest or 0)
+        _, created = FeedConsumer.objects.get_or_create(
+            name=consumer, defaults={"acked_event_id": event_id})
+        if not created:
+            FeedConsumer.objects.filter(name=consumer).update(
+                acked_event_id=Greatest("acked_event_id", event_id))
+
+
+def compact():
+    """
+    Delete events every registered consumer has acknowledged. With no
+    consumers registered nothing is deleted. Returns the number removed.
+    """
+    horizon = FeedConsumer.objects.aggregate(horizon=Min("acked_event_id"))["horizon"]
+    if not horizon:
+        return 0
+    # Events have no relations or signals, so this is a single DELETE.
+    deleted, _ = ChangeEvent.objects.filter(event_id__lte=horizon).delete()
+    return deleted
+
+
+def _has_token(request):
+    token = settings.CHANGE_FEED_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+def _denied(request, user):
+    """``None`` if the request may use the feed, else the error response."""
+    if _has_token(request):
+        return None
+    if not user.is_authenticated:
+        response = JsonResponse({"error": "Authentication required"}, status=401)
+        response.headers["WWW-Authenticate"] = "Bearer"
+        return response
+    if not (user.is_active and user.is_staff):
+        return JsonResponse({"error": "Staff only"}, status=403)
+    # The endpoints are csrf_exempt for token clients; a browser session
+    # must still pass the check.
+    return CsrfViewMiddleware(lambda request: None).process_view(
+        request, None, (), {})
+
+
+def require_feed_access(view):
+    """Serve the view to bearer-token clients and signed-in staff only."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            denied = _denied(request, await request.auser())
+            if denied is not None:
+                return denied
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            denied = _denied(request, request.user)
+            if denied is not None:
+                return denied
+            return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,166 @@
+"""
+Shared change feed behind the live departures board.
+
+A single background task per process polls today's flights once per
+``DEPARTURES_POLL_INTERVAL`` seconds, diffs the result against the previous
+snapshot and fans the changes out to every connected board, so the cost of
+the board does not grow with the number of open dashboards.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Flight
+
+
+def _flight_status(flight, now):
+    day = flight.schedule.date
+    departure = timezone.make_aware(datetime.combine(day, flight.departure_time))
+    arrival = timezone.make_aware(datetime.combine(day, flight.arrival_time))
+    if arrival < departure:
+        # Overnight flight: it lands the next day.
+        arrival += timedelta(days=1)
+    if now >= arrival:
+        return "Landed"
+    if now >= departure:
+        return "Departed"
+    return "Scheduled"
+
+
+def load_departures():
+    """Return today's flights keyed by flight number, in board order."""
+    now = timezone.localtime()
+    flights = (
+        Flight.objects.filter(schedule__date=timezone.localdate())
+        .select_related("route__origin_city", "route__destination_city", "schedule")
+        .annotate(
+            crew_total=Count("crewassignment", distinct=True),
+            booked=Count("itineraryitem", distinct=True),
+        )
+        .order_by("departure_time", "flight_no")
+    )
+
+    capacity = settings.FLIGHT_SEAT_CAPACITY
+    return {
+        flight.flight_no: {
+            "flight_no": flight.flight_no,
+            "flight_no_formatted": f"MA{flight.flight_no:03d}",
+            "origin": flight.route.origin_city.city_name,
+            "destination": flight.route.destination_city.city_name,
+            "departure": flight.departure_time.strftime("%H:%M"),
+            "arrival": flight.arrival_time.strftime("%H:%M"),
+            "status": _flight_status(flight, now),
+            "crew_total": flight.crew_total,
+            "booked": flight.booked,
+            "load_factor": round(flight.booked * 100 / capacity) if capacity else 0,
+        }
+        for flight in flights
+    }
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class DepartureFeed:
+    """Polls the database on behalf of all subscribers and broadcasts diffs."""
+
+    queue_size = 100
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.snapshot = None
+        self._subscribers = set()
+        self._task = None
+
+    def get_interval(self):
+        return self.interval or settings.DEPARTURES_POLL_INTERVAL
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def current(self):
+        """Return the latest snapshot, polling only when the feed is idle."""
+        if not self.running or self.snapshot is None:
+            self.snapshot = await sync_to_async(load_departures)()
+        return self.snapshot
+
+    async def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        snapshot = await self.current()
+        queue.put_nowait(("snapshot", list(snapshot.values())))
+        self._subscribers.add(queue)
+
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _publish(self, event, data):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # A client that cannot keep up is disconnected; its
+                # EventSource reconnects and starts again from a snapshot.
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _run(self):
+        while self._subscribers:
+            await asyncio.sleep(self.get_interval())
+            if not self._subscribers:
+                break
+
+            previous = self.snapshot or {}
+            try:
+                current = await sync_to_async(load_departures)()
+            except Exception:
+                # Keep serving the last snapshot; the next poll retries.
+                continue
+            self.snapshot = current
+
+            changed = [
+                row for flight_no, row in current.items()
+                if previous.get(flight_no) != row
+            ]
+            removed = [
+                flight_no for flight_no in previous if flight_no not in current
+            ]
+
+            if changed:
+                self._publish("flights", changed)
+            if removed:
+                self._publish("removed", removed)
+            if not (changed or removed):
+                self._publish("ping", None)
+
+    async def stream(self):
+        queue = await self.subscribe()
+        try:
+            yield f"retry: {int(self.get_interval() * 1000)}\n\n"
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                event, data = message
+                if event == "ping":
+                    yield ": ping\n\n"
+                else:
+                    yield format_event(event, data)
+        finally:
+            self.unsubscribe(queue)
+
+
+feed = DepartureFeed()
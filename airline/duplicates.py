@@ -0,0 +1,245 @@
+"""
+Duplicate passenger detection and merging.
+
+Comparing every passenger with every other is O(n²). Instead passengers
+are read once in birthdate order (on the birthdate index) and blocked by
+birthdate plus normalized surname ("De la Cruz" and "DELA CRUZ" share a
+block); only first names within a block are scored. Blocks are tiny, so a
+scan is linear in the table size and holds one birthdate's passengers in
+memory at a time.
+
+Pairs scoring at least ``THRESHOLD`` are stored as ``DuplicateCandidate``
+rows for review. ``merge`` re-points a duplicate's bookings (live and
+archived) to the record being kept in bulk and deletes the duplicate.
+"""
+
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from difflib import SequenceMatcher
+from itertools import combinations, groupby, islice
+from operator import itemgetter
+
+from django.db.models import F
+
+from . import changes, versions
+from .models import (
+    ArchivedBooking,
+    Booking,
+    ChangeEvent,
+    DuplicateCandidate,
+    Passenger,
+)
+from .writequeue import write_queue
+
+THRESHOLD = 0.85
+# Score for names that differ only by initials, short forms or a dropped
+# middle name ("Maria Elena" / "Ma. Elena" / "Maria E." / "Maria").
+INITIALS_SCORE = 0.9
+# Larger blocks are placeholder or test data, not people; they are skipped
+# rather than compared pairwise.
+MAX_BLOCK_SIZE = 200
+CHUNK_SIZE = 10000
+BATCH_SIZE = 1000
+
+NON_LETTERS = re.compile(r"[^a-z]+")
+
+
+def normalize(name):
+    """Lowercase ASCII letters and single spaces: "Peña-Cruz" -> "pena cruz"."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    letters = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(NON_LETTERS.split(letters)).strip()
+
+
+def surname_key(last_name):
+    return normalize(last_name).replace(" ", "")
+
+
+def _abbreviated(token):
+    # Initials and short forms such as "Ma." for Maria.
+    return len(token) <= 2
+
+
+def _same_token(a, b):
+    return (
+        a == b
+        or (_abbreviated(a) and b.startswith(a))
+        or (_abbreviated(b) and a.startswith(b))
+    )
+
+
+def score(a, b, cutoff=0.0):
+    """
+    Similarity of two normalized first names from 0 to 1. Returns 0 as soon
+    as the score is known to be below ``cutoff``.
+    """
+    if a == b:
+        return 1.0
+    short, long = sorted((a.split(), b.split()), key=len)
+    if short and all(_same_token(x, y) for x, y in zip(short, long)):
+        return INITIALS_SCORE
+    if any(
+        (_abbreviated(x) or _abbreviated(y)) and not _same_token(x, y)
+        for x, y in zip(short, long)
+    ):
+        # "Juan Carlos B." and "Juan Carlos C." are different people.
+        return 0.0
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    # Cheap upper bounds first; most pairs in a block stop here.
+    if matcher.real_quick_ratio() < cutoff or matcher.quick_ratio() < cutoff:
+        return 0.0
+    return matcher.ratio()
+
+
+class Scan:
+    def __init__(self):
+        self.passengers = 0
+        self.blocks = 0
+        self.skipped_blocks = 0
+        self.comparisons = 0
+        self.found = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return {
+            "passengers": self.passengers,
+            "blocks": self.blocks,
+            "skipped_blocks": self.skipped_blocks,
+            "comparisons": self.comparisons,
+            "found": self.found,
+            "elapsed": round(self.elapsed, 2),
+        }
+
+
+def blocks(rows, scan):
+    """
+    Group ``(passenger_id, last_name, first_name, birthdate, gender)`` rows,
+    sorted by birthdate, into blocks of two or more passengers sharing a
+    birthdate and normalized surname.
+    """
+    for _, day in groupby(rows, key=itemgetter(3)):
+        by_surname = defaultdict(list)
+        for row in day:
+            scan.passengers += 1
+            by_surname[surname_key(row[1])].append(row)
+        for block in by_surname.values():
+            if len(block) < 2:
+                continue
+            if len(block) > MAX_BLOCK_SIZE:
+                scan.skipped_blocks += 1
+                continue
+            scan.blocks += 1
+            yield block
+
+
+def candidates(rows, threshold=THRESHOLD, scan=None):
+    """Yield ``(kept_id, duplicate_id, score)`` for similar pairs in ``rows``."""
+    scan = scan or Scan()
+    for block in blocks(rows, scan):
+        named = sorted((row[0], normalize(row[2]), row[4]) for row in block)
+        for (kept, first, gender), (other, other_first, other_gender) in (
+            combinations(named, 2)
+        ):
+            if gender != other_gender:
+                continue
+            scan.comparisons += 1
+            similarity = score(first, other_first, threshold)
+            if similarity >= threshold:
+                scan.found += 1
+                yield kept, other, similarity
+
+
+def _store(batch):
+    # Pairs already stored, including dismissed ones, are left as they are.
+    DuplicateCandidate.objects.bulk_create(
+        [
+            DuplicateCandidate(passenger_id=kept, duplicate_id=other, score=similarity)
+            for kept, other, similarity in batch
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _clear():
+    # Candidates have no relations or signals, so this is a single DELETE.
+    DuplicateCandidate.objects.filter(dismissed=False).delete()
+
+
+def find_duplicates(threshold=THRESHOLD):
+    """
+    Job: rescan every passenger and replace the pending candidates (dismissed
+    pairs are kept). Returns the scan statistics.
+    """
+    scan = Scan()
+    rows = (
+        Passenger.objects.order_by("birthdate", "passenger_id")
+        .values_list("passenger_id", "last_name", "first_name", "birthdate", "gender")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    found = candidates(rows, threshold, scan)
+    write_queue.run(_clear)
+    while batch := list(islice(found, BATCH_SIZE)):
+        write_queue.run(_store, batch)
+    scan.elapsed = time.perf_counter() - scan.started
+    return scan.as_dict()
+
+
+def merge(keep, duplicates):
+    """
+    Fold the ``duplicates`` passenger ids into ``keep``: their bookings and
+    archived bookings are re-pointed in bulk and the passengers deleted.
+    Must run inside a transaction; returns the number of bookings moved.
+    """
+    duplicates = [pk for pk in duplicates if pk != keep]
+    if not Passenger.objects.filter(pk=keep).exists():
+        raise Passenger.DoesNotExist(f"Passenger {keep} does not exist.")
+    bookings = Booking.objects.filter(passenger_id__in=duplicates)
+    booking_ids = list(bookings.values_list("pk", flat=True))
+    # The passenger's name is on the booking card.
+    bookings.update(passenger_id=keep, version=F("version") + 1)
+    ArchivedBooking.objects.filter(passenger_id__in=duplicates).update(
+        passenger_id=keep)
+    # update() sends no post_save signals.
+    changes.record_many(
+        Booking, Booking.objects.filter(pk__in=booking_ids), ChangeEvent.UPDATE)
+    versions.bump(versions.BOOKINGS)
+    Passenger.objects.filter(pk__in=duplicates).delete()
+    return len(booking_ids)
+
+
+def groups(pairs):
+    """Connected groups of ``(kept_id, duplicate_id)`` pairs, as sorted lists."""
+    parent = {}
+
+    def root(pk):
+        parent.setdefault(pk, pk)
+        while parent[pk] != pk:
+            parent[pk] = parent[parent[pk]]
+            pk = parent[pk]
+        return pk
+
+    for a, b in pairs:
+        parent[max(root(a), root(b))] = min(root(a), root(b))
+    members = defaultdict(list)
+    for pk in list(parent):
+        members[root(pk)].append(pk)
+    return [sorted(group) for group in members.values()]
+
+
+def merge_candidates(min_score=1.0):
+    """
+    Merge every pending candidate pair scoring at least ``min_score``, each
+    group of linked passengers into its oldest record, one transaction per
+    group. Returns ``(passengers merged, bookings moved)``.
+    """
+    pairs = DuplicateCandidate.objects.filter(
+        dismissed=False, score__gte=min_score
+    ).values_list("passenger_id", "duplicate_id")
+    merged = moved = 0
+    for group in groups(pairs.iterator(chunk_size=CHUNK_SIZE)):
+        moved += write_queue.run(merge, group[0], group[1:])
+        merged += len(group) - 1
+    return merged, moved
@@ -0,0 +1,244 @@
+"""
+Rule-based fare engine.
+
+Active ``FareRule`` rows and the add-on catalogue are compiled once per
+process and recompiled when a write bumps the fares data version. Pricing
+works on timetable positions, so a whole search result is priced with
+array operations and no per-flight queries; load factors come from the
+timetable's booked-seat column. Prices start from the route's base fare, so
+a sale at a discounted fare does not discount the next one.
+
+The fare calendar reduces a route's priced flights to the lowest fare per
+day and caches the result per route and month.
+"""
+
+import threading
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import versions
+from .models import AdditionalItem, FareRule
+from .timetable import get_timetable
+
+BAGGAGE = "Additional Baggage Allowance (5kg)"
+INSURANCE = "Travel Insurance"
+
+# Prices used until the add-on has been priced in the catalogue.
+ADDON_DEFAULTS = {
+    BAGGAGE: Decimal("237.00"),
+    INSURANCE: Decimal("208.00"),
+}
+
+Rule = namedtuple(
+    "Rule",
+    "route_id first_date last_date min_days max_days min_load max_load "
+    "fare_cents multiplier",
+)
+
+
+def _ordinal(value):
+    return value.toordinal() if value is not None else None
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+class FareEngine:
+    def __init__(self, rules, addons, data_versions=None):
+        self.rules = rules
+        self.addons = addons
+        self.data_versions = data_versions
+
+    @classmethod
+    def load(cls, data_versions=None):
+        rules = [
+            Rule(
+                route_id,
+                _ordinal(valid_from),
+                _ordinal(valid_until),
+                min_days,
+                max_days,
+                _float(min_load),
+                _float(max_load),
+                int(fare * 100) if fare is not None else None,
+                float(multiplier),
+            )
+            for (
+                route_id, valid_from, valid_until, min_days, max_days,
+                min_load, max_load, fare, multiplier,
+            ) in FareRule.objects.filter(is_active=True).values_list(
+                "route_id",
+                "valid_from",
+                "valid_until",
+                "min_days_before",
+                "max_days_before",
+                "min_load_factor",
+                "max_load_factor",
+                "fare",
+                "multiplier",
+            )
+        ]
+        addons = dict(
+            AdditionalItem.objects.filter(
+                description__in=ADDON_DEFAULTS).values_list(
+                "description", "cost_per_unit")
+        )
+        return cls(rules, addons, data_versions)
+
+    def addon_price(self, description):
+        return self.addons.get(description, ADDON_DEFAULTS[description])
+
+    def price(self, timetable, positions, today=None):
+        """Return fares in cents for ``positions`` of ``timetable``."""
+        positions = np.asarray(positions, dtype=np.intp)
+        # Rules work from the route's base fare, never from a sold fare they
+        # produced themselves; flights without one keep their last sold fare
+        # until a rule sets a fare.
+        fares = timetable.base_cents[positions].astype(np.float64)
+        priced = fares > 0
+        if not self.rules or not len(positions):
+            return np.where(priced, timetable.base_cents[positions],
+                            timetable.fare_cents[positions])
+
+        today = (today or timezone.localdate()).toordinal()
+        capacity = settings.FLIGHT_SEAT_CAPACITY
+        route = timetable.route_id[positions]
+        dates = timetable.date_ordinal[positions]
+        days = dates - today
+        load = (
+            timetable.booked[positions] / capacity if capacity
+            else np.zeros(len(positions))
+        )
+
+        for rule in self.rules:
+            mask = np.ones(len(positions), dtype=bool)
+            if rule.route_id is not None:
+                mask &= route == rule.route_id
+            if rule.first_date is not None:
+                mask &= dates >= rule.first_date
+            if rule.last_date is not None:
+                mask &= dates <= rule.last_date
+            if rule.min_days is not None:
+                mask &= days >= rule.min_days
+            if rule.max_days is not None:
+                mask &= days <= rule.max_days
+            if rule.min_load is not None:
+                mask &= load >= rule.min_load
+            if rule.max_load is not None:
+                mask &= load < rule.max_load
+            if rule.fare_cents is not None:
+                fares[mask] = rule.fare_cents
+                priced |= mask
+            fares[mask & priced] *= rule.multiplier
+        fares[~priced] = timetable.fare_cents[positions[~priced]]
+        return np.rint(fares).astype(np.int64)
+
+
+_engine = None
+_lock = threading.Lock()
+
+
+def get_fare_engine():
+    """Return this process's compiled rules, recompiling if they changed."""
+    global _engine
+    current = versions.current(versions.FARES)
+    engine = _engine
+    if engine is not None and engine.data_versions == current:
+        return engine
+
+    with _lock:
+        if _engine is None or _engine.data_versions != current:
+            _engine = FareEngine.load(current)
+        return _engine
+
+
+def quote(flight_no):
+    """Return the current fare for one flight as a ``Decimal``."""
+    timetable = get_timetable()
+    positions = timetable.find(flight_no)[:1]
+    if not len(positions):
+        return Decimal("0.00")
+    cents = get_fare_engine().price(timetable, positions)[0]
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def addon_prices():
+    """Return ``(baggage per bag, insurance)`` from the catalogue."""
+    engine = get_fare_engine()
+    return engine.addon_price(BAGGAGE), engine.addon_price(INSURANCE)
+
+
+CALENDAR_FAMILIES = (
+    versions.ROUTES, versions.FLIGHTS, versions.BOOKINGS, versions.FARES)
+CALENDAR_TIMEOUT = 60 * 60 * 24
+
+
+def _months(start, end):
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = (month + timedelta(days=32)).replace(day=1)
+
+
+def _lowest_fares(origin_id, destination_id, month, today):
+    """Return ``{date ordinal: (lowest cents, flights)}`` for one month."""
+    timetable = get_timetable()
+    positions = timetable.search(origin_id, destination_id)
+    dates = timetable.date_ordinal[positions]
+    last = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    keep = (dates >= max(month, today).toordinal()) & (dates <= last.toordinal())
+    capacity = settings.FLIGHT_SEAT_CAPACITY
+    if capacity:
+        keep &= timetable.booked[positions] < capacity
+    positions = positions[keep]
+    if not len(positions):
+        return {}
+
+    fares = get_fare_engine().price(timetable, positions, today)
+    # Positions are in date order, so each day is one contiguous run.
+    days, starts, counts = np.unique(
+        timetable.date_ordinal[positions], return_index=True, return_counts=True)
+    lowest = np.minimum.reduceat(fares, starts)
+    return {
+        int(day): (int(cents), int(count))
+        for day, cents, count in zip(days, lowest, counts)
+    }
+
+
+def fare_calendar(origin_id, destination_id, start, days):
+    """
+    Return the lowest bookable fare per day from ``start`` for ``days``
+    days as ``[(date, Decimal fare, flights), ...]``, skipping days with no
+    seats left. Each route-month is cached under the current data versions.
+    """
+    today = timezone.localdate()
+    start = max(start, today)
+    end = start + timedelta(days=days - 1)
+
+    tag = "-".join(map(str, versions.current(*CALENDAR_FAMILIES).values()))
+    keys = {
+        month: f"fare-calendar:{origin_id}:{destination_id}:{month:%Y-%m}:"
+        f"{tag}:{today.isoformat()}"
+        for month in _months(start, end)
+    }
+    cached = cache.get_many(keys.values())
+
+    calendar = []
+    for month, key in keys.items():
+        lowest = cached.get(key)
+        if lowest is None:
+            lowest = _lowest_fares(origin_id, destination_id, month, today)
+            cache.set(key, lowest, CALENDAR_TIMEOUT)
+        calendar.extend(
+            (date.fromordinal(day), Decimal(cents).scaleb(-2), flights)
+            for day, (cents, flights) in sorted(lowest.items())
+            if start.toordinal() <= day <= end.toordinal()
+        )
+    return calendar
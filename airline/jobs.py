@@ -0,0 +1,242 @@
+"""
+Background jobs stored in the project's own database.
+
+``enqueue`` inserts a ``Job`` row naming a function by dotted path and its
+keyword arguments; ``manage.py runworker`` processes claim due jobs, lowest
+priority value first, and call them. A claim is a single UPDATE (preceded by
+SELECT ... FOR UPDATE SKIP LOCKED on backends that support it), so any
+number of workers can share the table without running a job twice. Failing
+jobs are retried with exponential backoff up to ``max_attempts``; jobs
+whose worker died are requeued once their lease runs out.
+
+With ``JOBS_EAGER`` (opt-in) jobs run in the enqueuing process as soon as
+its transaction commits, so nothing waits on a worker that was never
+started; that puts slow jobs back on the request path, so it is off unless
+asked for.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+from .processes import work as _work_in_child
+
+logger = logging.getLogger(__name__)
+
+# Retry delays double from JOB_RETRY_BACKOFF up to this many seconds.
+MAX_BACKOFF = 60 * 60
+
+
+def task_name(func):
+    return func if isinstance(func, str) else f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *, priority=0, delay=0, max_attempts=5, unique=False, **kwargs):
+    """
+    Queue ``func(**kwargs)`` (``func`` may be a dotted path); ``kwargs``
+    must be JSON serialisable. With ``unique``, nothing is queued while an
+    identical job is still queued or running. Returns the job, or ``None``
+    when it was skipped or run eagerly.
+    """
+    task = task_name(func)
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: import_string(task)(**kwargs))
+        return None
+    if unique and Job.objects.filter(
+        task=task, kwargs=kwargs, status__in=[Job.QUEUED, Job.RUNNING]
+    ).exists():
+        return None
+    return Job.objects.create(
+        task=task,
+        kwargs=kwargs,
+        priority=priority,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+
+
+def noop(**kwargs):
+    """Does nothing; used by ``bench_jobs``."""
+
+
+def claim(worker, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return them."""
+    now = timezone.now()
+    due = (
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by("priority", "run_at", "job_id")
+    )
+    with transaction.atomic():
+        if connections[due.db].features.has_select_for_update_skip_locked:
+            # Rows another worker is claiming are skipped, not waited for.
+            claimed = Job.objects.filter(pk__in=list(
+                due.select_for_update(skip_locked=True)
+                .values_list("pk", flat=True)[:limit]))
+        else:
+            # SQLite has one writer at a time, so the UPDATE itself is the
+            # lock; the status check keeps the claim safe elsewhere too.
+            claimed = Job.objects.filter(
+                pk__in=due.values("pk")[:limit], status=Job.QUEUED)
+        if not claimed.update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+        ):
+            return []
+        return list(Job.objects.filter(status=Job.RUNNING, locked_by=worker)
+                    .order_by("priority", "run_at", "job_id"))
+
+
+def backoff(attempts):
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def execute(job):
+    """Run a claimed job and record the outcome; returns whether it succeeded."""
+    try:
+        import_string(job.task)(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            changes = {"status": Job.FAILED, "finished_at": now}
+        else:
+            changes = {
+                "status": Job.QUEUED,
+                "run_at": now + timedelta(seconds=backoff(job.attempts)),
+            }
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            locked_by="", locked_at=None, last_error=error, **changes)
+        return False
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status=Job.DONE, finished_at=timezone.now(), locked_by="",
+        locked_at=None, last_error="")
+    return True
+
+
+def requeue_stale(lease=None):
+    """Release jobs whose worker has held them longer than the lease."""
+    if lease is None:
+        lease = settings.JOB_LEASE
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=now - timedelta(seconds=lease))
+    error = "Worker lease expired."
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.FAILED, finished_at=now, locked_by="", locked_at=None,
+        last_error=error)
+    requeued = stale.update(
+        status=Job.QUEUED, run_at=now, locked_by="", locked_at=None,
+        last_error=error)
+    return requeued + failed
+
+
+class Worker:
+    def __init__(self, batch_size=1, sleep=1.0):
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        self.sleep = sleep
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *args):
+        """Finish the current batch, then exit (also the SIGTERM handler)."""
+        self.stopping = True
+
+    def run(self, burst=False):
+        """Process jobs until stopped, or until the queue is empty with ``burst``."""
+        next_sweep = 0
+        while not self.stopping:
+            # A long-running loop gets no request_finished signal to drop
+            # broken or expired connections.
+            close_old_connections()
+            try:
+                if time.monotonic() >= next_sweep:
+                    requeue_stale()
+                    next_sweep = time.monotonic() + settings.JOB_LEASE / 4
+                jobs = claim(self.name, self.batch_size)
+            except Exception:
+                # A database hiccup must not take the worker down.
+                logger.exception("Worker %s could not claim jobs", self.name)
+                time.sleep(self.sleep)
+                continue
+
+            if not jobs:
+                if burst:
+                    break
+                time.sleep(self.sleep)
+                continue
+            for job in jobs:
+                execute(job)
+                self.processed += 1
+        return self.processed
+
+
+def run_workers(processes, batch_size=1, sleep=1.0, burst=False):
+    """Run ``processes`` workers in child processes and wait for them."""
+    options = {"batch_size": batch_size, "sleep": sleep, "burst": burst}
+    # Children must not share the parent's database connections.
+    connections.close_all()
+    children = [
+        # The target lives in a module without models so that spawned
+        # children can unpickle it before Django is set up.
+        multiprocessing.Process(target=_work_in_child, args=(options,))
+        for _ in range(processes)
+    ]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.join()
+
+
+def stats():
+    """Queue depth and outcomes for the status page."""
+    hour_ago = timezone.now() - timedelta(hours=1)
+    by_status = dict.fromkeys(dict(Job.status_choices), 0)
+    tasks = {}
+    for task, status, count in (
+        Job.objects.values_list("task", "status").annotate(count=Count("pk"))
+        .order_by("task")
+    ):
+        by_status[status] += count
+        tasks.setdefault(task, dict.fromkeys(by_status, 0))[status] = count
+
+    oldest = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()
+    ).aggregate(oldest=Min("run_at"))["oldest"]
+    return {
+        "by_status": by_status,
+        "tasks": tasks,
+        "oldest_due": oldest,
+        "done_last_hour": Job.objects.filter(
+            status=Job.DONE, finished_at__gte=hour_ago).count(),
+        "failures": list(
+            Job.objects.filter(last_error__gt="")
+            .exclude(status=Job.DONE)
+            .order_by("-job_id")[:10]
+        ),
+        "workers": list(
+            Job.objects.filter(status=Job.RUNNING)
+            .values_list("locked_by", flat=True).distinct()
+        ),
+    }
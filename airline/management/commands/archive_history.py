@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from airline.archive import (
+    BATCH_SIZE,
+    archive,
+    archive_job,
+    closed_bookings,
+    past_flights,
+    retention_cutoff,
+)
+from airline.jobs import enqueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Move bookings whose flights all left before the retention window, '
+        'and past flights no live booking uses, into the archive tables'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Retention window (default ARCHIVE_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the run for `runworker` instead')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options['days'])
+        if options['dry_run']:
+            self.stdout.write(
+                f'Before {cutoff}: {closed_bookings(cutoff).count()} bookings '
+                f'and at least {past_flights(cutoff).count()} flights to archive.')
+            return
+
+        if options['background']:
+            enqueue(archive_job, days=options['days'], batch_size=options['batch_size'],
+                    unique=True)
+            self.stdout.write('Queued the archive run.')
+            return
+
+        started = time.perf_counter()
+        bookings, flights = archive(cutoff, options['batch_size'])
+        self.stdout.write(
+            f'Archived {bookings} bookings and {flights} flights departing '
+            f'before {cutoff} in {time.perf_counter() - started:.2f} s.')
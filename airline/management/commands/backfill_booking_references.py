@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from airline.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Store booking references for bookings created before the column existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        missing = Booking.objects.filter(
+            booking_reference__isnull=True).order_by('booking_id')
+
+        started = time.perf_counter()
+        total = 0
+        while True:
+            with transaction.atomic():
+                batch = list(missing.values_list(
+                    'booking_id', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                total += Booking.assign_references(
+                    Booking.objects.filter(booking_id__in=batch))
+
+        self.stdout.write(
+            f'Stored {total} booking references in '
+            f'{time.perf_counter() - started:.2f} s.')
@@ -0,0 +1,98 @@
+import time
+from datetime import date, time as clock
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from airline.models import (
+    Booking,
+    City,
+    Flight,
+    FlightRoute,
+    FlightSchedule,
+    ItineraryItem,
+    Passenger,
+)
+from airline.views import booking_list_view
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure booking list render time with cold and warm card caches; '
+        'sample bookings are created in a transaction that is rolled back'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, action='append',
+                            help='Number of booking cards (repeatable)')
+        parser.add_argument('--changed', type=float, default=0.01,
+                            help='Fraction of bookings to modify between renders')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'cards':>7} {'cold ms':>10} {'warm ms':>10} {'changed ms':>11}")
+        for count in options['cards'] or [1000, 10000]:
+            try:
+                with transaction.atomic():
+                    self._run(count, options['changed'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def _render(self):
+        request = RequestFactory().get('/bookings/')
+        request.session = {}
+        started = time.perf_counter()
+        async_to_sync(booking_list_view)(request)
+        return (time.perf_counter() - started) * 1000
+
+    def _run(self, count, changed):
+        origin = City.objects.create(city_name='Bench Origin')
+        destination = City.objects.create(city_name='Bench Destination')
+        route = FlightRoute.objects.create(
+            origin_city=origin, destination_city=destination, duration=90)
+        flight = Flight.objects.create(
+            departure_time=clock(8), arrival_time=clock(9, 30), route=route,
+            schedule=FlightSchedule.objects.create(date=date.today()),
+        )
+        passenger = Passenger.objects.create(
+            first_name='Bench', last_name='Card',
+            birthdate=date(1990, 1, 1), gender='O')
+
+        bookings = Booking.objects.bulk_create(
+            Booking(date_booked=date.today(), total_cost=Decimal('1500.00'),
+                    passenger=passenger)
+            for _ in range(count)
+        )
+        Booking.assign_references(Booking.objects.filter(passenger=passenger))
+        ItineraryItem.objects.bulk_create(
+            ItineraryItem(booking=booking, flight=flight, cost=Decimal('1500.00'))
+            for booking in bookings
+        )
+
+        try:
+            cold = self._render()
+            warm = self._render()
+            for booking in bookings[:max(1, int(count * changed))]:
+                booking.total_cost += 1
+                booking.save(update_fields=['total_cost'])
+            partial = self._render()
+            self.stdout.write(
+                f"{count:>7} {cold:>10.1f} {warm:>10.1f} {partial:>11.1f}")
+        finally:
+            # Primary keys are reused after the rollback, so the cards
+            # rendered here must not outlive it.
+            cache.delete_many([
+                make_template_fragment_key('booking_card', [b.booking_id, version])
+                for b in bookings
+                for version in range(1, b.version + 1)
+            ])
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time as clock
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, transaction
+from django.test import override_settings
+
+from airline.bookings import create_booking
+from airline.models import City, Flight, FlightRoute, FlightSchedule, Passenger
+from airline.writequeue import write_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure booking confirms/sec with many parallel clients, with and '
+        'without the SQLite write queue'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--bookings', type=int, default=500,
+                            help='Confirms per mode')
+        parser.add_argument('--mode', choices=['queue', 'direct', 'both'],
+                            default='both')
+
+    def handle(self, *args, **options):
+        origin = City.objects.create(city_name='Bench Origin')
+        destination = City.objects.create(city_name='Bench Destination')
+        route = FlightRoute.objects.create(
+            origin_city=origin, destination_city=destination, duration=60)
+        flight = Flight.objects.create(
+            departure_time=clock(8), arrival_time=clock(9), route=route,
+            schedule=FlightSchedule.objects.create(date=date.today()),
+        )
+        passenger = Passenger.objects.create(
+            first_name='Bench', last_name='Client',
+            birthdate=date(1990, 1, 1), gender='O')
+        flights = [{'flight_id': flight.flight_no, 'price': 1000.0}]
+
+        def confirm_direct(_):
+            try:
+                with transaction.atomic():
+                    create_booking(passenger, flights, baggage_count=1)
+                return True
+            except OperationalError:
+                return False
+            finally:
+                close_old_connections()
+
+        def confirm_queued(_):
+            try:
+                write_queue.run(create_booking, passenger, flights,
+                                baggage_count=1)
+                return True
+            except OperationalError:
+                return False
+
+        modes = ['queue', 'direct'] if options['mode'] == 'both' else [options['mode']]
+        # Every confirm books the same flight; keep it from selling out.
+        with override_settings(FLIGHT_SEAT_CAPACITY=None):
+            try:
+                for mode in modes:
+                    runner = confirm_queued if mode == 'queue' else confirm_direct
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+                        results = list(pool.map(runner, range(options['bookings'])))
+                    elapsed = time.perf_counter() - started
+                    succeeded = sum(results)
+                    self.stdout.write(
+                        f"{mode:<7} {succeeded / elapsed:>8.1f} confirms/sec  "
+                        f"{len(results) - succeeded} failed (database is locked)"
+                    )
+                    passenger.booking_set.all().delete()
+            finally:
+                for obj in (passenger, flight.schedule, origin, destination):
+                    obj.delete()
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from airline.jobs import noop, run_workers, task_name
+from airline.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure job queue throughput: queue no-op jobs, drain them with '
+        'worker processes, report jobs/s, then delete them. Point DATABASES '
+        'at a server database to compare it with SQLite.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--processes', type=int, action='append',
+                            help='Worker processes (repeatable)')
+        parser.add_argument('--batch-size', type=int, action='append',
+                            help='Jobs claimed per query (repeatable)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{connection.vendor}, {options["jobs"]} jobs')
+        self.stdout.write(
+            f"{'processes':>9} {'batch':>6} {'seconds':>8} {'jobs/s':>8}")
+        for processes in options['processes'] or [1, 4]:
+            for batch_size in options['batch_size'] or [1, 20]:
+                self._run(options['jobs'], processes, batch_size)
+
+    def _run(self, count, processes, batch_size):
+        last = Job.objects.aggregate(last=Max('pk'))['last'] or 0
+        now = timezone.now()
+        Job.objects.bulk_create(
+            Job(task=task_name(noop), run_at=now) for _ in range(count))
+        bench = Job.objects.filter(pk__gt=last, task=task_name(noop))
+
+        try:
+            started = time.perf_counter()
+            run_workers(processes, batch_size, burst=True)
+            elapsed = time.perf_counter() - started
+            done = bench.filter(status=Job.DONE).count()
+            self.stdout.write(
+                f'{processes:>9} {batch_size:>6} {elapsed:>8.2f} '
+                f'{done / elapsed:>8.0f}')
+        finally:
+            bench.delete()
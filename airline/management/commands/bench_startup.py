@@ -0,0 +1,107 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_URLS = ["/", "/schedules/", "/bookings/"]
+
+
+def _rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Command(BaseCommand):
+    help = (
+        'Start a fresh worker process for each settings profile and report '
+        'first-request latency, steady-state latency and peak memory'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Path to request (repeatable)')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Steady-state requests per URL')
+        parser.add_argument('--profile', action='append', dest='profiles',
+                            choices=['development', 'production'],
+                            help='Profile to measure (default: both)')
+        parser.add_argument('--worker', action='store_true',
+                            help='Internal: measure the current process')
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or DEFAULT_URLS
+        if options['worker']:
+            self.stdout.write(json.dumps(self._measure(urls, options['requests'])))
+            return
+
+        self.stdout.write(
+            f"{'profile':<12} {'startup ms':>11} {'first ms':>9} "
+            f"{'mean ms':>9} {'peak RSS MB':>12}"
+        )
+        for profile in options['profiles'] or ['development', 'production']:
+            result = self._spawn(profile, urls, options['requests'])
+            rss = result['rss_kb']
+            self.stdout.write(
+                f"{profile:<12} {result['startup'] * 1000:>11.1f} "
+                f"{result['first'] * 1000:>9.2f} {result['mean'] * 1000:>9.2f} "
+                f"{rss / 1024 if rss else float('nan'):>12.1f}"
+            )
+
+    def _spawn(self, profile, urls, requests):
+        command = [sys.executable, sys.argv[0], 'bench_startup', '--worker',
+                   '--requests', str(requests)]
+        for url in urls:
+            command += ['--url', url]
+        env = dict(os.environ, DJANGO_ENV=profile)
+        started = time.perf_counter()
+        output = subprocess.run(
+            command, env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        # Interpreter start-up and django.setup().
+        result['startup'] = time.perf_counter() - started - result['busy']
+        return result
+
+    def _measure(self, urls, requests):
+        started = time.perf_counter()
+        handler = WSGIHandler()
+
+        def request(url):
+            path, _, query = url.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'HTTP_HOST': settings.ALLOWED_HOSTS[0]
+                if settings.ALLOWED_HOSTS else 'localhost',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            began = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - began
+
+        first = sum(request(url) for url in urls) / len(urls)
+        timings = [request(url) for url in urls for _ in range(requests)]
+        return {
+            'busy': time.perf_counter() - started,
+            'first': first,
+            'mean': sum(timings) / len(timings),
+            'rss_kb': _rss_kb(),
+        }
@@ -0,0 +1,129 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+DEFAULT_URLS = [
+    "/",
+    "/schedules/",
+    "/passengers/",
+    "/bookings/",
+    "/crew/",
+]
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec and latency of the read-only views served '
+        'through the WSGI handler (thread pool) and the ASGI handler '
+        '(concurrent tasks) against the configured database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Path to request (repeatable)')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per URL and handler')
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or DEFAULT_URLS
+        total = options['requests']
+        concurrency = options['concurrency']
+
+        self.stdout.write(
+            f"{'handler':<6} {'url':<14} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        for url in urls:
+            for label, runner in (('wsgi', self._run_wsgi),
+                                  ('asgi', self._run_asgi)):
+                elapsed, latencies = runner(url, total, concurrency)
+                self.stdout.write(
+                    f"{label:<6} {url:<14} {total / elapsed:>9.1f} "
+                    f"{_percentile(latencies, 50) * 1000:>9.2f} "
+                    f"{_percentile(latencies, 99) * 1000:>9.2f}"
+                )
+
+    def _run_wsgi(self, url, total, concurrency):
+        handler = WSGIHandler()
+        path, _, query = url.partition('?')
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': query,
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'HTTP_HOST': 'localhost',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+            }
+            started = time.perf_counter()
+            response = handler(environ, lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(request, range(total)))
+        return time.perf_counter() - started, latencies
+
+    def _run_asgi(self, url, total, concurrency):
+        handler = ASGIHandler()
+        path, _, query = url.partition('?')
+
+        async def request(semaphore):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': query.encode(),
+                'root_path': '',
+                'headers': [(b'host', b'localhost')],
+                'server': ('localhost', 80),
+                'client': ('127.0.0.1', 0),
+            }
+            body_sent = False
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                pass
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                elapsed = time.perf_counter() - started
+            disconnected.set()
+            return elapsed
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(
+                *(request(semaphore) for _ in range(total)))
+
+        started = time.perf_counter()
+        latencies = asyncio.run(run())
+        return time.perf_counter() - started, latencies
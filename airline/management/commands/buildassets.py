@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from airline import assets
+
+
+class Command(BaseCommand):
+    help = (
+        'Bundle and minify ASSET_BUNDLES, resize ASSET_IMAGES, then run '
+        'collectstatic to hash and gzip them; reports page weight before/after'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-collect', action='store_true',
+                            help='Only write static/bundles/, skip collectstatic')
+
+    def handle(self, *args, **options):
+        built = assets.build()
+        self.stdout.write(f'Built {len(built)} assets in {assets.output_dir()}')
+
+        # Stylesheets and images are on every page; each script bundle is a page.
+        shared = [name for name in built if not name.endswith('.js')]
+        pages = [name for name in built if name.endswith('.js')]
+
+        self.stdout.write(
+            f"\n{'page':<20} {'requests':>9} {'raw KB':>15} {'gzip KB':>15} "
+            f"{'repeat visit':>13}")
+        for page in pages:
+            names = shared + [page]
+            before = [
+                assets.source_dir() / source
+                for name in names for source in assets.sources(name)
+            ]
+            after = [built[name] for name in names]
+            raw_before, gz_before = assets.weigh(before)
+            raw_after, gz_after = assets.weigh(after)
+            # Unhashed assets are revalidated on every view; hashed ones are
+            # served immutable and not requested again.
+            self.stdout.write(
+                f'{page.removesuffix(".js"):<20} '
+                f'{len(before):>4} -> {len(after):<2} '
+                f'{raw_before / 1024:>6.1f} -> {raw_after / 1024:<5.1f} '
+                f'{gz_before / 1024:>6.1f} -> {gz_after / 1024:<5.1f} '
+                f'{len(before):>4} -> 0')
+
+        if not options['no_collect']:
+            call_command('collectstatic', interactive=False,
+                         verbosity=options['verbosity'])
+            if not settings.ASSETS_BUNDLED:
+                self.stdout.write(self.style.WARNING(
+                    'ASSETS_BUNDLED is off; templates still load the sources.'))
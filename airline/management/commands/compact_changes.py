@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from airline import changes
+from airline.jobs import enqueue
+from airline.models import FeedConsumer
+from airline.writequeue import write_queue
+
+
+class Command(BaseCommand):
+    help = 'Delete change events every registered consumer has acknowledged'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the compaction for `runworker` instead')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            enqueue(changes.compact, unique=True)
+            self.stdout.write('Queued the compaction.')
+            return
+
+        deleted = write_queue.run(changes.compact)
+        consumers = FeedConsumer.objects.order_by('name').values_list(
+            'name', 'acked_event_id')
+        self.stdout.write(f'Deleted {deleted} acknowledged change events.')
+        for name, cursor in consumers:
+            self.stdout.write(f'  {name}: {cursor}')
@@ -0,0 +1,57 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airline.bookings import delete_bookings
+from airline.models import Booking
+from airline.writequeue import write_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete (cancel) bookings and their itinerary and add-on rows in one '
+        'transaction, filtered by booking date, flight date or passenger'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--booked-before', type=date.fromisoformat,
+                            help='YYYY-MM-DD, exclusive')
+        parser.add_argument('--booked-after', type=date.fromisoformat,
+                            help='YYYY-MM-DD, inclusive')
+        parser.add_argument('--flight-date', type=date.fromisoformat,
+                            help='YYYY-MM-DD; bookings with a leg on that day')
+        parser.add_argument('--passenger', type=int, action='append',
+                            help='Passenger id (repeatable)')
+        parser.add_argument('--all', action='store_true',
+                            help='Allow running without any filter')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        filtered = False
+        for option, lookup in (
+            ('booked_before', 'date_booked__lt'),
+            ('booked_after', 'date_booked__gte'),
+            ('flight_date', 'itineraryitem__flight__schedule__date'),
+        ):
+            if options[option]:
+                bookings = bookings.filter(**{lookup: options[option]})
+                filtered = True
+        if options['passenger']:
+            bookings = bookings.filter(passenger_id__in=options['passenger'])
+            filtered = True
+        if not filtered and not options['all']:
+            raise CommandError('Give at least one filter, or --all.')
+        bookings = bookings.distinct()
+
+        if options['dry_run']:
+            self.stdout.write(f'{bookings.count()} bookings would be deleted.')
+            return
+
+        started = time.perf_counter()
+        deleted = write_queue.run(delete_bookings, bookings)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Deleted {deleted} bookings in {elapsed:.2f} s '
+            f'({deleted / elapsed if elapsed else 0:.0f}/s).')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from airline import duplicates
+from airline.jobs import enqueue
+from airline.models import DuplicateCandidate
+
+
+class Command(BaseCommand):
+    help = (
+        'Find passengers that look like the same person (same birthdate and '
+        'surname, similar first name) and store them for review'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=duplicates.THRESHOLD,
+                            help='Lowest first-name similarity kept (0-1)')
+        parser.add_argument('--background', action='store_true',
+                            help='Queue the scan for `runworker` instead')
+        parser.add_argument('--show', type=int, default=20,
+                            help='How many of the best candidates to print')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            enqueue(duplicates.find_duplicates, threshold=options['threshold'],
+                    unique=True)
+            self.stdout.write('Queued the duplicate scan.')
+            return
+
+        scan = duplicates.find_duplicates(options['threshold'])
+        rate = scan['passengers'] / scan['elapsed'] if scan['elapsed'] else 0
+        self.stdout.write(
+            f"Scanned {scan['passengers']} passengers in {scan['elapsed']:.2f} s "
+            f"({rate:.0f}/s): {scan['blocks']} blocks, {scan['comparisons']} "
+            f"comparisons, {scan['found']} candidate pairs"
+            + (f", {scan['skipped_blocks']} oversized blocks skipped."
+               if scan['skipped_blocks'] else '.'))
+
+        best = (
+            DuplicateCandidate.objects.filter(dismissed=False)
+            .select_related('passenger', 'duplicate')
+            .order_by('-score', 'candidate_id')[:options['show']]
+        )
+        for candidate in best:
+            self.stdout.write(
+                f'  {candidate.score:.2f}  #{candidate.passenger_id} '
+                f'{candidate.passenger}  ~  #{candidate.duplicate_id} '
+                f'{candidate.duplicate}  ({candidate.passenger.birthdate})')
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airline import rosters
+
+
+class Command(BaseCommand):
+    help = (
+        'Import passengers from a CSV or NDJSON roster (first_name, '
+        'last_name, birthdate, gender), skipping ones we already have'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=rosters.FORMATS,
+                            help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=rosters.BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate and de-duplicate without saving')
+        parser.add_argument('--show-errors', type=int, default=20,
+                            help='How many row errors to print')
+
+    def handle(self, *args, **options):
+        format = options['format'] or rosters.detect_format(options['path'])
+        if not format:
+            raise CommandError('Cannot tell the format; pass --format.')
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = rosters.import_passengers(
+                    stream, format, options['batch_size'], options['dry_run'])
+        except (OSError, rosters.RosterError) as error:
+            raise CommandError(error)
+
+        for line, message in report.errors[:options['show_errors']]:
+            self.stderr.write(f'line {line}: {message}')
+        if report.error_count > options['show_errors']:
+            self.stderr.write(
+                f'... {report.error_count - options["show_errors"]} more errors')
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(
+            f'Read {report.rows} rows in {report.elapsed:.2f} s '
+            f'({report.rate:.0f} rows/s): {verb} {report.created}, '
+            f'{report.duplicates} already known, {report.error_count} invalid.')
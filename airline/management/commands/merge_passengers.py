@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airline import duplicates
+from airline.models import Passenger
+from airline.writequeue import write_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge duplicate passengers into one record, moving their bookings: '
+        'either the given ids, or every stored candidate pair with --auto'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('keep', type=int, nargs='?',
+                            help='Passenger id to keep')
+        parser.add_argument('duplicates', type=int, nargs='*',
+                            help='Passenger ids to fold into it')
+        parser.add_argument('--auto', action='store_true',
+                            help='Merge stored candidates (see find_duplicate_passengers)')
+        parser.add_argument('--min-score', type=float, default=1.0,
+                            help='Lowest candidate score merged with --auto')
+
+    def handle(self, *args, **options):
+        if options['auto']:
+            merged, moved = duplicates.merge_candidates(options['min_score'])
+        elif options['keep'] and options['duplicates']:
+            try:
+                moved = write_queue.run(
+                    duplicates.merge, options['keep'], options['duplicates'])
+            except Passenger.DoesNotExist as error:
+                raise CommandError(error)
+            merged = len(set(options['duplicates']) - {options['keep']})
+        else:
+            raise CommandError('Give a passenger id and its duplicates, or --auto.')
+        self.stdout.write(f'Merged {merged} passengers; moved {moved} bookings.')
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from airline.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Delete booking idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=settings.IDEMPOTENCY_KEY_TTL,
+                            help='Age in seconds after which keys expire')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['ttl'])
+        expired = IdempotencyKey.objects.filter(
+            created_at__lt=cutoff).order_by('created_at')
+
+        total = 0
+        while True:
+            with transaction.atomic():
+                batch = list(expired.values_list('pk', flat=True)[:options['batch_size']])
+                if not batch:
+                    break
+                # Bookings keep existing; their link to the key is cleared.
+                total += IdempotencyKey.objects.filter(pk__in=batch).delete()[1].get(
+                    IdempotencyKey._meta.label, 0)
+
+        self.stdout.write(f'Purged {total} idempotency keys older than {cutoff:%Y-%m-%d %H:%M}.')
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airline import documents, processes
+from airline.models import ItineraryItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the boarding passes for whole flights (or bookings) into '
+        'MEDIA_ROOT with a process pool; passes already on disk are skipped'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flight', type=int, action='append', default=[],
+                            help='Flight number (repeatable)')
+        parser.add_argument('--booking', type=int, action='append', default=[],
+                            help='Booking id (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Worker processes (1 renders in this process)')
+        parser.add_argument('--chunk-size', type=int, default=16)
+
+    def handle(self, *args, **options):
+        if not options['flight'] and not options['booking']:
+            raise CommandError('Give at least one --flight or --booking.')
+
+        items = ItineraryItem.objects.none()
+        if options['flight']:
+            items |= ItineraryItem.objects.filter(flight_id__in=options['flight'])
+        if options['booking']:
+            items |= ItineraryItem.objects.filter(booking_id__in=options['booking'])
+        # Passes are drawn from plain dicts, so the workers never touch the
+        # database.
+        tickets = documents.tickets(items)
+        todo = [ticket for ticket in tickets if not documents.path(ticket).exists()]
+
+        started = time.perf_counter()
+        if options['workers'] > 1 and len(todo) > 1:
+            # Tasks are unpickled, importing documents and the models,
+            # only after the initializer has set Django up.
+            with ProcessPoolExecutor(
+                options['workers'], initializer=processes.setup,
+            ) as pool:
+                rendered = sum(pool.map(
+                    documents.render, todo, chunksize=options['chunk_size']))
+        else:
+            rendered = sum(map(documents.render, todo))
+        elapsed = time.perf_counter() - started
+
+        rate = rendered / elapsed if elapsed else 0
+        self.stdout.write(
+            f'Rendered {rendered} boarding passes ({len(tickets)} on the '
+            f'selected flights/bookings) in {elapsed:.2f} s, {rate:.0f}/s.')
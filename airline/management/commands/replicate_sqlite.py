@@ -0,0 +1,51 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from airline.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Stand-in replicator for local testing: copy the default SQLite '
+        'database onto the replica file with the online backup API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds between copies (simulated lag)')
+        parser.add_argument('--once', action='store_true',
+                            help='Copy a single time and exit')
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in settings.DATABASES:
+            raise CommandError(
+                'No replica configured; set REPLICA_DB_NAME in the environment.')
+
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES[REPLICA_ALIAS]
+        for db in (primary, replica):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('replicate_sqlite only copies SQLite databases.')
+
+        while True:
+            started = time.perf_counter()
+            self._copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(
+                f"Replicated to {replica['NAME']} in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+    def _copy(self, source_name, target_name):
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name, timeout=20)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
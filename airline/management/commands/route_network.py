@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from airline.analytics import RouteNetwork
+from airline.models import City
+
+
+class Command(BaseCommand):
+    help = (
+        'Fastest itineraries, reachability and hub cities for the route '
+        'network, with build timings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='origin', help='Origin city name')
+        parser.add_argument('--to', dest='destination',
+                            help='Destination city name')
+        parser.add_argument('--hubs', type=int, default=10)
+        parser.add_argument(
+            '--synthetic', type=int, metavar='CITIES',
+            help='Time a random in-memory network of this many cities '
+                 'instead of the database')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['synthetic']:
+            network = self._synthetic(options['synthetic'])
+        else:
+            network = RouteNetwork.load()
+        built = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{len(network)} cities, {network.route_count} direct pairs; '
+            f'all-pairs shortest durations in {built * 1000:.0f} ms')
+
+        started = time.perf_counter()
+        reach = network.reachability()
+        hubs = network.hubs(options['hubs'])
+        analysed = time.perf_counter() - started
+        self.stdout.write(
+            f"Reachable pairs: {reach['reachable_pairs']}/{reach['total_pairs']} "
+            f"({reach['percent']:.1f}%); reachability and hubs in "
+            f"{analysed * 1000:.0f} ms")
+        if reach['unreachable']:
+            self.stdout.write(
+                'Unreachable cities: ' + ', '.join(reach['unreachable'][:20]))
+
+        for hub in hubs:
+            self.stdout.write(
+                f"  {hub['city']:<30} through {hub['transit']:>8}  "
+                f"direct {hub['degree']:>4}  closeness {hub['closeness']:.2f}")
+
+        if options['origin'] and options['destination']:
+            self._fastest(network, options['origin'], options['destination'])
+
+    def _fastest(self, network, origin, destination):
+        ids = {}
+        for name in (origin, destination):
+            city = City.objects.filter(city_name__iexact=name).first()
+            if city is None:
+                raise CommandError(f'Unknown city: {name}')
+            ids[name] = city.city_id
+
+        result = network.fastest(ids[origin], ids[destination])
+        if result is None:
+            self.stdout.write(f'No connection from {origin} to {destination}.')
+            return
+        minutes, path = result
+        names = dict(zip(network.city_ids.tolist(), network.city_names))
+        self.stdout.write(
+            f'Fastest: {minutes // 60}h {minutes % 60:02}m via '
+            + ' → '.join(names[city_id] for city_id in path))
+
+    def _synthetic(self, cities, routes_per_city=4):
+        rng = random.Random(0)
+        routes = [
+            (origin, rng.randrange(cities), rng.randint(45, 900))
+            for origin in range(cities)
+            for _ in range(routes_per_city)
+        ]
+        return RouteNetwork(
+            range(cities), [f'City {i}' for i in range(cities)], routes)
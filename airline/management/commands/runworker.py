@@ -0,0 +1,34 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from airline.jobs import Worker, run_workers
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs from the database job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='Worker processes to start')
+        parser.add_argument('--batch-size', type=int, default=1,
+                            help='Jobs claimed per query')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no jobs are due')
+
+    def handle(self, *args, **options):
+        if options['processes'] > 1:
+            run_workers(options['processes'], options['batch_size'],
+                        options['sleep'], options['burst'])
+            return
+
+        worker = Worker(options['batch_size'], options['sleep'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        self.stdout.write(f'Worker {worker.name} started.')
+        try:
+            worker.run(options['burst'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'Worker {worker.name} processed {worker.processed} jobs.')
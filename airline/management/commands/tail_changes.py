@@ -0,0 +1,57 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from airline import changes
+from airline.writequeue import write_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Print change events after a cursor as NDJSON, oldest first, in '
+        'batches; with --consumer the cursor is resumed and acknowledged'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer',
+                            help='Resume from (and with --ack, advance) this cursor')
+        parser.add_argument('--after', type=int,
+                            help='Start after this event id (overrides --consumer)')
+        parser.add_argument('--batch-size', type=int, default=changes.BATCH_SIZE)
+        parser.add_argument('--entity', action='append', default=[],
+                            choices=sorted(changes.ENTITIES.values()),
+                            help='Only this entity (repeatable)')
+        parser.add_argument('--follow', action='store_true',
+                            help='Keep waiting for new events')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds between polls with --follow')
+        parser.add_argument('--ack', action='store_true',
+                            help="Acknowledge each batch for --consumer once printed")
+
+    def handle(self, *args, **options):
+        consumer = options['consumer']
+        if options['ack'] and not consumer:
+            raise CommandError('--ack needs --consumer.')
+        after = options['after']
+        if after is None:
+            after = changes.cursor(consumer) if consumer else 0
+
+        try:
+            while True:
+                events = changes.read(after, options['batch_size'], options['entity'])
+                for event in events:
+                    self.stdout.write(
+                        json.dumps(changes.as_dict(event), cls=DjangoJSONEncoder))
+                if events:
+                    after = events[-1].event_id
+                    if options['ack']:
+                        write_queue.run(changes.ack, consumer, after)
+                    self.stdout.flush()
+                    continue
+                if not options['follow']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
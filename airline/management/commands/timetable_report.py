@@ -0,0 +1,119 @@
+import sys
+import time
+import tracemalloc
+from datetime import date, time as clock, timedelta
+
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from airline.fares import FareEngine
+from airline.models import City, FareRule, Flight, FlightRoute, FlightSchedule
+from airline.timetable import Timetable
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Report memory per flight for the compact timetable snapshot versus '
+        'ORM instances, plus load, search and pricing timings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample', type=int, default=0,
+            help='Add N temporary flights (rolled back afterwards)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['sample']:
+                    self._create_sample(options['sample'])
+                self._report()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _create_sample(self, count):
+        cities = City.objects.bulk_create(
+            City(city_name=f'Sample City {i}') for i in range(20))
+        routes = FlightRoute.objects.bulk_create(
+            FlightRoute(origin_city=origin, destination_city=destination,
+                        duration=60 + i)
+            for i, (origin, destination) in enumerate(zip(cities, cities[1:])))
+        schedules = FlightSchedule.objects.bulk_create(
+            FlightSchedule(date=date.today() + timedelta(days=i))
+            for i in range(60))
+        Flight.objects.bulk_create(
+            Flight(route=routes[i % len(routes)],
+                   schedule=schedules[i % len(schedules)],
+                   departure_time=clock(i % 20, 0),
+                   arrival_time=clock(i % 20 + 1, 30))
+            for i in range(count))
+        FareRule.objects.bulk_create([
+            FareRule(name='Sample base fare', fare=Decimal('2500.00')),
+            FareRule(name='Sample first route', route=routes[0],
+                     fare=Decimal('1800.00'), priority=1),
+            FareRule(name='Sample advance purchase', min_days_before=21,
+                     multiplier=Decimal('0.850'), priority=2),
+            FareRule(name='Sample last minute', max_days_before=3,
+                     multiplier=Decimal('1.300'), priority=2),
+            FareRule(name='Sample high load', min_load_factor=Decimal('0.8'),
+                     multiplier=Decimal('1.150'), priority=3),
+        ])
+
+    def _report(self):
+        tracemalloc.start()
+        started = time.perf_counter()
+        instances = list(Flight.objects.select_related(
+            'route__origin_city', 'route__destination_city', 'schedule'))
+        orm_seconds = time.perf_counter() - started
+        orm_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        count = len(instances)
+        if not count:
+            self.stdout.write('No flights; use --sample N to add some.')
+            return
+        del instances
+
+        started = time.perf_counter()
+        timetable = Timetable.load()
+        load_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        origin = int(timetable.origin_id[0])
+        for _ in range(100):
+            timetable.search(origin=origin)
+        search_seconds = (time.perf_counter() - started) / 100
+
+        engine = FareEngine.load()
+        positions = np.arange(min(500, len(timetable)))
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(100):
+                engine.price(timetable, positions)
+            price_seconds = (time.perf_counter() - started) / 100
+
+        names_bytes = sys.getsizeof(timetable.city_names) + sum(
+            sys.getsizeof(name) for name in timetable.city_names.values())
+
+        self.stdout.write(f'Flights:                 {count}')
+        self.stdout.write(
+            f'ORM instances:           {orm_bytes / count:8.0f} bytes/flight '
+            f'(load {orm_seconds * 1000:.1f} ms)')
+        self.stdout.write(
+            f'Timetable columns:       {timetable.nbytes / count:8.1f} bytes/flight '
+            f'(load {load_seconds * 1000:.1f} ms)')
+        self.stdout.write(f'City name lookup:        {names_bytes} bytes total')
+        self.stdout.write(f'Search by origin:        {search_seconds * 1e6:.0f} µs')
+        self.stdout.write(
+            f'Price {len(positions)} flights:       '
+            f'{price_seconds * 1e6:.0f} µs with {len(engine.rules)} rules, '
+            f'{len(queries)} queries')
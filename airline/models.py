@@ -1,4 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Case, CharField, F, Value, When
+from django.db.models.functions import Cast, Concat, ExtractYear, LPad
 
 
 # 1. CITY
@@ -27,6 +30,9 @@ class FlightRoute(models.Model):
     destination_city = models.ForeignKey(
         City, on_delete=models. CASCADE, related_name='arrivals')
     duration = models.IntegerField(help_text="Duration in minutes")
+    base_fare = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True,
+        help_text="Fare rules adjust this; leave blank to keep the last sold fare")
 
     def __str__(self):
         return f"Route {self.route_id}: {self.origin_city} to {self.destination_city}"
@@ -53,6 +59,14 @@ class Passenger(models.Model):
     gender_choices = [('M', 'Male'), ('F', 'Female'), ('O', 'Other')]
     gender = models.CharField(max_length=1, choices=gender_choices)
 
+    class Meta:
+        indexes = [
+            # Duplicate checks when importing rosters.
+            models.Index(fields=["last_name", "first_name", "birthdate"]),
+            # Duplicate detection reads passengers in birthdate order.
+            models.Index(fields=["birthdate"]),
+        ]
+
     def __str__(self):
         return f"{self.last_name}, {self.first_name}"
 
@@ -63,11 +77,60 @@ class Booking(models.Model):
     date_booked = models.DateField()
     total_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True)
     passenger = models.ForeignKey(Passenger, on_delete=models.CASCADE)
+    # Bumped whenever anything shown on the booking's card changes; used as
+    # the cache key for rendered booking cards.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # "BK-{year}-{id:05d}", assigned right after insert (see assign_references).
+    booking_reference = models.CharField(
+        max_length=20, unique=True, null=True, blank=True, editable=False)
+    # The confirm request that created the booking; replays of the same
+    # request return this booking instead of inserting another.
+    idempotency_key = models.ForeignKey(
+        "IdempotencyKey", on_delete=models.SET_NULL, null=True, blank=True,
+        editable=False, related_name="bookings")
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if not adding:
+            # Bump the row, not this instance's copy: signals and merges bump
+            # it with UPDATEs too, and a stale copy would reuse a version.
+            self.version = F("version") + 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version"}
+        super().save(*args, **kwargs)
+        # The change feed's post_save snapshot may have read it back already.
+        if hasattr(self.version, "resolve_expression"):
+            self.refresh_from_db(fields=["version"])
+        if adding and not self.booking_reference:
+            self.booking_reference = self.make_reference()
+            Booking.objects.filter(pk=self.pk).update(
+                booking_reference=self.booking_reference)
+
+    def make_reference(self):
+        return f"BK-{self.date_booked.year}-{self.booking_id:05d}"
 
-    @property
-    def booking_reference(self):
-        year = self.date_booked.year
-        return f"BK-{year}-{self.booking_id:05d}"
+    @staticmethod
+    def assign_references(bookings):
+        """
+        Fill in missing references for the ``bookings`` queryset with one
+        UPDATE, for rows inserted by ``bulk_create``. Mirrors
+        ``make_reference``.
+        """
+        booking_id = Cast("booking_id", CharField())
+        return bookings.filter(booking_reference__isnull=True).update(
+            booking_reference=Concat(
+                Value("BK-"),
+                Cast(ExtractYear("date_booked"), CharField()),
+                Value("-"),
+                Case(
+                    When(booking_id__lt=100000,
+                         then=LPad(booking_id, 5, Value("0"))),
+                    default=booking_id,
+                ),
+                output_field=CharField(),
+            )
+        )
 
     def __str__(self):
         return f"Booking {self.booking_id} - {self.passenger}"
@@ -117,3 +180,187 @@ class CrewAssignment(models.Model):
     crew = models.ForeignKey(CrewMember, on_delete=models.CASCADE)
     flight = models.ForeignKey(Flight, on_delete=models.CASCADE)
     assignment_date = models.DateField()
+
+
+# 12. DATA VERSION (per resource family, bumped on every write)
+class DataVersion(models.Model):
+    family = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.family} v{self.version}"
+
+
+# 13. FARE RULE
+class FareRule(models.Model):
+    """
+    Active rules matching a flight are applied in priority order to its
+    route's base fare: a rule with a ``fare`` replaces the price so far, then
+    its ``multiplier`` is applied. On a route without a base fare,
+    multipliers only apply once a rule has set a fare; until then the flight
+    keeps its last sold fare, so sales never feed back into the price.
+    """
+    rule_id = models.AutoField(primary_key=True)
+    name = models.CharField(max_length=100)
+    route = models.ForeignKey(
+        FlightRoute, on_delete=models.CASCADE, null=True, blank=True,
+        help_text="Leave blank to apply to every route")
+    valid_from = models.DateField(
+        null=True, blank=True, help_text="First departure date covered")
+    valid_until = models.DateField(
+        null=True, blank=True, help_text="Last departure date covered")
+    min_days_before = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Minimum days to departure")
+    max_days_before = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Maximum days to departure")
+    min_load_factor = models.DecimalField(
+        max_digits=4, decimal_places=3, null=True, blank=True,
+        help_text="Share of seats sold, from 0 to 1 (inclusive)")
+    max_load_factor = models.DecimalField(
+        max_digits=4, decimal_places=3, null=True, blank=True,
+        help_text="Share of seats sold, from 0 to 1 (exclusive)")
+    priority = models.IntegerField(default=0)
+    fare = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True,
+        help_text="Replaces the price; leave blank to only adjust it")
+    multiplier = models.DecimalField(max_digits=5, decimal_places=3, default=1)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["priority", "rule_id"]
+
+    def __str__(self):
+        return self.name
+
+
+# 14. IDEMPOTENCY KEY (one per booking confirm form)
+class IdempotencyKey(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+# 15. ARCHIVED BOOKING (cold storage for bookings whose flights have all
+# passed the retention window; see airline.archive)
+class ArchivedBooking(models.Model):
+    booking_id = models.IntegerField(primary_key=True)
+    booking_reference = models.CharField(max_length=20, unique=True)
+    passenger_id = models.IntegerField(db_index=True)
+    date_booked = models.DateField()
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    # Passenger, itinerary and add-ons as they were when archived.
+    payload = models.JSONField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.booking_reference
+
+
+# 16. ARCHIVED FLIGHT
+class ArchivedFlight(models.Model):
+    flight_no = models.IntegerField(primary_key=True)
+    date = models.DateField(db_index=True)
+    route_id = models.IntegerField()
+    departure_time = models.TimeField()
+    arrival_time = models.TimeField()
+    # Route cities and crew assignments as they were when archived.
+    payload = models.JSONField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Flight {self.flight_no} ({self.date})"
+
+
+# 17. JOB (background work queue; see airline.jobs)
+class Job(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    status_choices = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    job_id = models.BigAutoField(primary_key=True)
+    # Dotted path of the function to call with ``kwargs``.
+    task = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=status_choices, default=QUEUED)
+    # Lower runs first, like FareRule.priority.
+    priority = models.SmallIntegerField(default=0)
+    run_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The claim query: next due queued jobs by priority.
+            models.Index(fields=["status", "priority", "run_at"]),
+        ]
+
+    def __str__(self):
+        return f"Job {self.job_id} {self.task} ({self.status})"
+
+
+# 18. CHANGE EVENT (append-only outbox; see airline.changes)
+class ChangeEvent(models.Model):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+    action_choices = [(CREATE, "Create"), (UPDATE, "Update"), (DELETE, "Delete")]
+
+    # Consumers page through the feed by this id.
+    event_id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=30)
+    object_id = models.IntegerField()
+    action = models.CharField(max_length=10, choices=action_choices)
+    # The row as written; null for deletes.
+    payload = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event_id} {self.action} {self.entity} {self.object_id}"
+
+
+# 19. FEED CONSUMER (how far each downstream reader has acknowledged)
+class FeedConsumer(models.Model):
+    name = models.CharField(max_length=100, primary_key=True)
+    acked_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.acked_event_id}"
+
+
+# 20. DUPLICATE CANDIDATE (passengers that look like the same person; see
+# airline.duplicates)
+class DuplicateCandidate(models.Model):
+    candidate_id = models.BigAutoField(primary_key=True)
+    # The older record, which a merge keeps.
+    passenger = models.ForeignKey(
+        Passenger, on_delete=models.CASCADE, related_name="+")
+    duplicate = models.ForeignKey(
+        Passenger, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    # Reviewed and not the same person; kept so later runs skip the pair.
+    dismissed = models.BooleanField(default=False)
+    found_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["passenger", "duplicate"], name="unique_duplicate_pair"),
+        ]
+
+    def __str__(self):
+        return f"{self.passenger_id} ~ {self.duplicate_id} ({self.score:.2f})"
@@ -0,0 +1,30 @@
+"""
+Entry points for child processes.
+
+Under the spawn start method (the default on macOS and Windows) a child
+imports the module of whatever it is handed before running it, and
+importing a module that defines or imports models before Django is set up
+fails with ``AppRegistryNotReady``. This module imports no models, so it
+is safe to hand to a fresh interpreter; each entry point sets Django up
+before touching anything that does.
+"""
+
+import signal
+
+import django
+
+
+def setup():
+    """Process pool initializer: set Django up before any task arrives."""
+    django.setup()
+
+
+def work(options):
+    """``multiprocessing.Process`` target for ``jobs.run_workers``."""
+    setup()
+    from .jobs import Worker
+
+    worker = Worker(options["batch_size"], options["sleep"])
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(options["burst"])
@@ -0,0 +1,200 @@
+"""
+Bulk passenger import from CSV or NDJSON rosters.
+
+Rows are read lazily from the file and handled ``BATCH_SIZE`` at a time:
+each row is validated with ``PassengerForm``'s fields and then the model's,
+so the rules match the single-passenger form, and each batch costs one lookup on the indexed
+(last_name, first_name, birthdate) key to skip passengers we already have
+plus one ``bulk_create`` for the rest, both in one write-queue
+transaction. Invalid rows are reported by line number and do not stop the
+import.
+"""
+
+import codecs
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from . import versions
+from .forms import PassengerForm
+from .models import Passenger
+from .writequeue import write_queue
+
+FORMATS = ("csv", "ndjson")
+SUFFIXES = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+FIELDS = PassengerForm._meta.fields
+KEY = ("last_name", "first_name", "birthdate")
+BATCH_SIZE = 1000
+# Keys per duplicate lookup, three query parameters each.
+LOOKUP_SIZE = 250
+# Errors kept for the report; the count is always exact.
+MAX_ERRORS = 1000
+
+
+class RosterError(Exception):
+    """Raised when a file cannot be read as a roster at all."""
+
+
+def detect_format(filename):
+    for suffix, format in SUFFIXES.items():
+        if filename.lower().endswith(suffix):
+            return format
+    return None
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    header = [name.strip().lower() for name in reader.fieldnames or ()]
+    missing = [name for name in FIELDS if name not in header]
+    if missing:
+        raise RosterError(f"Missing CSV column(s): {', '.join(missing)}.")
+    reader.fieldnames = header
+    for row in reader:
+        yield reader.line_num, row, None
+
+
+def _ndjson_rows(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield number, None, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Expected a JSON object."
+            continue
+        yield number, row, None
+
+
+def read_rows(stream, format):
+    """
+    Yield ``(line number, row, error)`` for each record of a binary file
+    object, decoding as it goes; ``row`` is a dict of raw values, or
+    ``None`` with ``error`` set when the line cannot be parsed.
+    """
+    if format not in FORMATS:
+        raise RosterError(f"Unknown roster format {format!r}.")
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    try:
+        yield from (_csv_rows if format == "csv" else _ndjson_rows)(lines)
+    except UnicodeDecodeError:
+        raise RosterError("The file is not UTF-8 text.")
+
+
+def key(passenger):
+    return tuple(getattr(passenger, name) for name in KEY)
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rate(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+def _validate_row(row):
+    """Return ``(passenger, None)`` for a valid row, else ``(None, errors)``."""
+    passenger = Passenger()
+    errors = {}
+    for name in FIELDS:
+        try:
+            value = PassengerForm.base_fields[name].clean(_clean(row.get(name)))
+            value = Passenger._meta.get_field(name).clean(value, passenger)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+        else:
+            setattr(passenger, name, value)
+    return (None, errors) if errors else (passenger, None)
+
+
+def validate(batch, report):
+    """Return the batch's valid rows as unsaved passengers; report the rest."""
+    passengers = []
+    # The form's and the model's field validation, which is what
+    # PassengerForm.is_valid() runs for these fields, without building a
+    # form (a deep copy of its fields) per row.
+    for line, row, error in batch:
+        if error is None:
+            passenger, errors = _validate_row(row)
+            if passenger is not None:
+                passengers.append(passenger)
+                continue
+            error = "; ".join(
+                f"{field}: {' '.join(messages)}"
+                for field, messages in errors.items()
+            )
+        report.error(line, error)
+    return passengers
+
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+
+def insert_new(passengers, seen, dry_run=False):
+    """
+    Insert the passengers whose key is neither stored yet nor in ``seen``
+    (keys already imported from this file); returns how many. Must run
+    inside a transaction so the lookup and the insert see the same rows.
+    """
+    stored = set()
+    keys = list({key(passenger) for passenger in passengers})
+    for start in range(0, len(keys), LOOKUP_SIZE):
+        # One exact probe of the key index per passenger, OR-ed together.
+        match = Q()
+        for values in keys[start:start + LOOKUP_SIZE]:
+            match |= Q(**dict(zip(KEY, values)))
+        stored.update(Passenger.objects.filter(match).values_list(*KEY))
+    new = []
+    for passenger in passengers:
+        if key(passenger) in stored or key(passenger) in seen:
+            continue
+        seen.add(key(passenger))
+        new.append(passenger)
+    if new and not dry_run:
+        Passenger.objects.bulk_create(new)
+        # bulk_create sends no post_save signals.
+        versions.bump(versions.PASSENGERS)
+    return len(new)
+
+
+def import_passengers(stream, format, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Import a roster from a binary file object; returns an ``ImportReport``.
+    With ``dry_run`` rows are validated and de-duplicated but not saved.
+    """
+    report = ImportReport()
+    rows = read_rows(stream, format)
+    seen = set()
+    while batch := list(islice(rows, batch_size)):
+        report.rows += len(batch)
+        passengers = validate(batch, report)
+        if not passengers:
+            continue
+        created = write_queue.run(insert_new, passengers, seen, dry_run)
+        report.created += created
+        report.duplicates += len(passengers) - created
+    return report.finish()
@@ -0,0 +1,69 @@
+"""
+Read-replica routing.
+
+Views opt in with ``@read_from_replica``; while such a view runs, reads of
+airline models go to the ``replica`` database alias. Everything else,
+including all writes, stays on ``default``. A browser that has just written
+carries a short-lived cookie (set by ``ReadYourWritesMiddleware``) and keeps
+reading from ``default`` until it expires, so it never sees replica lag on
+pages that follow its own write.
+"""
+
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+REPLICA_ALIAS = "replica"
+STICKY_COOKIE = "read_primary"
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_available():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _wants_replica(request):
+    return replica_available() and STICKY_COOKIE not in request.COOKIES
+
+
+def read_from_replica(view):
+    """Serve the view's airline model reads from the replica, if configured."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_wants_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_wants_replica(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label == "airline":
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Never follow an instance's replica hint when saving it.
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds a copy of the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary.
+        return db != REPLICA_ALIAS
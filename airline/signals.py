@@ -0,0 +1,168 @@
+"""
+Keep ``Booking.version`` in step with the rows rendered on a booking card,
+the per-family ``DataVersion`` counters in step with every write, and the
+change feed (``ChangeEvent``) fed from the same transaction. Rendered
+boarding passes are removed once their booking's delete commits.
+
+Set-based deletes send no signals; ``delete_in_bulk`` does the same work
+for them.
+"""
+
+from functools import partial
+
+from django.db import connections, router, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import changes, documents, versions
+from .models import (
+    AdditionalItem,
+    Booking,
+    BookingItem,
+    ChangeEvent,
+    City,
+    FareRule,
+    Flight,
+    FlightRoute,
+    FlightSchedule,
+    ItineraryItem,
+    Passenger,
+)
+
+
+def bump_booking_versions(bookings):
+    bookings.update(version=F("version") + 1)
+
+
+@receiver(post_save, sender=ItineraryItem)
+@receiver(post_delete, sender=ItineraryItem)
+@receiver(post_save, sender=BookingItem)
+@receiver(post_delete, sender=BookingItem)
+def booking_child_changed(sender, instance, **kwargs):
+    bump_booking_versions(Booking.objects.filter(pk=instance.booking_id))
+
+
+@receiver(post_save, sender=Passenger)
+def passenger_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(Booking.objects.filter(passenger=instance))
+
+
+@receiver(post_save, sender=Flight)
+def flight_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(
+            Booking.objects.filter(itineraryitem__flight=instance))
+
+
+@receiver(post_save, sender=FlightRoute)
+def route_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(
+            Booking.objects.filter(itineraryitem__flight__route=instance))
+
+
+@receiver(post_save, sender=FlightSchedule)
+def schedule_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(
+            Booking.objects.filter(itineraryitem__flight__schedule=instance))
+
+
+@receiver(post_save, sender=City)
+def city_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(
+            Booking.objects.filter(
+                Q(itineraryitem__flight__route__origin_city=instance)
+                | Q(itineraryitem__flight__route__destination_city=instance)
+            )
+        )
+
+
+@receiver(post_save, sender=AdditionalItem)
+def additional_item_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_booking_versions(Booking.objects.filter(bookingitem__item=instance))
+
+
+FAMILIES = {
+    AdditionalItem: versions.FARES,
+    FareRule: versions.FARES,
+    City: versions.ROUTES,
+    FlightRoute: versions.ROUTES,
+    Flight: versions.FLIGHTS,
+    FlightSchedule: versions.FLIGHTS,
+    ItineraryItem: versions.BOOKINGS,
+    Passenger: versions.PASSENGERS,
+}
+
+
+def data_changed(sender, **kwargs):
+    versions.bump(FAMILIES[sender])
+
+
+for model in FAMILIES:
+    post_save.connect(data_changed, sender=model)
+    post_delete.connect(data_changed, sender=model)
+
+
+def entity_saved(sender, instance, created, **kwargs):
+    changes.record(
+        instance, ChangeEvent.CREATE if created else ChangeEvent.UPDATE)
+
+
+def entity_deleted(sender, instance, **kwargs):
+    changes.record(instance, ChangeEvent.DELETE)
+
+
+for model in changes.ENTITIES:
+    post_save.connect(entity_saved, sender=model)
+    post_delete.connect(entity_deleted, sender=model)
+
+
+def discard_passes(booking_ids):
+    # A rolled-back delete keeps its passes.
+    transaction.on_commit(partial(documents.discard, list(booking_ids)))
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    discard_passes([instance.booking_id])
+
+
+# Primary keys per DELETE, well under SQLite's bound-parameter limit.
+DELETE_CHUNK_SIZE = 500
+
+
+def delete_in_bulk(queryset):
+    """
+    Delete the rows of ``queryset`` with plain DELETE statements, skipping
+    Django's per-object cascade collection and signals, then do for them
+    what the post_delete receivers above do per object. Related rows are the
+    caller's to delete first. Returns the deleted primary keys.
+    """
+    model = queryset.model
+    using = router.db_for_write(model)
+    pks = list(queryset.using(using).order_by().values_list("pk", flat=True))
+    if not pks:
+        return pks
+    # QuerySet.delete() would fetch every row to send the signals these
+    # models have receivers for, so the DELETE is written out here.
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), DELETE_CHUNK_SIZE):
+            chunk = pks[start:start + DELETE_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({placeholders})", chunk)
+    if model in changes.ENTITIES:
+        changes.record_many(model, pks, ChangeEvent.DELETE)
+    if model in FAMILIES:
+        versions.bump(FAMILIES[model])
+    if model is Booking:
+        discard_passes(pks)
+    return pks
@@ -0,0 +1,30 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from airline.assets import bundle_path, sources
+
+register = template.Library()
+
+
+def _urls(name):
+    if settings.ASSETS_BUNDLED:
+        return [static(bundle_path(name))]
+    return [static(source) for source in sources(name)]
+
+
+@register.simple_tag
+def bundle(name):
+    """Script or stylesheet tags for an ``ASSET_BUNDLES`` entry."""
+    if name.endswith(".css"):
+        markup = '<link href="{}" rel="stylesheet">'
+    else:
+        markup = '<script src="{}"></script>'
+    return format_html_join("\n", markup, ((url,) for url in _urls(name)))
+
+
+@register.simple_tag
+def asset(name):
+    """URL of an ``ASSET_IMAGES`` entry."""
+    return format_html("{}", _urls(name)[0])
@@ -1,3 +1,924 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import threading
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import Http404
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from magis_air import serve
+
+from . import (
+    archive,
+    assets,
+    caching,
+    changes,
+    duplicates,
+    fares,
+    jobs,
+    rosters,
+    timetable,
+    versions,
+)
+from .fares import quote
+from .bookings import (
+    FlightNotFound,
+    SeatsUnavailable,
+    create_group_booking,
+    delete_bookings,
+)
+from .models import (
+    AdditionalItem,
+    ArchivedBooking,
+    ArchivedFlight,
+    Booking,
+    BookingItem,
+    ChangeEvent,
+    City,
+    CrewAssignment,
+    CrewMember,
+    DuplicateCandidate,
+    FareRule,
+    Flight,
+    FlightRoute,
+    FlightSchedule,
+    IdempotencyKey,
+    ItineraryItem,
+    Passenger,
+)
+from .writequeue import WriteQueue, write_queue
+
+
+@override_settings(SQLITE_WRITE_QUEUE=False)
+class AirlineTestCase(TestCase):
+    """A route with a dozen daily flights, each with one booked passenger."""
+
+    ROWS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        manila = City.objects.create(city_name="Manila")
+        cebu = City.objects.create(city_name="Cebu")
+        cls.route = FlightRoute.objects.create(
+            origin_city=manila, destination_city=cebu, duration=75)
+        captain = CrewMember.objects.create(
+            first_name="Ana", last_name="Cruz", role="Captain")
+        baggage = AdditionalItem.objects.create(
+            description="Baggage", cost_per_unit=Decimal("200.00"))
+        for i in range(cls.ROWS):
+            schedule = FlightSchedule.objects.create(
+                date=date(2030, 1, 1) + timedelta(days=i))
+            flight = Flight.objects.create(
+                route=cls.route, schedule=schedule,
+                departure_time=time(8), arrival_time=time(9, 15))
+            CrewAssignment.objects.create(
+                crew=captain, flight=flight, assignment_date=schedule.date)
+            passenger = Passenger.objects.create(
+                first_name=f"Maria {i}", last_name="Santos",
+                birthdate=date(1990, 1, 1), gender="F")
+            booking = Booking.objects.create(
+                date_booked=schedule.date, total_cost=Decimal("1500.00"),
+                passenger=passenger)
+            ItineraryItem.objects.create(
+                booking=booking, flight=flight, cost=Decimal("1300.00"))
+            BookingItem.objects.create(
+                booking=booking, item=baggage, quantity=1,
+                subtotal_cost=Decimal("200.00"))
+        cls.flight = flight
+        cls.passenger = passenger
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(f"airline:{name}", args=args), params)
+
+    def post(self, name, body):
+        return self.client.post(
+            reverse(f"airline:{name}"), json.dumps(body),
+            content_type="application/json")
+
+
+class ConditionalGetTests(AirlineTestCase):
+    def test_unchanged_page_answers_304_until_a_write(self):
+        tag = self.get("flight_routes")["ETag"]
+        response = self.client.get(
+            reverse("airline:flight_routes"), HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 304)
+
+        FlightRoute.objects.create(
+            origin_city=self.route.origin_city,
+            destination_city=City.objects.create(city_name="Davao"), duration=90)
+        response = self.client.get(
+            reverse("airline:flight_routes"), HTTP_IF_NONE_MATCH=tag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], tag)
+
+    def test_form_pages_are_not_tagged(self):
+        response = self.get("booking_create")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+class ApiQueryBudgetTests(AirlineTestCase):
+    """Every endpoint runs a fixed number of queries, whatever the page size."""
+
+    def assertBudget(self, queries, name, *args, **params):
+        for limit in (1, self.ROWS):
+            with self.assertNumQueries(queries):
+                response = self.get(name, *args, limit=limit, **params)
+            self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_flights(self):
+        self.assertBudget(1, "api_flights")
+        page = self.assertBudget(2, "api_flights", fields="flight_no,duration,crew")
+        self.assertEqual(page["data"][0]["crew"][0]["role"], "Captain")
+
+    def test_flight(self):
+        with self.assertNumQueries(2):
+            self.get("api_flight", self.flight.pk, fields="date,origin,crew")
+
+    def test_routes(self):
+        self.assertBudget(1, "api_routes")
+
+    def test_passengers(self):
+        self.assertBudget(1, "api_passengers")
+        page = self.assertBudget(2, "api_passengers", fields="id,bookings")
+        self.assertEqual(len(page["data"][0]["bookings"]), 1)
+
+    def test_bookings(self):
+        self.assertBudget(1, "api_bookings")
+        page = self.assertBudget(
+            3, "api_bookings", fields="reference,passenger,itinerary,add_ons")
+        booking = page["data"][0]
+        self.assertEqual(booking["passenger"]["last_name"], "Santos")
+        self.assertEqual(booking["itinerary"][0]["origin"], "Manila")
+        self.assertEqual(booking["add_ons"][0]["quantity"], 1)
+
+    def test_booking_create(self):
+        # The first request also loads the timetable and fare rules; after
+        # that a party costs the same queries whatever its size.
+        passengers = list(Passenger.objects.values_list("pk", flat=True))
+        counts = []
+        for party in (passengers[:1], passengers[:1], passengers[1:6]):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(
+                    "api_bookings", {"passengers": party, "flights": [self.flight.pk]})
+            self.assertEqual(response.status_code, 201, response.content)
+            self.assertEqual(len(response.json()["data"]), len(party))
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+
+
+class AdminQueryTests(AirlineTestCase):
+    """Admin pages run the same number of queries however many rows they list."""
+
+    def setUp(self):
+        self.client.force_login(
+            User.objects.create_superuser("admin", password="x"))
+
+    def add_rows(self, count=5):
+        for i in range(count):
+            schedule = FlightSchedule.objects.create(
+                date=date(2031, 1, 1) + timedelta(days=i))
+            route = FlightRoute.objects.create(
+                origin_city=self.route.origin_city,
+                destination_city=self.route.destination_city, duration=75)
+            Flight.objects.create(
+                route=route, schedule=schedule,
+                departure_time=time(8), arrival_time=time(9, 15))
+            Booking.objects.create(
+                date_booked=schedule.date, total_cost=Decimal("1500.00"),
+                passenger=Passenger.objects.create(
+                    first_name=f"Jose {i}", last_name="Reyes",
+                    birthdate=date(1985, 1, 1), gender="M"))
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, params=None):
+        before = self.count_queries(url, params)
+        self.add_rows()
+        self.assertEqual(self.count_queries(url, params), before)
+
+    def test_changelists(self):
+        for model in ("flight", "flightroute", "booking"):
+            with self.subTest(model=model):
+                self.assertConstantQueries(reverse(f"admin:airline_{model}_changelist"))
+
+    def assertConstantAutocomplete(self, model_name, field_name):
+        # Keep under the 20 results a page holds, or a full page hides N+1s.
+        self.assertConstantQueries(reverse("admin:autocomplete"), {
+            "app_label": "airline", "model_name": model_name,
+            "field_name": field_name, "term": "",
+        })
+
+    def test_flight_autocomplete(self):
+        self.assertConstantAutocomplete("itineraryitem", "flight")
+
+    def test_route_autocomplete(self):
+        self.assertConstantAutocomplete("flight", "route")
+
+    def test_booking_autocomplete(self):
+        self.assertConstantAutocomplete("itineraryitem", "booking")
+
+
+class ApiTests(AirlineTestCase):
+    def test_sparse_fields(self):
+        data = self.get("api_flights", fields="flight_no,origin").json()["data"]
+        self.assertEqual(set(data[0]), {"flight_no", "origin"})
+
+    def test_keyset_pagination(self):
+        seen = []
+        after = ""
+        while after is not None:
+            page = self.get("api_passengers", limit=5, after=after).json()
+            seen += [row["id"] for row in page["data"]]
+            after = page["next"]
+        self.assertEqual(seen, sorted(Passenger.objects.values_list("pk", flat=True)))
+
+    def test_error_shape(self):
+        response = self.get("api_flights", fields="nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"]["code"], "invalid_field")
+        response = self.get("api_flight", 999999)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"]["code"], "not_found")
+        response = self.client.get("/api/v1/nothing-here")
+        self.assertEqual(response.json()["error"]["code"], "not_found")
+
+    def test_invalid_filter(self):
+        for name, params in [
+            ("api_flights", {"origin": "abc"}),
+            ("api_bookings", {"passenger": "x"}),
+            ("api_passengers", {"birthdate": "1990-13-01"}),
+        ]:
+            response = self.get(name, **params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["error"]["code"], "invalid_parameter")
+
+    def test_bulk_create_is_all_or_nothing(self):
+        before = Passenger.objects.count()
+        response = self.post("api_passengers", {"data": [
+            {"first_name": "Jose", "last_name": "Reyes",
+             "birthdate": "1985-02-03", "gender": "M"},
+            {"first_name": "Ana", "last_name": "", "birthdate": "x", "gender": "F"},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        details = response.json()["error"]["details"]
+        self.assertEqual(details[0]["index"], 1)
+        self.assertIn("last_name", details[0]["errors"])
+        self.assertEqual(Passenger.objects.count(), before)
+
+    def test_bulk_create_flights(self):
+        response = self.post("api_flights", {"data": [
+            {"route_id": self.route.pk, "date": "2031-05-01",
+             "departure_time": f"{hour:02}:00", "arrival_time": f"{hour:02}:45"}
+            for hour in range(6, 10)
+        ]})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()["data"]), 4)
+        self.assertEqual(
+            Flight.objects.filter(schedule__date=date(2031, 5, 1)).count(), 4)
+
+
+class FareTests(AirlineTestCase):
+    def setUp(self):
+        # Data versions start over after each test's rollback, so snapshots
+        # compiled by an earlier test could carry the same numbers.
+        fares._engine = None
+        timetable._snapshot = None
+
+    def sell(self, times=3):
+        """Book ``self.flight`` at its quoted fare; return the quotes."""
+        quotes = []
+        for _ in range(times):
+            price = quote(self.flight.flight_no)
+            booking = Booking.objects.create(
+                date_booked=date(2029, 12, 1), total_cost=price,
+                passenger=self.passenger)
+            ItineraryItem.objects.create(booking=booking, flight=self.flight, cost=price)
+            quotes.append(price)
+        return quotes
+
+    def test_multiplier_applies_to_the_route_base_fare_on_every_sale(self):
+        self.route.base_fare = Decimal("2000.00")
+        self.route.save()
+        FareRule.objects.create(name="Promo", multiplier=Decimal("0.9"))
+        self.assertEqual(self.sell(), [Decimal("1800.00")] * 3)
+
+    def test_replace_rule_is_stable_across_sales(self):
+        FareRule.objects.create(
+            name="Flat", route=self.route, fare=Decimal("1000.00"),
+            multiplier=Decimal("1.1"))
+        self.assertEqual(self.sell(), [Decimal("1100.00")] * 3)
+
+    def test_multiplier_without_a_base_fare_keeps_the_last_sold_fare(self):
+        FareRule.objects.create(name="Promo", multiplier=Decimal("0.9"))
+        self.assertEqual(self.sell(), [Decimal("1300.00")] * 3)
+
+
+class BookingReferenceTests(AirlineTestCase):
+    def test_backfill_stores_the_reference_make_reference_builds(self):
+        big = Booking.objects.create(
+            booking_id=123456, date_booked=date(2030, 2, 1),
+            total_cost=Decimal("1500.00"), passenger=self.passenger)
+        Booking.objects.update(booking_reference=None)
+
+        call_command("backfill_booking_references", batch_size=5, stdout=StringIO())
+
+        for booking in Booking.objects.all():
+            self.assertEqual(booking.booking_reference, booking.make_reference())
+        big.refresh_from_db()
+        self.assertEqual(big.booking_reference, "BK-2030-123456")
+
+    def test_lookups_ignore_case(self):
+        booking = Booking.objects.get(passenger=self.passenger)
+        reference = booking.booking_reference.lower()
+
+        data = self.get("api_bookings", reference=reference).json()["data"]
+        self.assertEqual([row["id"] for row in data], [booking.pk])
+        response = self.get("booking_list", search=reference)
+        self.assertEqual(
+            [row["booking"].pk for row in response.context["bookings"]], [booking.pk])
+
+
+class RosterImportTests(AirlineTestCase):
+    def test_csv_import_skips_known_passengers(self):
+        roster = (
+            "First_Name,Last_Name,Birthdate,Gender\n"
+            "Jose,Reyes,1985-02-03,M\n"
+            "Ana,Lim,1992-07-15,F\n"
+            "Maria 0,Santos,1990-01-01,F\n"
+            " Jose , Reyes ,1985-02-03,M\n"
+        )
+        before = Passenger.objects.count()
+        report = rosters.import_passengers(
+            BytesIO(roster.encode()), "csv", batch_size=2)
+        self.assertEqual(
+            (report.rows, report.created, report.duplicates, report.error_count),
+            (4, 2, 2, 0))
+        self.assertEqual(Passenger.objects.count(), before + 2)
+        self.assertTrue(Passenger.objects.filter(
+            first_name="Jose", last_name="Reyes", birthdate=date(1985, 2, 3)).exists())
+
+    def test_bad_rows_are_reported_by_line(self):
+        roster = "\n".join([
+            '{"first_name": "Jose", "last_name": "Reyes", "birthdate": "1985-02-03", "gender": "M"}',
+            '{"first_name": "Ana"',
+            '["not", "an", "object"]',
+            '{"first_name": "Ana", "last_name": "", "birthdate": "1992-07-15", "gender": "F"}',
+            '{"first_name": "Ana", "last_name": "Lim", "birthdate": "1992-07-15", "gender": "X"}',
+        ])
+        report = rosters.import_passengers(BytesIO(roster.encode()), "ndjson")
+        self.assertEqual((report.created, report.error_count), (1, 4))
+        self.assertEqual([line for line, _ in report.errors], [2, 3, 4, 5])
+        self.assertIn("last_name", report.errors[2][1])
+        self.assertIn("gender", report.errors[3][1])
+
+    def test_dry_run_and_unreadable_files(self):
+        roster = b"first_name,last_name,birthdate,gender\nJose,Reyes,1985-02-03,M\n"
+        before = Passenger.objects.count()
+        report = rosters.import_passengers(BytesIO(roster), "csv", dry_run=True)
+        self.assertEqual(report.created, 1)
+        self.assertEqual(Passenger.objects.count(), before)
+
+        with self.assertRaisesMessage(rosters.RosterError, "birthdate"):
+            rosters.import_passengers(
+                BytesIO(b"first_name,last_name,gender\n"), "csv")
+
+
+class DuplicateTests(AirlineTestCase):
+    def setUp(self):
+        def passenger(first_name, last_name, gender="F"):
+            return Passenger.objects.create(
+                first_name=first_name, last_name=last_name,
+                birthdate=date(1980, 5, 5), gender=gender)
+
+        self.kept = passenger("Maria Elena", "De la Cruz")
+        self.duplicate = passenger("Ma. Elena", "DELA CRUZ")
+        self.other_gender = passenger("Maria Elena", "De la Cruz", "M")
+        self.other_name = passenger("Josefina", "de la Cruz")
+
+    def test_score(self):
+        self.assertEqual(duplicates.normalize("Peña-Cruz"), "pena cruz")
+        self.assertEqual(duplicates.score("maria elena", "maria elena"), 1.0)
+        self.assertEqual(
+            duplicates.score("maria elena", "ma elena"), duplicates.INITIALS_SCORE)
+        self.assertEqual(duplicates.score("juan carlos b", "juan carlos c"), 0.0)
+        self.assertGreaterEqual(
+            duplicates.score("jonathan", "jonathon"), duplicates.THRESHOLD)
+        self.assertLess(duplicates.score("maria", "pedro"), duplicates.THRESHOLD)
+
+    def test_scan_pairs_similar_names_in_a_block(self):
+        ids = [self.kept.pk, self.duplicate.pk, self.other_gender.pk, self.other_name.pk]
+        DuplicateCandidate.objects.create(
+            passenger=self.kept, duplicate=self.other_name, score=0.5, dismissed=True)
+
+        duplicates.find_duplicates()
+
+        pairs = DuplicateCandidate.objects.filter(passenger_id__in=ids)
+        self.assertEqual(
+            sorted(pairs.values_list("passenger_id", "duplicate_id", "dismissed")),
+            [(self.kept.pk, self.duplicate.pk, False),
+             (self.kept.pk, self.other_name.pk, True)])
+
+    def test_merge_moves_bookings_to_the_kept_passenger(self):
+        booking = Booking.objects.create(
+            date_booked=date(2030, 1, 1), total_cost=Decimal("1500.00"),
+            passenger=self.duplicate)
+        ArchivedBooking.objects.create(
+            booking_id=999999, booking_reference="BK-2020-999999",
+            passenger_id=self.duplicate.pk, date_booked=date(2020, 1, 1),
+            total_cost=Decimal("900.00"), payload={})
+        after = ChangeEvent.objects.order_by("-event_id").first().event_id
+
+        moved = write_queue.run(duplicates.merge, self.kept.pk, [self.duplicate.pk])
+
+        self.assertEqual(moved, 1)
+        self.assertFalse(Passenger.objects.filter(pk=self.duplicate.pk).exists())
+        booking.refresh_from_db()
+        self.assertEqual((booking.passenger_id, booking.version), (self.kept.pk, 2))
+        self.assertEqual(
+            ArchivedBooking.objects.get(pk=999999).passenger_id, self.kept.pk)
+        self.assertEqual(
+            [(event.object_id, event.action) for event in changes.read(after)],
+            [(booking.pk, ChangeEvent.UPDATE)])
+
+
+class CachedTests(AirlineTestCase):
+    def setUp(self):
+        cache.clear()
+        caching._stats.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            clock.sleep(0.2)
+            return "value"
+
+        with ThreadPoolExecutor(5) as pool:
+            results = list(pool.map(
+                lambda _: caching.cached("test-miss", "key", compute, ttl=60), range(5)))
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(caching.stats()["test-miss"]["coalesced"], 4)
+
+    def test_stale_entry_is_served_while_one_request_refreshes(self):
+        def get(value):
+            return caching.cached(
+                "test-stale", "key", lambda: value, ttl=60, families=(versions.ROUTES,))
+
+        self.assertEqual(get(1), 1)
+        versions.bump(versions.ROUTES)
+        lock = caching._cache_key("test-stale", "key") + ":lock"
+        cache.add(lock, 1)  # Another request is refreshing it.
+        self.assertEqual(get(2), 1)
+        cache.delete(lock)
+        self.assertEqual(get(2), 2)
+        self.assertEqual(get(3), 2)
+        counts = caching.stats()["test-stale"]
+        self.assertEqual((counts["stale_hits"], counts["stale_refreshes"]), (1, 1))
+
+    def test_lock_is_released_when_compute_fails(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            caching.cached("test-fail", "key", fail, ttl=60)
+        self.assertIsNone(cache.get(caching._cache_key("test-fail", "key") + ":lock"))
+        self.assertEqual(caching.cached("test-fail", "key", lambda: "ok", ttl=60), "ok")
+
+
+class BookingCardTests(AirlineTestCase):
+    def setUp(self):
+        # Primary keys are reused between tests; so would cached cards be.
+        cache.clear()
+
+    def test_save_bumps_the_stored_version(self):
+        booking = Booking.objects.get(passenger=self.passenger)
+        stale = Booking.objects.get(pk=booking.pk)
+        # A signal bumps the row behind the stale instance's back.
+        booking.itineraryitem_set.get().save()
+        version = Booking.objects.get(pk=booking.pk).version
+        stale.total_cost += 1
+        stale.save(update_fields=["total_cost"])
+        self.assertEqual(stale.version, version + 1)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).version, version + 1)
+
+    def test_cards_are_cached_until_the_booking_changes(self):
+        url = reverse("airline:booking_list")
+        self.assertContains(self.client.get(url), "Manila")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertFalse(any("airline_itineraryitem" in q["sql"] for q in queries))
+
+        manila = City.objects.get(city_name="Manila")
+        manila.city_name = "Maynila"
+        manila.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Maynila")
+        self.assertNotContains(response, "Manila")
+
+    def test_evicted_card_is_rendered_with_its_itinerary(self):
+        url = reverse("airline:passenger_list")
+        params = {"selected": self.passenger.pk}
+        self.client.get(url, params)
+        booking = Booking.objects.get(passenger=self.passenger)
+        cache.delete(make_template_fragment_key(
+            "passenger_booking_card", [booking.pk, booking.version]))
+        self.assertContains(self.client.get(url, params), "Manila → Cebu")
+
+
+@override_settings(FLIGHT_SEAT_CAPACITY=3)
+class SeatCapacityTests(AirlineTestCase):
+    """Every test flight starts with one of its three seats sold."""
+
+    def setUp(self):
+        self.party = [
+            Passenger.objects.create(
+                first_name=f"Guest {i}", last_name="Lim",
+                birthdate=date(1995, 1, 1), gender="M")
+            for i in range(3)
+        ]
+        self.empty = Flight.objects.create(
+            route=self.route, schedule=self.flight.schedule,
+            departure_time=time(12), arrival_time=time(13, 15))
+
+    def book(self, party, *flights, key=None):
+        return write_queue.run(
+            create_group_booking, party,
+            [{"flight_id": flight.pk, "price": "1300.00"} for flight in flights],
+            idempotency_key=key)
+
+    def test_party_that_fits_is_booked(self):
+        self.assertEqual(len(self.book(self.party[:2], self.flight, self.empty)), 2)
+        self.assertEqual(ItineraryItem.objects.filter(flight=self.flight).count(), 3)
+
+    def test_party_that_overbooks_is_rejected(self):
+        with self.assertRaises(SeatsUnavailable) as raised:
+            self.book(self.party, self.empty, self.flight)
+        self.assertEqual(raised.exception.flight_nos, [self.flight.pk])
+
+    def test_rejected_party_writes_nothing(self):
+        bookings, items = Booking.objects.count(), ItineraryItem.objects.count()
+        with self.assertRaises(SeatsUnavailable):
+            self.book(self.party, self.empty, self.flight, key="party-1")
+        self.assertEqual(Booking.objects.count(), bookings)
+        self.assertEqual(ItineraryItem.objects.count(), items)
+        self.assertFalse(IdempotencyKey.objects.filter(pk="party-1").exists())
+
+        # The key was rolled back too, so a smaller retry books for real.
+        retried = self.book(self.party[:2], self.empty, self.flight, key="party-1")
+        self.assertEqual(len(retried), 2)
+
+
+class MissingFlightTests(AirlineTestCase):
+    MISSING = 999999
+
+    def flights(self):
+        return [{"flight_id": no, "price": "1300.00"}
+                for no in (self.flight.pk, self.MISSING)]
+
+    def test_booking_names_the_missing_flight(self):
+        with self.assertRaises(FlightNotFound) as raised:
+            create_group_booking([self.passenger], self.flights())
+        self.assertEqual(raised.exception.flight_nos, [self.MISSING])
+
+    def test_confirm_answers_404_and_writes_nothing(self):
+        session = self.client.session
+        session["booking_session"] = {"flights": self.flights()}
+        session.save()
+        response = self.client.post(reverse("airline:booking_details"), {
+            "confirm_booking": "1",
+            "passenger_id": self.passenger.pk,
+            "idempotency_key": "form-404",
+        })
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(IdempotencyKey.objects.filter(pk="form-404").exists())
+
+    def test_api_answers_404_when_a_flight_goes_away(self):
+        # The party validated, then the flight was deleted before the save.
+        with mock.patch(
+            "airline.api.create_group_booking",
+            side_effect=FlightNotFound([self.MISSING]),
+        ):
+            response = self.post("api_bookings", {"data": [
+                {"passengers": [self.passenger.pk], "flights": [self.flight.pk]},
+            ]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["error"]["code"], "not_found")
+
+
+class IdempotentBookingTests(AirlineTestCase):
+    def flights(self):
+        return [{"flight_id": self.flight.pk, "price": "1300.00"}]
+
+    def test_replayed_key_returns_the_first_bookings(self):
+        first = create_group_booking(
+            [self.passenger], self.flights(), idempotency_key="retry-1")
+        again = create_group_booking(
+            [self.passenger], self.flights(), baggage_count=2,
+            idempotency_key="retry-1")
+        self.assertEqual([b.pk for b in again], [b.pk for b in first])
+        self.assertEqual(Booking.objects.filter(idempotency_key="retry-1").count(), 1)
+        self.assertFalse(BookingItem.objects.filter(booking__in=first).exists())
+
+    def test_retried_confirm_creates_one_booking(self):
+        session = self.client.session
+        session["booking_session"] = {"flights": self.flights()}
+        session.save()
+        before = Booking.objects.count()
+        created = []
+        # The first confirm clears the booking session; the retry must not
+        # need it.
+        for _ in range(2):
+            response = self.client.post(reverse("airline:booking_details"), {
+                "confirm_booking": "1",
+                "passenger_id": self.passenger.pk,
+                "idempotency_key": "form-1",
+            })
+            self.assertRedirects(
+                response, reverse("airline:success_view"),
+                fetch_redirect_response=False)
+            created.append(self.client.session["booking_created"])
+        self.assertEqual(Booking.objects.count(), before + 1)
+        self.assertEqual(created[0], created[1])
+
+
+class DeleteBookingsTests(AirlineTestCase):
+    def test_deletes_booking_rows_and_bumps_versions(self):
+        bookings = Booking.objects.filter(passenger=self.passenger)
+        ids = list(bookings.values_list("pk", flat=True))
+        before = versions.current(versions.BOOKINGS)
+
+        self.assertEqual(delete_bookings(bookings), 1)
+
+        for model in (Booking, ItineraryItem, BookingItem):
+            self.assertFalse(model.objects.filter(booking_id__in=ids).exists())
+        self.assertEqual(Booking.objects.count(), self.ROWS - 1)
+        self.assertEqual(ItineraryItem.objects.count(), self.ROWS - 1)
+        self.assertGreater(
+            versions.current(versions.BOOKINGS)[versions.BOOKINGS],
+            before[versions.BOOKINGS])
+
+
+class ArchiveTests(AirlineTestCase):
+    # The first three days' flights, bookings and crew assignments.
+    CUTOFF = date(2030, 1, 4)
+
+    def test_moves_closed_bookings_and_past_flights(self):
+        self.assertEqual(archive.archive(self.CUTOFF), (3, 3))
+
+        self.assertEqual(ArchivedBooking.objects.count(), 3)
+        self.assertEqual(ArchivedFlight.objects.count(), 3)
+        self.assertEqual(Booking.objects.count(), self.ROWS - 3)
+        self.assertEqual(Flight.objects.count(), self.ROWS - 3)
+        self.assertEqual(CrewAssignment.objects.count(), self.ROWS - 3)
+        self.assertFalse(
+            Flight.objects.filter(schedule__date__lt=self.CUTOFF).exists())
+        archived = ArchivedBooking.objects.earliest("booking_id")
+        self.assertEqual(archived.payload["itinerary"][0]["date"], "2030-01-01")
+
+    def test_lookups_still_find_archived_bookings(self):
+        booking = Booking.objects.earliest("booking_id")
+        archive.archive(self.CUTOFF)
+
+        response = self.get("booking_history", reference=booking.booking_reference.lower())
+        self.assertTrue(response.context["archived"])
+        self.assertEqual(
+            response.context["result"]["reference"], booking.booking_reference)
+
+        response = self.get("booking_passes", booking.booking_id)
+        self.assertRedirects(
+            response, reverse("airline:booking_history")
+            + f"?reference={booking.booking_reference}")
+
+
+class ChangeFeedTests(AirlineTestCase):
+    def newest(self):
+        return ChangeEvent.objects.order_by("-event_id").first().event_id
+
+    def test_writes_append_events(self):
+        booking = Booking.objects.get(passenger=self.passenger)
+        booking.total_cost += 1
+        booking.save()
+        event = ChangeEvent.objects.order_by("-event_id").first()
+        self.assertEqual((event.entity, event.action), ("booking", ChangeEvent.UPDATE))
+        self.assertEqual(event.payload["version"], booking.version)
+
+        after = self.newest()
+        delete_bookings(Booking.objects.filter(pk=booking.pk))
+        self.assertEqual(
+            sorted((event.entity, event.action) for event in changes.read(after)),
+            [("booking", ChangeEvent.DELETE), ("itinerary_item", ChangeEvent.DELETE)])
+
+    def test_other_databases_only_read_settled_events(self):
+        after = self.newest()
+        booking = Booking.objects.get(passenger=self.passenger)
+        booking.save()
+        with mock.patch.object(changes, "_commits_in_id_order", return_value=False):
+            self.assertEqual(changes.read(after), [])
+            ChangeEvent.objects.filter(event_id__gt=after).update(
+                created_at=timezone.now() - timedelta(minutes=5))
+            self.assertEqual(len(changes.read(after)), 1)
+
+    def test_ack_moves_forward_and_stops_at_the_newest_event(self):
+        newest = self.newest()
+        changes.ack("finance", newest + 100)
+        self.assertEqual(changes.cursor("finance"), newest)
+        changes.ack("finance", 1)
+        self.assertEqual(changes.cursor("finance"), newest)
+
+    def test_compact_keeps_what_a_consumer_has_not_read(self):
+        ids = [event.event_id for event in changes.read(0, 10)]
+        self.assertEqual(changes.compact(), 0)
+        changes.ack("finance", ids[9])
+        changes.ack("crm", ids[4])
+        self.assertEqual(changes.compact(), 5)
+        self.assertEqual(changes.read(0)[0].event_id, ids[5])
+
+    @override_settings(CHANGE_FEED_TOKEN="secret")
+    def test_endpoints_require_a_token_or_staff(self):
+        feed, ack = reverse("airline:changes"), reverse("airline:changes_ack")
+        self.assertEqual(self.client.get(feed).status_code, 401)
+        self.assertEqual(
+            self.client.post(ack, {"consumer": "crm", "cursor": 5}).status_code, 401)
+
+        ids = [event.event_id for event in changes.read(0, 3)]
+        auth = {"HTTP_AUTHORIZATION": "Bearer secret"}
+        response = self.client.post(ack, {"consumer": "crm", "cursor": ids[0]}, **auth)
+        self.assertEqual(response.json()["cursor"], ids[0])
+        page = self.client.get(feed, {"consumer": "crm", "limit": 2}, **auth).json()
+        self.assertEqual([event["id"] for event in page["events"]], ids[1:])
+
+        user = User.objects.create_user("clerk", password="x")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(feed).status_code, 403)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(feed).status_code, 200)
+
+
+@override_settings(JOBS_EAGER=False)
+class WorkerTests(AirlineTestCase):
+    def test_database_error_does_not_stop_the_worker(self):
+        jobs.enqueue("airline.jobs.noop")
+        worker = jobs.Worker(batch_size=5, sleep=0)
+        real_claim = jobs.claim
+        failed = []
+
+        def flaky_claim(*args):
+            if not failed:
+                failed.append(True)
+                raise OperationalError("database is locked")
+            return real_claim(*args)
+
+        with mock.patch.object(jobs, "claim", flaky_claim), \
+                self.assertLogs("airline.jobs", "ERROR"):
+            self.assertEqual(worker.run(burst=True), 1)
+
+
+class AssetTests(SimpleTestCase):
+    def setUp(self):
+        self.source = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        (self.source / "app.js").write_text(
+            "// header\n"
+            "var url = '/a  b/'; /* block */\n"
+            "var re = /\\/+$/g\n"
+            "var total = a + +b\n"
+            "function f(x) {\n    return `${x}  px`\n}\n")
+        # Long enough for collectstatic's gzip sibling to pay off.
+        (self.source / "extra.js").write_text("f( 1 )\n" * 100)
+        (self.source / "base.css").write_text(
+            "/* theme */\n"
+            ".card  a :hover { content: \"a  b\" ; width: calc(1px + 2px); }\n")
+        self.enterContext(override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATIC_ROOT=self.root,
+            STATICFILES_FINDERS=[
+                "django.contrib.staticfiles.finders.FileSystemFinder"],
+            ASSET_BUNDLES={"app.js": ["app.js", "extra.js"], "base.css": ["base.css"]},
+            ASSET_IMAGES={},
+        ))
+
+    def test_minifier_keeps_literals_and_statement_ends(self):
+        self.assertEqual(
+            assets.minify_js((self.source / "app.js").read_text()),
+            "var url='/a  b/';var re=/\\/+$/g\n"
+            "var total=a+ +b\n"
+            "function f(x){return`${x}  px`}\n")
+        self.assertEqual(
+            assets.minify_css((self.source / "base.css").read_text()),
+            '.card a :hover{content:"a  b";width:calc(1px + 2px)}\n')
+
+    def test_bundle_joins_minified_sources(self):
+        built = assets.build()
+        self.assertEqual(
+            built["app.js"].read_text(),
+            assets.minify_js((self.source / "app.js").read_text())
+            + ";\n" + "f(1)\n" * 100)
+        self.assertEqual(built["base.css"].parent, self.source / assets.BUILD_DIR)
+
+    def test_manifest_names_are_served_immutable_and_gzipped(self):
+        assets.build()
+        storages = {**settings.STORAGES, "staticfiles": {
+            "BACKEND": "magis_air.storage.CompressedManifestStaticFilesStorage"}}
+        with override_settings(STORAGES=storages):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            serve._hashed_names = None
+            self.addCleanup(setattr, serve, "_hashed_names", None)
+            hashed = staticfiles_storage.stored_name(assets.bundle_path("app.js"))
+
+            request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+            response = serve.serve_static(request, hashed)
+            self.addCleanup(response.close)
+            self.assertEqual(response["Cache-Control"], serve.FAR_FUTURE)
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertEqual(
+                gzip.decompress(b"".join(response.streaming_content)),
+                (self.root / hashed).read_bytes())
+
+            response = serve.serve_static(request, assets.bundle_path("app.js"))
+            self.addCleanup(response.close)
+            self.assertEqual(response["Cache-Control"], serve.REVALIDATE)
+            with self.assertRaises(Http404):
+                serve.serve_static(request, "../outside.js")
+
+
+@override_settings(SQLITE_WRITE_QUEUE=True)
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        self.queue = WriteQueue()
+
+    def test_writes_run_one_at_a_time_on_the_writer_thread(self):
+        running = []
+        overlapped = []
+
+        def write(n):
+            running.append(n)
+            overlapped.append(len(running) > 1)
+            City.objects.create(city_name=f"City {n}")
+            clock.sleep(0.005)
+            running.remove(n)
+            return threading.current_thread().name
+
+        with ThreadPoolExecutor(8) as pool:
+            names = list(pool.map(lambda n: self.queue.run(write, n), range(16)))
+        self.assertEqual(set(names), {"sqlite-writer"})
+        self.assertFalse(any(overlapped))
+        self.assertEqual(City.objects.count(), 16)
+
+    def test_exception_rolls_back_and_reaches_the_caller(self):
+        def write():
+            City.objects.create(city_name="Rolled back")
+            raise ValueError("no seats")
+
+        with self.assertRaisesMessage(ValueError, "no seats"):
+            self.queue.run(write)
+        self.assertFalse(City.objects.filter(city_name="Rolled back").exists())
+        # The writer survives a failed write.
+        self.assertEqual(self.queue.run(City.objects.count), 0)
+
+    def test_nested_run_on_the_writer_thread_runs_inline(self):
+        def outer():
+            return self.queue.run(lambda: threading.current_thread().name)
+
+        self.assertEqual(self.queue.run(outer), "sqlite-writer")
+
+    @override_settings(SQLITE_WRITE_QUEUE=False)
+    def test_disabled_queue_runs_inline_in_a_transaction(self):
+        def write():
+            return threading.current_thread(), connection.in_atomic_block
+
+        thread, atomic = self.queue.run(write)
+        self.assertIs(thread, threading.current_thread())
+        self.assertTrue(atomic)
+        self.assertIsNone(self.queue._thread)
@@ -0,0 +1,221 @@
+"""
+Compact in-memory timetable used by the flight search.
+
+All flights are held as parallel NumPy columns, sorted by date and
+departure time, and loaded with a few set-based queries. The snapshot
+records the data versions it was built from and is rebuilt when a write
+to routes or flights bumps them, so every process sees changes made by any
+other process. Bookings only move the booked-seat and last-fare columns;
+those two are reloaded on their own with a grouped query over itinerary
+items, sharing every other column with the previous snapshot.
+"""
+
+import copy
+import threading
+from datetime import date, time
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Count, Max
+
+from . import versions
+from .models import City, Flight, ItineraryItem
+
+# Versions that change the rows, and the one that only changes sales.
+FAMILIES = (versions.ROUTES, versions.FLIGHTS)
+SALES_FAMILIES = (versions.BOOKINGS,)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _sales():
+    """``{flight_no: (last sold fare in cents, seats booked)}``."""
+    sold = ItineraryItem.objects.values("flight").annotate(
+        seats=Count("pk"), last=Max("pk"))
+    last_fares = dict(
+        ItineraryItem.objects.filter(pk__in=sold.values("last"))
+        .values_list("flight", "cost")
+    )
+    return {
+        flight_no: (
+            int(last_fares[flight_no] * 100)
+            if last_fares.get(flight_no) is not None else 0,
+            seats,
+        )
+        for flight_no, seats in sold.values_list("flight", "seats")
+    }
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Timetable:
+    columns = (
+        "flight_no",
+        "route_id",
+        "origin_id",
+        "destination_id",
+        "date_ordinal",
+        "departure_minute",
+        "arrival_minute",
+        "duration",
+        "base_cents",
+        "fare_cents",
+        "booked",
+    )
+
+    def __init__(self, rows, city_names, data_versions=None):
+        self.data_versions = data_versions
+        self.city_names = city_names
+
+        rows = sorted(rows, key=lambda row: (row[4], row[5], row[0]))
+        self.flight_no = np.array([r[0] for r in rows], dtype=np.int64)
+        self.route_id = np.array([r[1] for r in rows], dtype=np.int32)
+        self.origin_id = np.array([r[2] for r in rows], dtype=np.int32)
+        self.destination_id = np.array([r[3] for r in rows], dtype=np.int32)
+        self.date_ordinal = np.array([r[4] for r in rows], dtype=np.int32)
+        self.departure_minute = np.array([r[5] for r in rows], dtype=np.int16)
+        self.arrival_minute = np.array([r[6] for r in rows], dtype=np.int16)
+        self.duration = np.array([r[7] for r in rows], dtype=np.int32)
+        self.base_cents = np.array([r[8] for r in rows], dtype=np.int64)
+        self.fare_cents = np.array([r[9] for r in rows], dtype=np.int64)
+        self.booked = np.array([r[10] for r in rows], dtype=np.int32)
+
+    @classmethod
+    def load(cls, data_versions=None):
+        sales = _sales()
+        rows = [
+            (
+                flight_no,
+                route_id,
+                origin_id,
+                destination_id,
+                flight_date.toordinal(),
+                _minutes(departure),
+                _minutes(arrival),
+                duration,
+                int(base_fare * 100) if base_fare is not None else 0,
+                *sales.get(flight_no, (0, 0)),
+            )
+            for (
+                flight_no, route_id, origin_id, destination_id, flight_date,
+                departure, arrival, duration, base_fare,
+            ) in Flight.objects.values_list(
+                "flight_no",
+                "route_id",
+                "route__origin_city_id",
+                "route__destination_city_id",
+                "schedule__date",
+                "departure_time",
+                "arrival_time",
+                "route__duration",
+                "route__base_fare",
+            )
+        ]
+        city_names = dict(City.objects.values_list("city_id", "city_name"))
+        return cls(rows, city_names, data_versions)
+
+    def with_sales(self, sales, data_versions=None):
+        """
+        Return a copy with the fare and booked-seat columns taken from
+        ``sales`` (see ``_sales``); every other column is shared. Flights
+        this snapshot does not have yet are ignored.
+        """
+        clone = copy.copy(self)
+        clone.data_versions = data_versions
+        clone.fare_cents = np.zeros(len(self), dtype=np.int64)
+        clone.booked = np.zeros(len(self), dtype=np.int32)
+        if sales and len(self):
+            flights = np.fromiter(sales, dtype=np.int64, count=len(sales))
+            values = np.array(list(sales.values()), dtype=np.int64)
+            order = np.argsort(self.flight_no)
+            found = np.searchsorted(self.flight_no, flights, sorter=order)
+            positions = order[np.minimum(found, len(self) - 1)]
+            known = self.flight_no[positions] == flights
+            clone.fare_cents[positions[known]] = values[known, 0]
+            clone.booked[positions[known]] = values[known, 1]
+        return clone
+
+    def __len__(self):
+        return len(self.flight_no)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in self.columns)
+
+    def search(self, origin=None, destination=None, on_date=None):
+        """
+        Return row positions matching the given filters, in date and
+        departure order. Unparseable ids match nothing.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if origin:
+            origin = _parse_id(origin)
+            mask &= self.origin_id == (origin if origin is not None else -1)
+        if destination:
+            destination = _parse_id(destination)
+            mask &= self.destination_id == (
+                destination if destination is not None else -1)
+        if on_date:
+            mask &= self.date_ordinal == on_date.toordinal()
+        return np.flatnonzero(mask)
+
+    def find(self, flight_no):
+        """Return the positions of ``flight_no`` (empty if unknown)."""
+        return np.flatnonzero(self.flight_no == flight_no)
+
+    def records(self, positions, fares=None):
+        """
+        Yield one tuple per row, in the shape the search page renders.
+        ``fares`` optionally overrides the last sold fare with priced cents,
+        parallel to ``positions``.
+        """
+        if fares is None:
+            fares = self.fare_cents[positions]
+        for i, fare in zip(positions, fares):
+            departure = int(self.departure_minute[i])
+            arrival = int(self.arrival_minute[i])
+            yield (
+                int(self.flight_no[i]),
+                self.city_names.get(int(self.origin_id[i]), ""),
+                self.city_names.get(int(self.destination_id[i]), ""),
+                date.fromordinal(int(self.date_ordinal[i])),
+                time(*divmod(departure, 60)),
+                time(*divmod(arrival, 60)),
+                int(self.duration[i]),
+                Decimal(int(fare)).scaleb(-2),
+            )
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def _rows_changed(snapshot, current):
+    return snapshot is None or any(
+        snapshot.data_versions[family] != current[family] for family in FAMILIES)
+
+
+def get_timetable():
+    """
+    Return this process's snapshot, rebuilding it if routes or flights
+    changed and refreshing its sales columns if only bookings did.
+    """
+    global _snapshot
+    current = versions.current(*FAMILIES, *SALES_FAMILIES)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.data_versions == current:
+        return snapshot
+
+    with _lock:
+        if _rows_changed(_snapshot, current):
+            _snapshot = Timetable.load(current)
+        elif _snapshot.data_versions != current:
+            _snapshot = _snapshot.with_sales(_sales(), current)
+        return _snapshot
@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import api, views
 
 app_name = 'airline'
 
@@ -24,6 +24,14 @@ urlpatterns = [
         'passengers/new/',
         views.passenger_create_view,
         name='passenger_create'),
+    path(
+        'passengers/import/',
+        views.passenger_import_view,
+        name='passenger_import'),
+    path(
+        'routes/network/',
+        views.route_network_view,
+        name='route_network'),
     path(
         'routes/new/',
         views.flight_route_create_view,
@@ -36,6 +44,10 @@ urlpatterns = [
         'bookings/create',
         views.booking_create,
         name='booking_create'),
+    path(
+        'bookings/fare-calendar',
+        views.fare_calendar_view,
+        name='fare_calendar'),
     path(
         'bookings/details',
         views.booking_details,
@@ -48,6 +60,22 @@ urlpatterns = [
         'bookings/<int:booking_id>/delete',
         views.booking_delete,
         name='booking_delete'),
+    path(
+        'bookings/<int:booking_id>/passes',
+        views.booking_passes_view,
+        name='booking_passes'),
+    path(
+        'bookings/<int:booking_id>/passes/<int:item_id>.png',
+        views.booking_pass_image,
+        name='booking_pass_image'),
+    path(
+        'bookings/history',
+        views.booking_history_view,
+        name='booking_history'),
+    path(
+        'bookings/delete',
+        views.booking_bulk_delete,
+        name='booking_bulk_delete'),
     path(
         'crew/',
         views.crew_assignments_view,
@@ -56,6 +84,65 @@ urlpatterns = [
         'crew/new/',
         views.crew_assignment_create_view,
         name='crew_assignment_create'),
+    path(
+        'departures/',
+        views.departures_board_view,
+        name='departures_board'),
+    path(
+        'departures/stream/',
+        views.departures_stream_view,
+        name='departures_stream'),
+    path(
+        'api/v1/flights/',
+        api.flights,
+        name='api_flights'),
+    path(
+        'api/v1/flights/<int:pk>',
+        api.flight,
+        name='api_flight'),
+    path(
+        'api/v1/routes/',
+        api.routes,
+        name='api_routes'),
+    path(
+        'api/v1/routes/<int:pk>',
+        api.route,
+        name='api_route'),
+    path(
+        'api/v1/passengers/',
+        api.passengers,
+        name='api_passengers'),
+    path(
+        'api/v1/passengers/<int:pk>',
+        api.passenger,
+        name='api_passenger'),
+    path(
+        'api/v1/bookings/',
+        api.bookings,
+        name='api_bookings'),
+    path(
+        'api/v1/bookings/<int:pk>',
+        api.booking,
+        name='api_booking'),
+    re_path(
+        r'^api/v1/(?P<path>.*)$',
+        api.not_found),
+    path(
+        'cache/stats/',
+        views.cache_stats_view,
+        name='cache_stats'),
+    path(
+        'changes/',
+        views.changes_view,
+        name='changes'),
+    path(
+        'changes/ack',
+        views.changes_ack_view,
+        name='changes_ack'),
+    path(
+        'jobs/',
+        views.jobs_view,
+        name='jobs'),
     path(
         'success/',
         views.success_view,
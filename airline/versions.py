@@ -0,0 +1,95 @@
+"""
+Data versions for conditional GET.
+
+Each resource family ("routes", "flights", ...) has a counter in
+``DataVersion`` that signal handlers bump on every write. Pages derive a
+weak ETag from the counters of the families they render, so an unchanged
+page is answered with ``304 Not Modified`` after one small query, without
+running the view's own queries or template.
+"""
+
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import DataVersion
+
+ROUTES = "routes"
+FLIGHTS = "flights"
+BOOKINGS = "bookings"
+PASSENGERS = "passengers"
+FARES = "fares"
+
+
+def bump(*families):
+    for family in families:
+        updated = DataVersion.objects.filter(family=family).update(
+            version=F("version") + 1)
+        if not updated:
+            DataVersion.objects.get_or_create(
+                family=family, defaults={"version": 1})
+
+
+def current(*families):
+    versions = dict(
+        DataVersion.objects.filter(family__in=families).values_list(
+            "family", "version")
+    )
+    return {family: versions.get(family, 0) for family in families}
+
+
+def etag(*families, daily=False):
+    tag = "-".join(
+        f"{family}.{version}" for family, version in current(*families).items()
+    )
+    if daily:
+        # Pages that compare against "today" change at midnight too.
+        tag += f"-{timezone.localdate().isoformat()}"
+    return f'W/"{tag}"'
+
+
+def conditional_on(*families, daily=False):
+    """
+    Answer GET/HEAD with 304 when the client's ETag matches the current
+    versions of ``families``; otherwise run the view and tag its response.
+
+    The tag covers data only, so pages that also depend on the session or
+    user (forms with a CSRF token, a booking in progress) must not use it.
+    """
+
+    def finish(request, response, tag):
+        if response.status_code in (200, 304):
+            # A page that rendered a CSRF token is per-user; never let a
+            # data-only tag vouch for it.
+            if not request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+                response.headers.setdefault("ETag", tag)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+                tag = await sync_to_async(etag)(*families, daily=daily)
+                response = get_conditional_response(request, etag=tag)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return finish(request, response, tag)
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return view(request, *args, **kwargs)
+                tag = etag(*families, daily=daily)
+                response = get_conditional_response(request, etag=tag)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return finish(request, response, tag)
+        return wrapper
+
+    return decorator
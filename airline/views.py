@@ -1,11 +1,37 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from django.db.models import Avg, Count, Q, Sum
-from django.http import Http404, HttpRequest, JsonResponse
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models import Avg, Count, Q, Sum, prefetch_related_objects
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
 from django.urls import reverse
 
+from . import caching, changes, departures, documents, jobs, rosters, versions
+from .analytics import get_network
+from .archive import find_booking
+from .bookings import (
+    FlightNotFound,
+    SeatsUnavailable,
+    create_group_booking,
+    delete_bookings,
+)
+from .fares import addon_prices, fare_calendar, get_fare_engine, quote
 from .forms import (
     CrewAssignmentForm,
     FlightCreationForm,
@@ -15,6 +41,7 @@ from .forms import (
 
 from .models import (
     AdditionalItem,
+    ArchivedBooking,
     Booking,
     BookingItem,
     City,
@@ -22,13 +49,86 @@ from .models import (
     Flight,
     FlightRoute,
     FlightSchedule,
+    IdempotencyKey,
     ItineraryItem,
     Passenger,
 )
+from .routers import read_from_replica
+from .timetable import get_timetable
+from .versions import conditional_on
+from .writequeue import write_queue
 
+from asgiref.sync import sync_to_async
+import asyncio
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
+import os
+import re
+import time
+import uuid
+
+BOOKING_REFERENCE = re.compile(r"BK-\d{4}-\d{5,}", re.IGNORECASE)
+FLIGHT_DESIGNATOR = re.compile(r"MA\d+", re.IGNORECASE)
+
+# Longest a change-feed request waits for new events, and how often it looks.
+CHANGES_MAX_WAIT = 25
+CHANGES_POLL_INTERVAL = 0.5
+
+# Cached flight searches and reference lists are also refreshed as soon as
+# their data versions move on; the TTL bounds everything else (the date).
+SEARCH_CACHE_TTL = 60
+REFERENCE_CACHE_TTL = 60 * 60
+SEARCH_FAMILIES = (
+    versions.ROUTES, versions.FLIGHTS, versions.BOOKINGS, versions.FARES)
+
+
+def _cities():
+    return caching.cached(
+        "cities", "by_name",
+        lambda: list(City.objects.order_by("city_name")),
+        ttl=REFERENCE_CACHE_TTL, families=(versions.ROUTES,))
+
+
+def _additional_items():
+    return caching.cached(
+        "additional_items", "all",
+        lambda: list(AdditionalItem.objects.all()),
+        ttl=REFERENCE_CACHE_TTL, families=(versions.FARES,))
+
+
+def _search_flights(origin_id, destination_id, on_date):
+    """Priced search results; identical concurrent searches share one run."""
+
+    def compute():
+        timetable = get_timetable()
+        positions = timetable.search(origin_id, destination_id, on_date)
+        fares = get_fare_engine().price(timetable, positions)
+        return [
+            {
+                "id": flight_no,
+                "id_formatted": f"MA{flight_no:03d}",
+                "origin": origin,
+                "destination": destination,
+                "date": flight_date,
+                "departure": departure,
+                "arrival": arrival,
+                "duration": _format_duration(duration),
+                "price": fare,
+            }
+            for (
+                flight_no, origin, destination, flight_date,
+                departure, arrival, duration, fare,
+            ) in timetable.records(positions, fares)
+        ]
+
+    # Fares depend on days to departure, so today is part of the key.
+    key = ":".join(
+        str(part or "")
+        for part in (origin_id, destination_id, on_date, timezone.localdate()))
+    return caching.cached(
+        "flight_search", key, compute,
+        ttl=SEARCH_CACHE_TTL, families=SEARCH_FAMILIES)
 
 
 def _format_duration(minutes):
@@ -71,17 +171,57 @@ def _serialize_itinerary(items):
     return payload
 
 
-def _get_flight_price(flight):
-    item = (
-        ItineraryItem.objects.filter(flight=flight).order_by(
-            "-itinerary_item_id").first()
-    )
-    if item and item.cost is not None:
-        return item.cost
-    return Decimal("0.00")
+ITINERARY_PREFETCH = (
+    "itineraryitem_set__flight__route__origin_city",
+    "itineraryitem_set__flight__route__destination_city",
+    "itineraryitem_set__flight__schedule",
+)
+
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def _render_cards(name, bookings, context, *prefetch):
+    """
+    Render the ``{name}.html`` card of each booking, keyed on
+    ``Booking.version`` in the cache so changed bookings miss. Only the
+    missing cards have ``prefetch`` loaded and ``context(booking)`` built.
+    Returns the cards in ``bookings`` order.
+    """
+    keys = [
+        make_template_fragment_key(name, [booking.booking_id, booking.version])
+        for booking in bookings
+    ]
+    cards = cache.get_many(keys)
+    missing = {
+        key: booking for key, booking in zip(keys, bookings) if key not in cards}
+    prefetch_related_objects(list(missing.values()), *prefetch)
+    rendered = {
+        key: render_to_string(f"{name}.html", context(booking))
+        for key, booking in missing.items()
+    }
+    cache.set_many(rendered, CARD_TIMEOUT)
+    cards.update(rendered)
+    return [mark_safe(cards[key]) for key in keys]
 
 
-def flight_routes_view(request: HttpRequest):
+def _booking_confirmed(request, booking_ids):
+    documents.prerender(booking_ids)
+    request.session.pop("booking_session", None)
+    request.session["booking_created"] = list(booking_ids)
+    return redirect("airline:success_view")
+
+
+def _clear_booking_session(request):
+    booking_session = request.session.get("booking_session")
+    if booking_session and booking_session["flights"]:
+        booking_session["flights"] = []
+        request.session.modified = True
+
+
+@read_from_replica
+@conditional_on(versions.ROUTES, versions.FLIGHTS)
+async def flight_routes_view(request: HttpRequest):
     search = request.GET.get("search", "").strip()
 
     base_queryset = (
@@ -118,17 +258,17 @@ def flight_routes_view(request: HttpRequest):
             "raw_duration": route.duration,
             "flight_total": route.flight_total,
         }
-        for route in base_queryset
+        async for route in base_queryset
     ]
 
     all_routes = FlightRoute.objects.all()
-    avg_duration = all_routes.aggregate(
-        value=Avg("duration")).get("value") or 0
-    busiest_origin = (
+    avg_duration = (await all_routes.aaggregate(
+        value=Avg("duration"))).get("value") or 0
+    busiest_origin = await (
         all_routes.values("origin_city__city_name")
         .annotate(total=Count("route_id"))
         .order_by("-total")
-        .first()
+        .afirst()
     )
 
     context = {
@@ -136,7 +276,7 @@ def flight_routes_view(request: HttpRequest):
         "filters": {"search": search},
         "routes": routes,
         "stats": {
-            "total_routes": all_routes.count(),
+            "total_routes": await all_routes.acount(),
             "visible_routes": len(routes),
             "avg_duration": _format_duration(avg_duration),
             "busiest_origin": busiest_origin["origin_city__city_name"]
@@ -147,6 +287,48 @@ def flight_routes_view(request: HttpRequest):
     return render(request, "flight_routes.html", context)
 
 
+@read_from_replica
+def route_network_view(request: HttpRequest):
+    origin_id = request.GET.get("origin")
+    destination_id = request.GET.get("destination")
+
+    network = get_network()
+    names = dict(zip(network.city_ids.tolist(), network.city_names))
+
+    fastest = None
+    searched = bool(origin_id and destination_id)
+    if searched:
+        try:
+            result = network.fastest(int(origin_id), int(destination_id))
+        except ValueError:
+            result = None
+        if result:
+            minutes, path = result
+            fastest = {
+                "duration": _format_duration(minutes),
+                "stops": len(path) - 2,
+                "cities": [names[city_id] for city_id in path],
+            }
+
+    context = {
+        "page": "routes",
+        "filters": {
+            "origin": origin_id or "",
+            "destination": destination_id or "",
+        },
+        "cities": sorted(names.items(), key=lambda item: item[1]),
+        "searched": searched,
+        "fastest": fastest,
+        "reachability": network.reachability(),
+        "hubs": network.hubs(),
+        "stats": {
+            "cities": len(network),
+            "routes": network.route_count,
+        },
+    }
+    return render(request, "route_network.html", context)
+
+
 def flight_route_create_view(request: HttpRequest):
     if request.method == "POST":
         form = FlightRouteForm(request.POST)
@@ -159,12 +341,13 @@ def flight_route_create_view(request: HttpRequest):
     context = {
         "page": "routes",
         "form": form,
-        "cities": City.objects.order_by("city_name"),
+        "cities": _cities(),
     }
     return render(request, "flight_route_create.html", context)
 
 
-def flight_schedules_view(request: HttpRequest):
+@conditional_on(versions.ROUTES, versions.FLIGHTS, daily=True)
+async def flight_schedules_view(request: HttpRequest):
     origin_id = request.GET.get("origin")
     destination_id = request.GET.get("destination")
     date_filter = _parse_date(request.GET.get("date"))
@@ -195,13 +378,13 @@ def flight_schedules_view(request: HttpRequest):
             "arrival": flight.arrival_time,
             "duration": _format_duration(flight.route.duration),
         }
-        for flight in flights
+        async for flight in flights
     ]
 
-    upcoming = flights.filter(
-        schedule__date__gte=timezone.now().date()).count()
+    upcoming = await flights.filter(
+        schedule__date__gte=timezone.now().date()).acount()
 
-    cities = City.objects.order_by("city_name")
+    cities = await sync_to_async(_cities)()
 
     context = {
         "page": "schedules",
@@ -213,26 +396,29 @@ def flight_schedules_view(request: HttpRequest):
         "cities": cities,
         "schedules": schedules,
         "stats": {
-            "total_flights": flights.count(),
+            "total_flights": len(schedules),
             "upcoming": upcoming,
         },
     }
     return render(request, "flight_schedules.html", context)
 
 
+def _create_flight(data):
+    schedule, _ = FlightSchedule.objects.get_or_create(
+        date=data["schedule_date"])
+    return Flight.objects.create(
+        arrival_time=data["arrival_time"],
+        departure_time=data["departure_time"],
+        schedule=schedule,
+        route=data["route"],
+    )
+
+
 def flight_schedule_create_view(request: HttpRequest):
     if request.method == "POST":
         form = FlightCreationForm(request.POST)
         if form.is_valid():
-            data = form.cleaned_data
-            schedule, _ = FlightSchedule.objects.get_or_create(
-                date=data["schedule_date"])
-            Flight.objects.create(
-                arrival_time=data["arrival_time"],
-                departure_time=data["departure_time"],
-                schedule=schedule,
-                route=data["route"],
-            )
+            write_queue.run(_create_flight, form.cleaned_data)
             return redirect("airline:flight_schedules")
     else:
         form = FlightCreationForm()
@@ -252,7 +438,7 @@ def booking_create(request: HttpRequest):
 
         if flight_id:
             flight = get_object_or_404(Flight, flight_no=flight_id)
-            price = _get_flight_price(flight)
+            price = quote(flight.flight_no)
 
             if "booking_session" not in request.session:
                 request.session["booking_session"] = {
@@ -267,6 +453,7 @@ def booking_create(request: HttpRequest):
                     "destination": request.POST.get("destination"),
                     "departure_date": request.POST.get("departure_date"),
                     "return_date": request.POST.get("return_date"),
+                    "passengers": request.POST.get("passengers"),
                 }
 
             flight_data = {
@@ -296,60 +483,21 @@ def booking_create(request: HttpRequest):
     except (TypeError, ValueError):
         passenger_count = 1
 
-    base_queryset = Flight.objects.select_related(
-        "route__origin_city", "route__destination_city", "schedule"
-    ).order_by("schedule__date", "departure_time")
-
-    def _build_results(queryset):
-        return [
-            {
-                "id": flight.flight_no,
-                "id_formatted": f"MA{flight.flight_no:03d}",
-                "origin": flight.route.origin_city.city_name,
-                "destination": flight.route.destination_city.city_name,
-                "date": flight.schedule.date if flight.schedule else None,
-                "departure": flight.departure_time,
-                "arrival": flight.arrival_time,
-                "duration": _format_duration(flight.route.duration),
-                "price": _get_flight_price(flight),
-            }
-            for flight in queryset
-        ]
-
     outbound_results = []
     return_results = []
 
     if request.GET:
-        outbound_queryset = base_queryset
-        if origin_id:
-            outbound_queryset = outbound_queryset.filter(
-                route__origin_city_id=origin_id)
-        if destination_id:
-            outbound_queryset = outbound_queryset.filter(
-                route__destination_city_id=destination_id
-            )
-        if departure_date:
-            outbound_queryset = outbound_queryset.filter(
-                schedule__date=departure_date)
-
-        outbound_results = _build_results(outbound_queryset)
+        outbound_results = _search_flights(origin_id, destination_id, departure_date)
 
         if trip_type == "round_trip" and origin_id and destination_id:
-            return_queryset = base_queryset.filter(
-                route__origin_city_id=destination_id,
-                route__destination_city_id=origin_id,
-            )
-            if return_date:
-                return_queryset = return_queryset.filter(
-                    schedule__date=return_date)
-            return_results = _build_results(return_queryset)
+            return_results = _search_flights(destination_id, origin_id, return_date)
 
     search_performed = bool(request.GET)
 
     context = {
         "page": "bookings",
         "passengers": Passenger.objects.order_by("last_name", "first_name"),
-        "cities": City.objects.order_by("city_name"),
+        "cities": _cities(),
         "outbound_results": outbound_results,
         "return_results": return_results,
         "search_performed": search_performed,
@@ -366,80 +514,86 @@ def booking_create(request: HttpRequest):
     return render(request, "booking_create.html", context)
 
 
+@conditional_on(
+    versions.ROUTES,
+    versions.FLIGHTS,
+    versions.BOOKINGS,
+    versions.FARES,
+    daily=True,
+)
+def fare_calendar_view(request: HttpRequest):
+    try:
+        origin_id = int(request.GET["origin"])
+        destination_id = int(request.GET["destination"])
+        days = min(max(int(request.GET.get("days", 30)), 1), 90)
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({"error": "Invalid input"}, status=400)
+    start = _parse_date(request.GET.get("start")) or timezone.localdate()
+
+    calendar = fare_calendar(origin_id, destination_id, start, days)
+    return JsonResponse(
+        {
+            "origin": origin_id,
+            "destination": destination_id,
+            "days": [
+                {"date": day.isoformat(), "fare": str(fare), "flights": flights}
+                for day, fare, flights in calendar
+            ],
+        }
+    )
+
+
 def booking_details(request: HttpRequest):
     booking_id = request.GET.get("booking_id")
     is_edit_mode = bool(booking_id)
 
     if request.method == "POST" and ("confirm_booking" in request.POST or "update_booking" in request.POST):
+        idempotency_key = request.POST.get("idempotency_key", "")[:64]
+        if idempotency_key and IdempotencyKey.objects.filter(pk=idempotency_key).exists():
+            # A retried confirm: answer with what the first attempt created.
+            return _booking_confirmed(
+                request,
+                Booking.objects.filter(idempotency_key=idempotency_key)
+                .values_list("booking_id", flat=True),
+            )
+
         booking_session = request.session.get("booking_session", {})
         flights = booking_session.get("flights", [])
 
         if not flights:
             return redirect("airline:booking_create")
 
-        passenger_id = request.POST.get("passenger_id")
-        if not passenger_id:
+        passenger_ids = set(request.POST.getlist("passenger_id"))
+        passenger_ids.discard("")
+        if not passenger_ids:
             messages.error(
                 request, "Please select a passenger before confirming the booking.")
             return redirect("airline:booking_details")
 
-        passenger = get_object_or_404(Passenger, passenger_id=passenger_id)
-
-        flights_cost = sum(Decimal(str(f.get("price", 0))) for f in flights)
+        passengers = list(Passenger.objects.filter(passenger_id__in=passenger_ids))
+        if len(passengers) != len(passenger_ids):
+            raise Http404("No Passenger matches the given query.")
 
         baggage_count = int(request.POST.get("baggage_count", 0))
         has_insurance = request.POST.get("has_insurance") == "on"
 
-        additional_cost = Decimal("0.00")
-        if baggage_count > 0:
-            additional_cost += Decimal("237.00") * baggage_count
-        if has_insurance:
-            additional_cost += Decimal("208.00")
-
-        total_cost = flights_cost + additional_cost
-
-        booking = Booking.objects.create(
-            date_booked=timezone.now().date(),
-            total_cost=total_cost,
-            passenger=passenger,
-        )
-
-        for flight_data in flights:
-            flight = get_object_or_404(
-                Flight, flight_no=flight_data["flight_id"])
-            ItineraryItem.objects.create(
-                booking=booking,
-                flight=flight,
-                cost=Decimal(str(flight_data["price"])),
-            )
-
-        if baggage_count > 0:
-            baggage_item, _ = AdditionalItem.objects.get_or_create(
-                description="Additional Baggage Allowance (5kg)",
-                defaults={"cost_per_unit": Decimal("237.00")}
-            )
-            BookingItem.objects.create(
-                booking=booking,
-                item=baggage_item,
-                quantity=baggage_count,
-                subtotal_cost=Decimal("237.00") * baggage_count,
-            )
-
-        if has_insurance:
-            insurance_item, _ = AdditionalItem.objects.get_or_create(
-                description="Travel Insurance",
-                defaults={"cost_per_unit": Decimal("208.00")}
-            )
-            BookingItem.objects.create(
-                booking=booking,
-                item=insurance_item,
-                quantity=1,
-                subtotal_cost=Decimal("208.00"),
+        try:
+            bookings = write_queue.run(
+                create_group_booking,
+                passengers,
+                flights,
+                baggage_count=baggage_count,
+                has_insurance=has_insurance,
+                idempotency_key=idempotency_key or None,
             )
+        except FlightNotFound as exc:
+            raise Http404(str(exc))
+        except SeatsUnavailable as exc:
+            messages.error(request, f"{exc}. Please choose another flight.")
+            return redirect("airline:booking_details")
 
-        request.session.pop("booking_session", None)
-        request.session["booking_created"] = True
-        return redirect("airline:success_view")
+        return _booking_confirmed(
+            request, [booking.booking_id for booking in bookings])
 
     if request.GET.get("add_flight") == "1":
         booking_session = request.session.get("booking_session", {})
@@ -497,7 +651,13 @@ def booking_details(request: HttpRequest):
 
     passengers = Passenger.objects.order_by("last_name", "first_name")
 
-    additional_items = AdditionalItem.objects.all()
+    additional_items = _additional_items()
+    baggage_price, insurance_price = addon_prices()
+
+    try:
+        party_size = max(1, int(search_data.get("passengers") or 1))
+    except (TypeError, ValueError):
+        party_size = 1
 
     selected_passenger_id = None
     initial_baggage = 0
@@ -522,8 +682,10 @@ def booking_details(request: HttpRequest):
         "passengers": passengers,
         "additional_items": additional_items,
         "flights_cost": flights_cost,
-        "baggage_price": Decimal("237.00"),
-        "insurance_price": Decimal("208.00"),
+        "baggage_price": baggage_price,
+        "insurance_price": insurance_price,
+        "party_size": party_size,
+        "idempotency_key": uuid.uuid4().hex,
         "is_edit_mode": is_edit_mode,
         "booking_id": booking_id,
         "selected_passenger_id": selected_passenger_id,
@@ -562,20 +724,247 @@ def booking_edit(request: HttpRequest, booking_id):
 
 @require_POST
 def booking_delete(request: HttpRequest, booking_id):
-    booking = get_object_or_404(Booking, booking_id=booking_id)
-    booking.delete()
+    deleted = write_queue.run(
+        delete_bookings, Booking.objects.filter(booking_id=booking_id))
+    if not deleted:
+        raise Http404("No Booking matches the given query.")
     messages.success(request, "Booking deleted successfully!")
     return redirect("airline:booking_list")
 
 
+@require_POST
+def booking_bulk_delete(request: HttpRequest):
+    booking_ids = [
+        value for value in request.POST.getlist("booking_ids") if value.isdigit()
+    ]
+    if not booking_ids:
+        messages.error(request, "Select at least one booking to delete.")
+        return redirect("airline:booking_list")
+
+    deleted = write_queue.run(
+        delete_bookings, Booking.objects.filter(booking_id__in=booking_ids))
+    messages.success(
+        request, f"Deleted {deleted} booking{'s' if deleted != 1 else ''}.")
+    return redirect("airline:booking_list")
+
+
+def booking_history_view(request: HttpRequest):
+    reference = request.GET.get("reference", "").strip()
+
+    booking = None
+    archived = False
+    if reference:
+        booking, archived = find_booking(reference)
+
+    result = None
+    if booking is not None and archived:
+        payload = booking.payload
+        result = {
+            "reference": booking.booking_reference,
+            "passenger": "{first_name} {last_name}".format(**payload["passenger"]),
+            "date_booked": booking.date_booked,
+            "total_cost": booking.total_cost,
+            "itinerary": [
+                dict(
+                    leg,
+                    flight_no_formatted=f"MA{leg['flight_no']:03d}",
+                    date=_parse_date(leg["date"]),
+                    departure=datetime.strptime(leg["departure"], "%H:%M").time(),
+                    arrival=datetime.strptime(leg["arrival"], "%H:%M").time(),
+                )
+                for leg in payload["itinerary"]
+            ],
+            "additional_items": payload["additional_items"],
+            "archived_at": booking.archived_at,
+        }
+    elif booking is not None:
+        prefetch_related_objects(
+            [booking], *ITINERARY_PREFETCH, "bookingitem_set__item")
+        result = {
+            "reference": booking.booking_reference,
+            "passenger": f"{booking.passenger.first_name} {booking.passenger.last_name}",
+            "date_booked": booking.date_booked,
+            "total_cost": booking.total_cost,
+            "itinerary": _serialize_itinerary(booking.itineraryitem_set.all()),
+            "additional_items": [
+                {
+                    "description": item.item.description,
+                    "quantity": item.quantity,
+                    "subtotal": item.subtotal_cost,
+                }
+                for item in booking.bookingitem_set.all()
+            ],
+            "booking_id": booking.booking_id,
+        }
+
+    context = {
+        "page": "bookings",
+        "reference": reference,
+        "result": result,
+        "archived": archived,
+    }
+    return render(request, "booking_history.html", context)
+
+
+def booking_passes_view(request: HttpRequest, booking_id):
+    booking = (
+        Booking.objects.select_related("passenger")
+        .filter(booking_id=booking_id)
+        .first()
+    )
+    if booking is None:
+        # Archived bookings have flown; show what the archive kept instead.
+        archived = get_object_or_404(ArchivedBooking, booking_id=booking_id)
+        query = urlencode({"reference": archived.booking_reference})
+        return redirect(f"{reverse('airline:booking_history')}?{query}")
+    passes = documents.tickets(ItineraryItem.objects.filter(booking=booking))
+    # Anything not on disk yet is drawn by a background job; the page
+    # reloads until every pass is ready.
+    if not all(documents.path(ticket).exists() for ticket in passes):
+        documents.prerender([booking.booking_id])
+    for ticket in passes:
+        ticket["ready"] = documents.path(ticket).exists()
+
+    context = {
+        "page": "bookings",
+        "booking": booking,
+        "passes": passes,
+        "waiting": not all(ticket["ready"] for ticket in passes),
+    }
+    return render(request, "booking_passes.html", context)
+
+
+def booking_pass_image(request: HttpRequest, booking_id, item_id):
+    found = documents.tickets(
+        ItineraryItem.objects.filter(booking_id=booking_id, pk=item_id))
+    if not found:
+        raise Http404("No boarding pass matches the given query.")
+    ticket = found[0]
+
+    etag = f'"{ticket["item_id"]}-v{ticket["version"]}"'
+    if request.headers.get("If-None-Match") == etag:
+        return HttpResponseNotModified(headers={"ETag": etag})
+
+    path = documents.path(ticket)
+    if not path.exists():
+        documents.prerender([ticket["booking_id"]])
+    if not path.exists():
+        return HttpResponse(
+            "Boarding pass is being prepared.", status=503,
+            content_type="text/plain", headers={"Retry-After": "2"})
+
+    response = FileResponse(
+        path.open("rb"),
+        content_type="image/png",
+        as_attachment="download" in request.GET,
+        filename=f"{ticket['reference']}-MA{ticket['flight_no']}.png",
+    )
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def jobs_view(request: HttpRequest):
+    context = {
+        "page": "jobs",
+        "stats": jobs.stats(),
+        "eager": settings.JOBS_EAGER,
+    }
+    return render(request, "jobs.html", context)
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+
+
+@changes.require_feed_access
+async def changes_view(request: HttpRequest):
+    """
+    Change events after a cursor, oldest first. Readers pass ``after`` (or a
+    ``consumer`` name to resume from its acknowledged cursor), an optional
+    ``limit`` and comma-separated ``entity`` filter, and ``wait`` seconds to
+    long-poll when nothing is pending.
+    """
+    try:
+        after = _int_param(request.GET, "after", 0)
+        limit = _int_param(request.GET, "limit", changes.BATCH_SIZE)
+        wait = min(_int_param(request.GET, "wait", 0), CHANGES_MAX_WAIT)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    entities = [e for e in request.GET.get("entity", "").split(",") if e]
+    unknown = set(entities) - set(changes.ENTITIES.values())
+    if unknown or limit < 1:
+        return JsonResponse({"error": "Invalid input"}, status=400)
+
+    consumer = request.GET.get("consumer", "")
+    if consumer and "after" not in request.GET:
+        after = await sync_to_async(changes.cursor)(consumer)
+
+    deadline = time.monotonic() + wait
+    while True:
+        events = await sync_to_async(changes.read)(after, limit + 1, entities)
+        if events or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(CHANGES_POLL_INTERVAL)
+
+    more = len(events) > limit
+    events = events[:limit]
+    return JsonResponse({
+        "events": [changes.as_dict(event) for event in events],
+        "next": events[-1].event_id if events else after,
+        "more": more,
+    })
+
+
+@csrf_exempt
+@require_POST
+@changes.require_feed_access
+def changes_ack_view(request: HttpRequest):
+    """Acknowledge everything up to ``cursor`` for ``consumer``."""
+    consumer = request.POST.get("consumer", "").strip()
+    try:
+        cursor = int(request.POST.get("cursor", ""))
+    except ValueError:
+        cursor = -1
+    if not consumer or cursor < 0:
+        return JsonResponse({"error": "Invalid input"}, status=400)
+    write_queue.run(changes.ack, consumer, cursor)
+    return JsonResponse({"consumer": consumer, "cursor": changes.cursor(consumer)})
+
+
+def cache_stats_view(request: HttpRequest):
+    """Hit/miss/coalescing counters of this worker process's caches."""
+    return JsonResponse({"pid": os.getpid(), "caches": caching.stats()})
+
+
 def success_view(request: HttpRequest):
-    if not request.session.pop('booking_created', False):
+    booking_ids = request.session.pop('booking_created', False)
+    if not booking_ids:
         return redirect('airline:booking_list')
 
-    return render(request, 'success.html')
+    bookings = []
+    if isinstance(booking_ids, list):
+        bookings = Booking.objects.filter(
+            booking_id__in=booking_ids).select_related('passenger')
+    return render(request, 'success.html', {'bookings': bookings})
+
+
+def _passenger_booking_card(booking):
+    return {
+        "booking": {
+            "booking_reference": booking.booking_reference,
+            "date": booking.date_booked,
+            "total": booking.total_cost,
+            "itinerary": _serialize_itinerary(booking.itineraryitem_set.all()),
+        }
+    }
 
 
-def passenger_list_view(request: HttpRequest):
+@read_from_replica
+async def passenger_list_view(request: HttpRequest):
     search = request.GET.get("search", "").strip()
     gender = request.GET.get("gender", "").strip().upper()
     selected_id = request.GET.get("selected")
@@ -592,38 +981,32 @@ def passenger_list_view(request: HttpRequest):
     if gender in dict(Passenger.gender_choices):
         passengers = passengers.filter(gender=gender)
 
-    passengers = passengers.order_by("last_name", "first_name")
+    passengers = [
+        passenger
+        async for passenger in passengers.order_by("last_name", "first_name")
+    ]
 
     selected_passenger = None
     if selected_id:
-        selected_passenger = passengers.filter(
-            passenger_id=selected_id).first()
+        selected_passenger = next(
+            (p for p in passengers if str(p.passenger_id) == selected_id),
+            None,
+        )
 
-    if not selected_passenger:
-        selected_passenger = passengers.first()
+    if not selected_passenger and passengers:
+        selected_passenger = passengers[0]
 
     booking_history = []
     if selected_passenger:
-        bookings = (
-            Booking.objects.filter(passenger=selected_passenger)
-            .prefetch_related(
-                "itineraryitem_set__flight__route__origin_city",
-                "itineraryitem_set__flight__route__destination_city",
-                "itineraryitem_set__flight__schedule",
-            )
-            .order_by("-date_booked")
-        )
-
-        booking_history = [
-            {
-                "id": booking.booking_id,
-                "booking_reference": booking.booking_reference,
-                "date": booking.date_booked,
-                "total": booking.total_cost,
-                "itinerary": _serialize_itinerary(booking.itineraryitem_set.all()),
-            }
-            for booking in bookings
+        bookings = [
+            booking
+            async for booking in Booking.objects.filter(
+                passenger=selected_passenger
+            ).order_by("-date_booked")
         ]
+        booking_history = await sync_to_async(_render_cards)(
+            "passenger_booking_card", bookings, _passenger_booking_card,
+            *ITINERARY_PREFETCH)
 
     context = {
         "page": "passengers",
@@ -632,8 +1015,8 @@ def passenger_list_view(request: HttpRequest):
         "selected_passenger": selected_passenger,
         "booking_history": booking_history,
         "summary": {
-            "total": Passenger.objects.count(),
-            "filtered": passengers.count(),
+            "total": await Passenger.objects.acount(),
+            "filtered": len(passengers),
         },
     }
     return render(request, "passenger_list.html", context)
@@ -657,24 +1040,79 @@ def passenger_create_view(request: HttpRequest):
     return render(request, "passenger_create.html", context)
 
 
-def booking_list_view(request: HttpRequest):
+def passenger_import_view(request: HttpRequest):
+    report = None
+    error = None
+    if request.method == "POST":
+        upload = request.FILES.get("roster")
+        format = request.POST.get("format") or (
+            rosters.detect_format(upload.name) if upload else None)
+        if not upload:
+            error = "Choose a roster file to upload."
+        elif format not in rosters.FORMATS:
+            error = "Upload a .csv or .ndjson file, or pick the format."
+        else:
+            try:
+                report = rosters.import_passengers(
+                    upload, format, dry_run="dry_run" in request.POST)
+            except rosters.RosterError as exc:
+                error = str(exc)
+
+    context = {
+        "page": "passengers",
+        "report": report,
+        "error": error,
+        "fields": rosters.FIELDS,
+        "dry_run": "dry_run" in request.POST,
+    }
+    return render(request, "passenger_import.html", context)
+
+
+def _booking_card(booking):
+    itinerary = _serialize_itinerary(booking.itineraryitem_set.all())
+    additional_items = [
+        {
+            "id": item.booking_item_id,
+            "description": item.item.description if item.item else "Additional service",
+            "quantity": item.quantity,
+            "subtotal": item.subtotal_cost or Decimal("0.00"),
+        }
+        for item in booking.bookingitem_set.all()
+    ]
+    flights_total = sum((leg.get("cost") or Decimal("0.00"))
+                        for leg in itinerary)
+    additional_total = sum(
+        (entry["subtotal"] for entry in additional_items), Decimal("0.00"))
+    return {
+        "row": {
+            "booking": booking,
+            "itinerary": itinerary,
+            "additional_items": additional_items,
+            "price_summary": {
+                "flights": flights_total,
+                "additional": additional_total,
+                "total": booking.total_cost or (flights_total + additional_total),
+            },
+        }
+    }
+
+
+@read_from_replica
+async def booking_list_view(request: HttpRequest):
     search = request.GET.get("search", "").strip()
     date_filter = _parse_date(request.GET.get("date"))
     cancel = bool(request.GET.get("cancel"))
 
     if cancel:
-        if request.session["booking_session"]["flights"]:
-            request.session["booking_session"]["flights"] = []
-            request.session.modified = True
+        await sync_to_async(_clear_booking_session)(request)
         return redirect("airline:booking_list")
 
-    bookings = Booking.objects.select_related("passenger").prefetch_related(
-        "itineraryitem_set__flight__route__origin_city",
-        "itineraryitem_set__flight__route__destination_city",
-        "itineraryitem_set__flight__schedule",
-    )
+    bookings = Booking.objects.select_related("passenger")
 
-    if search:
+    if BOOKING_REFERENCE.fullmatch(search):
+        # A quoted reference: one probe of the unique index.
+        bookings = bookings.filter(booking_reference=search.upper())
+    elif search:
         bookings = bookings.filter(
             Q(booking_id__icontains=search)
             | Q(passenger__first_name__icontains=search)
@@ -686,38 +1124,16 @@ def booking_list_view(request: HttpRequest):
 
     bookings = bookings.order_by("-date_booked", "-booking_id")
 
-    booking_rows = []
-    for booking in bookings:
-        itinerary = _serialize_itinerary(booking.itineraryitem_set.all())
-        booking_items = booking.bookingitem_set.select_related("item").all()
-        additional_items = [
-            {
-                "id": item.booking_item_id,
-                "description": item.item.description if item.item else "Additional service",
-                "quantity": item.quantity,
-                "subtotal": item.subtotal_cost or Decimal("0.00"),
-            }
-            for item in booking_items
-        ]
-        flights_total = sum((leg.get("cost") or Decimal("0.00"))
-                            for leg in itinerary)
-        additional_total = sum(
-            (entry["subtotal"] for entry in additional_items), Decimal("0.00"))
-        price_summary = {
-            "flights": flights_total,
-            "additional": additional_total,
-            "total": booking.total_cost or (flights_total + additional_total),
-        }
-        booking_rows.append(
-            {
-                "booking": booking,
-                "itinerary": itinerary,
-                "additional_items": additional_items,
-                "price_summary": price_summary,
-            }
-        )
+    booking_list = [booking async for booking in bookings]
+    cards = await sync_to_async(_render_cards)(
+        "booking_card", booking_list, _booking_card,
+        *ITINERARY_PREFETCH, "bookingitem_set__item")
+    booking_rows = [
+        {"booking": booking, "card": card}
+        for booking, card in zip(booking_list, cards)
+    ]
 
-    totals = bookings.aggregate(
+    totals = await bookings.aaggregate(
         count=Count("booking_id"), revenue=Sum("total_cost")
     )
 
@@ -738,6 +1154,8 @@ def booking_list_view(request: HttpRequest):
                 else Decimal("0.00")
             ),
         },
+        # Read here, where the session may be loaded synchronously.
+        "messages": await sync_to_async(list)(messages.get_messages(request)),
     }
     return render(request, "booking_list.html", context)
 
@@ -746,7 +1164,7 @@ def page_temp(request: HttpRequest):
     raise Http404('Temporarily Unavailable --- To Be Created')
 
 
-def crew_assignments_view(request: HttpRequest):
+async def crew_assignments_view(request: HttpRequest):
     search = request.GET.get("search", "").strip()
     role = request.GET.get("role", "").strip()
     date_filter = _parse_date(request.GET.get("date"))
@@ -758,7 +1176,9 @@ def crew_assignments_view(request: HttpRequest):
         "flight__schedule",
     ).order_by("-assignment_date")
 
-    if search:
+    if FLIGHT_DESIGNATOR.fullmatch(search):
+        assignments = assignments.filter(flight_id=int(search[2:]))
+    elif search:
         assignments = assignments.filter(
             Q(crew__first_name__icontains=search)
             | Q(crew__last_name__icontains=search)
@@ -784,15 +1204,16 @@ def crew_assignments_view(request: HttpRequest):
             "departure": assignment.flight.departure_time,
             "arrival": assignment.flight.arrival_time,
         }
-        for assignment in assignments
+        async for assignment in assignments
     ]
 
-    roles = (
-        CrewAssignment.objects.select_related("crew")
+    roles = [
+        role
+        async for role in CrewAssignment.objects.select_related("crew")
         .values_list("crew__role", flat=True)
         .order_by("crew__role")
         .distinct()
-    )
+    ]
 
     context = {
         "page": "crew",
@@ -804,19 +1225,53 @@ def crew_assignments_view(request: HttpRequest):
         "assignments": assignment_rows,
         "roles": roles,
         "summary": {
-            "total": assignments.count(),
-            "unique_crew": assignments.values("crew_id").distinct().count(),
+            "total": len(assignment_rows),
+            "unique_crew": await assignments.values("crew_id").distinct().acount(),
         },
     }
     return render(request, "crew_assignments.html", context)
 
 
+def departures_board_view(request: HttpRequest):
+    flights = list(departures.load_departures().values())
+
+    context = {
+        "page": "departures",
+        "flights": flights,
+        "stats": {
+            "total": len(flights),
+            "airborne": sum(1 for f in flights if f["status"] == "Departed"),
+        },
+    }
+    return render(request, "departures_board.html", context)
+
+
+async def departures_stream_view(request: HttpRequest):
+    if not isinstance(request, ASGIRequest):
+        # Streaming needs the ASGI server; under WSGI send one snapshot and
+        # let EventSource reconnect after the poll interval instead.
+        snapshot = await departures.feed.current()
+        body = (
+            f"retry: {int(departures.feed.get_interval() * 1000)}\n\n"
+            + departures.format_event("snapshot", list(snapshot.values()))
+        )
+        return HttpResponse(body, content_type="text/event-stream")
+
+    response = StreamingHttpResponse(
+        departures.feed.stream(), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 def crew_assignment_create_view(request: HttpRequest):
     if request.method == "POST":
         form = CrewAssignmentForm(request.POST)
         print(form.is_valid())
         if form.is_valid():
-            form.save()
+            # One transaction for the assignment and its change event.
+            write_queue.run(form.save)
             return redirect("airline:crew_assignments")
     else:
         form = CrewAssignmentForm()
@@ -0,0 +1,70 @@
+"""
+In-process write queue for SQLite deployments.
+
+SQLite allows a single writer at a time. Rather than letting every request
+thread race for the lock, writes submitted here run one after another on a
+dedicated writer thread, each inside its own transaction. On other database
+backends (or with ``SQLITE_WRITE_QUEUE = False``) writes run inline.
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, transaction
+
+
+class WriteQueue:
+    def __init__(self, using="default"):
+        self.using = using
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return (
+            settings.SQLITE_WRITE_QUEUE
+            and connections[self.using].vendor == "sqlite"
+        )
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func`` for the writer thread and return a Future."""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def run(self, func, *args, **kwargs):
+        """Run ``func`` in a write transaction and return its result."""
+        if not self.enabled or threading.current_thread() is self._thread:
+            with transaction.atomic(using=self.using):
+                return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._work, name="sqlite-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _work(self):
+        connection = connections[self.using]
+        while True:
+            future, func, args, kwargs = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            connection.close_if_unusable_or_obsolete()
+            try:
+                with transaction.atomic(using=self.using):
+                    result = func(*args, **kwargs)
+            except BaseException as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+
+write_queue = WriteQueue()
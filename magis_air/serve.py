@@ -0,0 +1,71 @@
+"""
+Static file serving for deployments without a front-end web server.
+
+Content-hashed names from the ``collectstatic`` manifest never change, so
+they are sent with a one-year ``immutable`` lifetime; anything else must be
+revalidated. The precompressed ``.gz`` sibling is sent to clients that
+accept gzip.
+"""
+
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+FAR_FUTURE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+
+_accepts_gzip = re.compile(r"\bgzip\b")
+_hashed_names = None
+
+
+def _hashed(path):
+    global _hashed_names
+    if _hashed_names is None:
+        _hashed_names = frozenset(
+            getattr(staticfiles_storage, "hashed_files", {}).values())
+    return path in _hashed_names
+
+
+def serve_static(request, path):
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404
+    if not fullpath.is_file():
+        raise Http404
+
+    immutable = _hashed(path)
+    stat = fullpath.stat()
+    if not immutable and not was_modified_since(
+        request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime
+    ):
+        return HttpResponseNotModified()
+
+    content_type, encoding = mimetypes.guess_type(fullpath.name)
+    compressed = fullpath.with_name(f"{fullpath.name}.gz")
+    send_gzip = (
+        compressed.is_file()
+        and _accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    )
+    response = FileResponse(
+        (compressed if send_gzip else fullpath).open("rb"),
+        content_type=content_type or "application/octet-stream",
+    )
+    if send_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    if compressed.is_file():
+        patch_vary_headers(response, ("Accept-Encoding",))
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Last-Modified"] = http_date(stat.st_mtime)
+    response.headers["Cache-Control"] = FAR_FUTURE if immutable else REVALIDATE
+    return response
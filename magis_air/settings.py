@@ -26,10 +26,18 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# Selects the settings profile: "development" (default) or "production".
+ENVIRONMENT = os.getenv('DJANGO_ENV', 'development')
+PRODUCTION = ENVIRONMENT == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.getenv('ALLOWED_HOSTS', 'localhost' if PRODUCTION else '').split(',')
+    if host.strip()
+]
 
 
 # Application definition
@@ -41,10 +49,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'django_browser_reload',
     'airline'
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['django_browser_reload']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -53,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'airline.middleware.ReadYourWritesMiddleware',
 ]
 
 if DEBUG:
@@ -66,7 +77,7 @@ TEMPLATES = [
         'DIRS': [
             os.path.join(BASE_DIR, 'templates')
         ],
-        'APP_DIRS': True,
+        'APP_DIRS': not PRODUCTION,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -78,6 +89,15 @@ TEMPLATES = [
     },
 ]
 
+if PRODUCTION:
+    # Compile each template once per process instead of re-reading it.
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'magis_air.wsgi.application'
 
 
@@ -88,9 +108,66 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '600')) if PRODUCTION else 0,
+        'CONN_HEALTH_CHECKS': PRODUCTION,
+        'OPTIONS': {
+            # WAL lets readers run alongside the writer; write transactions
+            # take the lock up front and wait for it instead of failing
+            # part-way with "database is locked".
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+            ),
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Optional read replica for list and report pages (see airline/routers.py).
+# Locally, point REPLICA_DB_NAME at a second SQLite file and keep it in sync
+# with `manage.py replicate_sqlite`.
+if os.getenv('REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': Path(os.getenv('REPLICA_DB_NAME')),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['airline.routers.ReplicaRouter']
+
+# How long a browser keeps reading from the primary after it writes.
+REPLICA_STICKY_SECONDS = 10
+
+# Funnel booking and flight writes through one writer thread per process
+# when running on SQLite (see airline/writequeue.py).
+SQLITE_WRITE_QUEUE = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'magis-air',
+            # Room for rendered booking cards (LocMemCache defaults to 300).
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+if PRODUCTION:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -128,6 +205,40 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+STATIC_ROOT = Path(os.getenv('STATIC_ROOT', BASE_DIR / 'staticfiles'))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # Hashed, gzip-precompressed files after `collectstatic`.
+        'BACKEND': 'magis_air.storage.CompressedManifestStaticFilesStorage'
+        if PRODUCTION
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Per-page bundles written to static/bundles/ by `buildassets`. Templates
+# load them with {% bundle %}, which falls back to the listed sources when
+# ASSETS_BUNDLED is off.
+ASSET_BUNDLES = {
+    'base.css': ['base.css'],
+    'booking_create.js': ['booking_create.js', 'fare_calendar.js'],
+    'booking_details.js': ['booking_details.js'],
+    'booking_list.js': ['booking_list.js'],
+    'crew_assign.js': ['crew_assign.js'],
+    'departures.js': ['departures.js'],
+    'schedule.js': ['schedule.js'],
+}
+# name: (source, max width in pixels); the sidebar logo is shown 260px wide.
+ASSET_IMAGES = {
+    'logo.png': ('logo/Magis Air.png', 520),
+}
+ASSETS_BUNDLED = PRODUCTION
+# Serve STATIC_ROOT from Django with far-future caching when no web server
+# sits in front of it.
+SERVE_STATIC = os.getenv('SERVE_STATIC', '1' if PRODUCTION else '0') == '1'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -137,3 +248,23 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media Files
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
+
+# Airline
+FLIGHT_SEAT_CAPACITY = 180
+DEPARTURES_POLL_INTERVAL = 5
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24  # seconds
+ARCHIVE_RETENTION_DAYS = 365
+# Bearer token for change feed readers (/changes/); staff sessions also work.
+CHANGE_FEED_TOKEN = os.getenv('CHANGE_FEED_TOKEN', '')
+# On databases other than SQLite, feed readers only see events this many
+# seconds old, so a slower transaction's events cannot commit behind them.
+CHANGE_FEED_SETTLE = 30
+
+# Background jobs (see airline/jobs.py), run by `manage.py runworker`.
+# JOBS_EAGER=1 runs jobs in the enqueuing process right after its
+# transaction commits, for trying things out without a worker. It is off by
+# default because jobs such as boarding pass rendering would then run inside
+# the request that queued them.
+JOBS_EAGER = os.getenv('JOBS_EAGER', '0') == '1'
+JOB_LEASE = 60 * 10  # seconds a running job may hold its lock
+JOB_RETRY_BACKOFF = 10  # seconds, doubled on every further attempt
@@ -0,0 +1,42 @@
+"""
+Static file storage used by the production settings profile.
+"""
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static files with a gzip sibling (``name.gz``) written
+    next to every compressible asset during ``collectstatic``.
+    """
+
+    compressible_extensions = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run=dry_run, **options
+        ):
+            if (
+                not dry_run
+                and hashed_name
+                and not isinstance(processed, Exception)
+                and hashed_name.endswith(self.compressible_extensions)
+            ):
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        with self.open(name) as source:
+            content = source.read()
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return
+
+        compressed_name = f'{name}.gz'
+        if self.exists(compressed_name):
+            self.delete(compressed_name)
+        self._save(compressed_name, ContentFile(compressed))
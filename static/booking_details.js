@@ -6,27 +6,10 @@ document.addEventListener('DOMContentLoaded', function() {
 	const selectedID = topDiv.dataset.selected_id;
 	const initialBaggage = topDiv.dataset.intial_baggage;
 
-	let baggageCount = initialBaggage ? parseInt(initialBaggage) : 0;
-	let selectedPassengerId = (selectedID ? selectedID : null);
-
-	let passengerSelected = false;
-	document.querySelectorAll('[id^="passenger-"]').forEach(passenger => {
-		if (passenger.classList.contains('selected')) {
-			passengerSelected = true;
-		}
-	})
-	console.log(passengerSelected);
+	const allowMultiple = topDiv.dataset.multiple === 'true';
 
-	if (!passengerSelected) {
-		let btn = document.getElementById('confirm-btn')
-		btn.style.opacity = '0.5';
-		btn.disabled = true;
-	}
-
-	if (selectedPassengerId)
-		setTimeout(function() {
-			selectPassenger(selectedPassengerId);
-		}, 100);
+	let baggageCount = initialBaggage ? parseInt(initialBaggage) : 0;
+	const selectedPassengers = new Set();
 
 	function updateBaggage(delta) {
 		baggageCount = Math.max(0, baggageCount + delta);
@@ -35,56 +18,60 @@ document.addEventListener('DOMContentLoaded', function() {
 		updateTotals();
 	}
 
-	function selectPassenger(passengerId) {
-		document.querySelectorAll('[id^="passenger-"]').forEach(el => {
-			if (el.id === 'passenger-' + passengerId) return;
-
-			el.classList.remove('selected');
-			el.style.borderColor = '#e5e7eb';
-			el.style.backgroundColor = '';
-			el.style.opacity = '1';
-			el.style.color = '';
-
-			var passengerSubText = el.querySelector('#passenger_id')
-			if (passengerSubText) {
-				passengerSubText.classList.add('text-slate-500');
-				passengerSubText.style.color = '';
-			}
+	function setPassengerStyle(el, selected) {
+		el.classList.toggle('selected', selected);
+		el.style.borderColor = selected ? '#0369a1' : '#e5e7eb';
+		el.style.backgroundColor = selected ? '#0369a1' : '';
+		el.style.opacity = '1';
+		el.style.color = selected ? '#ffffff' : '';
+
+		var passengerSubText = el.querySelector('#passenger_id')
+		if (passengerSubText) {
+			passengerSubText.classList.toggle('text-slate-500', !selected);
+			passengerSubText.style.color = selected ? '#dbeafe' : '';
+		}
+	}
+
+	function renderSelectedPassengers() {
+		const container = document.getElementById('selected-passenger-inputs');
+		container.replaceChildren();
+		selectedPassengers.forEach(passengerId => {
+			const input = document.createElement('input');
+			input.type = 'hidden';
+			input.name = 'passenger_id';
+			input.value = passengerId;
+			container.append(input);
 		});
 
-		const passengerEl = document.getElementById('passenger-' + passengerId);
-		if (passengerEl) {
-			passengerEl.classList.add('selected');
-			passengerEl.style.borderColor = '#0369a1';
-			passengerEl.style.backgroundColor = '#0369a1';
-			passengerEl.style.opacity = '1';
-			passengerEl.style.color = '#ffffff';
-
-			var passengerSubText = passengerEl.querySelector('#passenger_id')
-			if (passengerSubText) {
-				passengerSubText.classList.remove('text-slate-500');
-				passengerSubText.style.color = '#dbeafe';
-			}
+		document.getElementById('party-count-display').textContent = Math.max(1, selectedPassengers.size);
 
-			selectedPassengerId = passengerId;
-			const passengerInput = document.getElementById('selected-passenger-id');
-			if (passengerInput) {
-				passengerInput.value = passengerId;
-			}
+		const confirmBtn = document.getElementById('confirm-btn');
+		if (confirmBtn) {
+			confirmBtn.disabled = selectedPassengers.size === 0;
+			confirmBtn.style.opacity = selectedPassengers.size ? '' : '0.5';
+		}
+		updateTotals();
+	}
 
-			const confirmBtn = document.getElementById('confirm-btn');
-			if (confirmBtn) {
-				confirmBtn.disabled = false;
-				confirmBtn.style.opacity = '';
-			}
+	function selectPassenger(passengerId) {
+		passengerId = String(passengerId);
+		if (selectedPassengers.has(passengerId)) {
+			if (allowMultiple) selectedPassengers.delete(passengerId);
+		} else {
+			if (!allowMultiple) selectedPassengers.clear();
+			selectedPassengers.add(passengerId);
 		}
+
+		document.querySelectorAll('[id^="passenger-"]').forEach(el => {
+			setPassengerStyle(el, selectedPassengers.has(el.id.slice('passenger-'.length)));
+		});
+		renderSelectedPassengers();
 	}
 
 	const bookingForm = document.getElementById('booking-form');
 	if (bookingForm) {
 		bookingForm.addEventListener('submit', function(e) {
-			const passengerId = document.getElementById('selected-passenger-id').value;
-			if (!passengerId) {
+			if (!selectedPassengers.size) {
 				e.preventDefault();
 				alert('Please select a passenger before confirming the booking.');
 				return false;
@@ -101,7 +88,7 @@ document.addEventListener('DOMContentLoaded', function() {
 	function updateTotals(obj) {
 		const hasInsurance = document.getElementById('has-insurance').checked;
 
-		const baggageTotal = baggageCount * baggagePrice;
+		const baggageTotal = baggageCount * parseFloat(baggagePrice);
 
 		document.getElementById('baggage-total').textContent = 'Php ' + baggageTotal.toFixed(2);
 		document.getElementById('baggage-count-display').textContent = baggageCount;
@@ -113,7 +100,7 @@ document.addEventListener('DOMContentLoaded', function() {
 			document.getElementById('baggage-row').style.display = 'none';
 		}
 
-		const insuranceTotal = hasInsurance ? insurancePrice : 0;
+		const insuranceTotal = hasInsurance ? parseFloat(insurancePrice) : 0;
 		document.getElementById('insurance-total').textContent = 'Php ' + parseFloat(insuranceTotal).toFixed(2);
 
 		if (hasInsurance) {
@@ -123,18 +110,25 @@ document.addEventListener('DOMContentLoaded', function() {
 			document.getElementById('insurance-row').style.display = 'none';
 		}
 
-		const total = flightsCost + baggageTotal + insuranceTotal;
-		document.getElementById('total-price').textContent = 'Php ' + parseFloat(total).toFixed(2);
+		const perPassenger = parseFloat(flightsCost) + baggageTotal + insuranceTotal;
+		const total = perPassenger * Math.max(1, selectedPassengers.size);
+		document.getElementById('total-price').textContent = 'Php ' + total.toFixed(2);
 
-		obj.parentElement.style.borderColor = obj.checked ? '#10b981' : '#e5e7eb';
-		obj.parentElement.style.backgroundColor = obj.checked ? '#f0fdf4' : '#f8fafc';
+		if (obj) {
+			obj.parentElement.style.borderColor = obj.checked ? '#10b981' : '#e5e7eb';
+			obj.parentElement.style.backgroundColor = obj.checked ? '#f0fdf4' : '#f8fafc';
+		}
 	}
 
 	window.updateBaggage = updateBaggage;
 	window.selectPassenger = selectPassenger;
 	window.updateTotals = updateTotals;
 
-	updateTotals();
+	if (selectedID) {
+		selectPassenger(selectedID);
+	} else {
+		renderSelectedPassengers();
+	}
 });
 
 function travelMouseOver(obj) {
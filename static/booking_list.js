@@ -31,4 +31,29 @@ document.addEventListener("DOMContentLoaded", () => {
       }
     });
   });
+
+  const bulkForm = document.getElementById("bulk-delete-form");
+  if (bulkForm) {
+    const selectAll = document.getElementById("bulk-select-all");
+    const deleteButton = document.getElementById("bulk-delete-btn");
+    const selectedCount = document.getElementById("bulk-selected-count");
+    const checkboxes = document.querySelectorAll(".booking-entry__select");
+
+    const updateSelection = () => {
+      const selected = [...checkboxes].filter((box) => box.checked).length;
+      selectedCount.textContent = selected;
+      deleteButton.disabled = selected === 0;
+      selectAll.checked = selected > 0 && selected === checkboxes.length;
+      selectAll.indeterminate = selected > 0 && selected < checkboxes.length;
+    };
+
+    checkboxes.forEach((box) => box.addEventListener("change", updateSelection));
+    selectAll.addEventListener("change", () => {
+      checkboxes.forEach((box) => {
+        box.checked = selectAll.checked;
+      });
+      updateSelection();
+    });
+    updateSelection();
+  }
 });
@@ -0,0 +1,76 @@
+document.addEventListener("DOMContentLoaded", () => {
+  const container = document.getElementById("board-rows");
+  const status = document.getElementById("board-status");
+  const flights = new Map();
+
+  function renderRow(flight) {
+    const row = document.createElement("div");
+    row.className = "table-grid__row";
+    row.dataset.flight = flight.flight_no;
+    const cells = [
+      flight.flight_no_formatted,
+      flight.origin,
+      flight.destination,
+      flight.departure,
+      flight.arrival,
+      null,
+      flight.crew_total,
+      `${flight.load_factor}%`,
+    ];
+    cells.forEach((value, index) => {
+      const cell = document.createElement("div");
+      if (index === 0) {
+        cell.className = "text-mono";
+      }
+      if (value === null) {
+        const pill = document.createElement("span");
+        pill.className = "pill pill--brand";
+        pill.textContent = flight.status;
+        cell.appendChild(pill);
+      } else {
+        cell.textContent = value;
+      }
+      row.appendChild(cell);
+    });
+    return row;
+  }
+
+  function render() {
+    const ordered = [...flights.values()].sort((a, b) =>
+      a.departure === b.departure
+        ? a.flight_no - b.flight_no
+        : a.departure.localeCompare(b.departure)
+    );
+    container.replaceChildren(...ordered.map(renderRow));
+    document.getElementById("board-total").textContent = ordered.length;
+    document.getElementById("board-airborne").textContent = ordered.filter(
+      (flight) => flight.status === "Departed"
+    ).length;
+  }
+
+  const source = new EventSource(container.dataset.streamUrl);
+
+  source.addEventListener("open", () => {
+    status.textContent = "Live";
+  });
+
+  source.addEventListener("error", () => {
+    status.textContent = "Reconnecting…";
+  });
+
+  source.addEventListener("snapshot", (event) => {
+    flights.clear();
+    JSON.parse(event.data).forEach((flight) => flights.set(flight.flight_no, flight));
+    render();
+  });
+
+  source.addEventListener("flights", (event) => {
+    JSON.parse(event.data).forEach((flight) => flights.set(flight.flight_no, flight));
+    render();
+  });
+
+  source.addEventListener("removed", (event) => {
+    JSON.parse(event.data).forEach((flightNo) => flights.delete(flightNo));
+    render();
+  });
+});
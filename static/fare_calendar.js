@@ -0,0 +1,63 @@
+const fareCalendar = document.getElementById('fare-calendar');
+const fareGrid = document.getElementById('fare-calendar-grid');
+const originSelect = document.getElementById('origin');
+const destinationSelect = document.getElementById('destination');
+const departureInput = document.getElementById('departure_date');
+
+const dayFormat = new Intl.DateTimeFormat(undefined, { weekday: 'short', month: 'short', day: 'numeric' });
+const fareFormat = new Intl.NumberFormat(undefined, { minimumFractionDigits: 0, maximumFractionDigits: 0 });
+
+function renderFareCalendar(days) {
+	fareGrid.replaceChildren();
+	if (!days.length) {
+		fareCalendar.classList.add('is-hidden');
+		return;
+	}
+
+	const lowest = Math.min(...days.map((day) => Number(day.fare)));
+	days.forEach((day) => {
+		const button = document.createElement('button');
+		button.type = 'button';
+		button.className = 'fare-day';
+		button.classList.toggle('is-lowest', Number(day.fare) === lowest);
+		button.classList.toggle('active', departureInput.value === day.date);
+		button.title = `${day.flights} flight${day.flights === 1 ? '' : 's'}`;
+
+		const label = document.createElement('span');
+		label.className = 'fare-day__date';
+		label.textContent = dayFormat.format(new Date(`${day.date}T00:00:00`));
+		const fare = document.createElement('span');
+		fare.className = 'fare-day__fare';
+		fare.textContent = `Php ${fareFormat.format(Number(day.fare))}`;
+		button.append(label, fare);
+
+		button.addEventListener('click', () => {
+			departureInput.value = day.date;
+			fareGrid.querySelectorAll('.fare-day').forEach((other) => other.classList.remove('active'));
+			button.classList.add('active');
+		});
+		fareGrid.append(button);
+	});
+	fareCalendar.classList.remove('is-hidden');
+}
+
+function loadFareCalendar() {
+	if (!originSelect.value || !destinationSelect.value) {
+		fareCalendar.classList.add('is-hidden');
+		return;
+	}
+
+	const params = new URLSearchParams({
+		origin: originSelect.value,
+		destination: destinationSelect.value,
+		days: 30,
+	});
+	fetch(`${fareCalendar.dataset.url}?${params}`)
+		.then((response) => response.json())
+		.then((data) => renderFareCalendar(data.days || []))
+		.catch((error) => console.error('Error fetching fare calendar:', error));
+}
+
+originSelect.addEventListener('change', loadFareCalendar);
+destinationSelect.addEventListener('change', loadFareCalendar);
+loadFareCalendar();